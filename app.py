@@ -7,23 +7,37 @@ questions in English, Physics, Biology, and Pakistan Studies.
 
 import os
 import sys
+import time
 from typing import Optional
 
+_STARTED = time.perf_counter()
+
 # ---------------------------
 # Add src folder to path
 # ---------------------------
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 
 from langchain_openai import ChatOpenAI
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.prompts import PromptTemplate
 
-from src.utils.memory_manager import MemoryManager
-from src.secuirity.sanitizer import sanitize_user_input
-from src.utils.guardrails import is_small_talk, is_out_of_scope
-from src.rag.hybrib_retriever import hybrid_rank, build_context_string
+from src.utils.memory_manager import memory_manager_from_config
+from src.utils.preprocess import PreprocessMetrics, preprocess
+from src.rag.hybrib_retriever import hybrid_search, hybrid_rank_scored
+from src.rag.context_packer import PromptMetrics, pack_context
+from src.rag.context_compressor import compressor_from_config
+from src.rag.bm25_index import load_lexical_index
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.vector_stores import open_stores_from_config
+from src.rag.query_embedder import QueryEmbedder
+from src.rag.embedding_backends import embeddings_from_config
+from src.routing.router_agent import load_router, detect_subject as route_subject
+from src.rag.fanout_retriever import fanout_search
+from src.rag.streaming import StreamMetrics, StreamStats, TokenStream
 from src.utils.config_loader import load_config
+from src.utils.startup import StartupTimer, WarmEmbeddings, LazyMapping, background
+
+startup = StartupTimer(started=_STARTED)
+startup.record("import", time.perf_counter() - _STARTED)
 
 # ---------------------------
 # Load configuration
@@ -32,24 +46,39 @@ config = load_config()
 CHROMA_DIR = config["CHROMA_DB_DIR"]
 EMBEDDING_MODEL = config["EMBEDDING_MODEL"]
 LLM_MODEL = config["LLM_MODEL"]
+SUBJECT_NAMES = ["english", "physics", "biology", "pakistan_studies"]
 
 # ---------------------------
-# Initialize embeddings and vector stores
+# Warm up embeddings and open vector stores in the background
 # ---------------------------
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-SUBJECTS = {
-    "english": Chroma(persist_directory=f"{CHROMA_DIR}/english", embedding_function=embeddings),
-    "physics": Chroma(persist_directory=f"{CHROMA_DIR}/physics", embedding_function=embeddings),
-    "biology": Chroma(persist_directory=f"{CHROMA_DIR}/biology", embedding_function=embeddings),
-    "pakistan_studies": Chroma(persist_directory=f"{CHROMA_DIR}/pakistan_studies", embedding_function=embeddings),
-}
-print("✅ ChromaDB loaded for subjects:", ", ".join(SUBJECTS.keys()))
+# Nothing here blocks the prompt: the model loads on its own thread, subject
+# stores and BM25 indexes open in parallel, and the first question waits only
+# for whatever it actually needs.
+embeddings = WarmEmbeddings(lambda: embeddings_from_config(config), timer=startup)
+query_embedder = QueryEmbedder(embeddings, max_size=config["QUERY_EMBED_CACHE_SIZE"])
+compressor = compressor_from_config(config, embeddings)
+SUBJECTS = open_stores_from_config(config, SUBJECT_NAMES, embeddings, lazy=True, timer=startup).prefetch()
+
+
+def _load_lexical_index(name: str):
+    db_dir = resolve_subject_dir(CHROMA_DIR, name)
+    # Only open the vector store if the BM25 index has to be built from it
+    return load_lexical_index(db_dir) or load_lexical_index(db_dir, SUBJECTS[name])
+
+
+LEXICAL_INDEXES = LazyMapping(SUBJECT_NAMES, _load_lexical_index, timer=startup, label="bm25").prefetch()
+router_future = background(
+    lambda: load_router(CHROMA_DIR, SUBJECTS, n_prototypes=config["ROUTER_PROTOTYPES"]), startup, "router"
+)
 
 # ---------------------------
 # Initialize memory and LLM
 # ---------------------------
-memory_manager = MemoryManager()
-llm = ChatOpenAI(model=LLM_MODEL, temperature=0.2)
+memory_manager = memory_manager_from_config(config)  # single user: the default session, windowed
+stream_metrics = StreamMetrics()
+prompt_metrics = PromptMetrics(LLM_MODEL)
+preprocess_metrics = PreprocessMetrics()
+llm_future = background(lambda: ChatOpenAI(model=LLM_MODEL, temperature=0.2), startup, "llm client")
 
 # ---------------------------
 # Prompt template
@@ -72,43 +101,54 @@ prompt = PromptTemplate(template=prompt_template, input_variables=["context", "q
 # Subject detection
 # ---------------------------
 def detect_subject(query: str) -> Optional[str]:
-    """Return the subject inferred from the user's query."""
-    q = query.lower()
-    keywords = {
-        "english": ["grammar", "english", "sentence", "verb", "noun", "essay", "adjective", "paragraph"],
-        "physics": ["physics", "force", "motion", "law", "energy", "newton", "velocity", "optics", "gravity"],
-        "biology": ["biology", "cell", "organism", "photosynthesis", "dna", "protein", "enzyme", "plant", "animal"],
-        "pakistan_studies": ["pakistan", "independence", "quaid", "history", "movement", "1947", "constitution"]
-    }
-    for subject, keys in keywords.items():
-        if any(word in q for word in keys):
-            return subject
-    return None
+    """Return the subject inferred from the user's query (embedding router, keyword fallback)."""
+    router = router_future.result()
+    query_vector = query_embedder.embed(query) if router is not None else None
+    return route_subject(query, router, query_vector, min_confidence=config["ROUTER_MIN_CONFIDENCE"])
+
+def fanout_subject(query: str):
+    """Search every subject concurrently; return (winning subject, its hits) or (None, None)."""
+    if not config["FANOUT_ENABLED"]:
+        return None, None
+    fan = fanout_search(SUBJECTS, query_embedder.embed(query), k=config["RAG_K_DOCS"])
+    if fan.subject and fan.score >= config["FANOUT_MIN_RELEVANCE"]:
+        return fan.subject, fan.hits
+    return None, None
 
 # ---------------------------
 # RAG answer retrieval
 # ---------------------------
-def get_rag_answer(subject: str, query: str) -> str:
-    """Retrieve relevant documents and return an LLM-generated answer."""
-    retriever = SUBJECTS[subject].as_retriever(search_kwargs={"k": 3})
-    docs = retriever.get_relevant_documents(query)
-    reranked = hybrid_rank(docs, query, alpha=0.7, top_k=4)
-    context = build_context_string(reranked)
-    full_prompt = prompt.format(context=context, question=query)
-    answer = llm.invoke(full_prompt)
-    
-    # Save to per-subject memory
-    mem = memory_manager.get_memory(subject)
-    if mem:
-        mem.save_context({"input": query}, {"output": str(answer)})
-    return answer
+def stream_rag_answer(subject: str, query: str, prefetched=None) -> TokenStream:
+    """Retrieve relevant documents (unless prefetched) and stream the LLM-generated answer."""
+    stats = StreamStats()  # started before retrieval, so TTFT is what the student waits
+    if prefetched is not None:
+        scored = prefetched
+    else:
+        query_vector = query_embedder.embed(query)
+        scored = hybrid_search(SUBJECTS[subject], LEXICAL_INDEXES[subject], query, query_vector, k=config["RAG_K_DOCS"])
+    reranked = hybrid_rank_scored(scored, query, alpha=config["RAG_ALPHA"], top_k=config["RAG_TOP_K"])
+    docs = [doc for doc, _ in reranked]
+    if compressor is not None:
+        docs = compressor.compress(docs, query_embedder.embed(query))
+    packed = pack_context(docs, config["CONTEXT_TOKEN_BUDGET"], LLM_MODEL)
+    full_prompt = prompt.format(context=packed.text, question=query)
+    prompt_metrics.record(packed, full_prompt)
+
+    # Save to per-subject memory once the whole answer has streamed
+    def save_to_memory(answer: str) -> None:
+        mem = memory_manager.get_memory(subject)
+        if mem:
+            mem.save_context({"input": query}, {"output": answer})
+
+    return TokenStream(llm_future.result().stream(full_prompt), save_to_memory, stats, stream_metrics)
 
 # ---------------------------
 # Chat loop
 # ---------------------------
 def chat() -> None:
     """Main REPL loop for the CLI chatbot."""
-    print("\n🤖 Tutor RAG bot is ready! Type 'exit' to quit.\n")
+    print(f"\n⏱️ Startup so far:\n{startup.report()}")
+    print("\n🤖 Tutor RAG bot is ready! Type 'exit' to quit ('show startup' for load times).\n")
 
     while True:
         query = input("🧑 You: ").strip()
@@ -116,6 +156,14 @@ def chat() -> None:
             print("👋 Goodbye! Study smart and stay curious!")
             break
 
+        # Show startup timing
+        if query.lower() == "show startup":
+            print(f"\n⏱️ Startup timing:\n{startup.report()}")
+            print(f"📈 Streaming: {stream_metrics.summary()}")
+            print(f"📏 Prompts: {prompt_metrics.summary()}")
+            print(f"🧹 Preprocessing: {preprocess_metrics.summary()}\n")
+            continue
+
         # Show memory
         if query.lower() == "show memory":
             print("\n🧠 Conversation Memory (All Subjects):")
@@ -126,34 +174,42 @@ def chat() -> None:
                     print(f"  {getattr(m, 'type', 'msg')}: {content}")
             continue
 
-        # Sanitize input
-        cleaned_query, flagged, reasons = sanitize_user_input(query)
-        if flagged:
-            print(f"⚠️ Input rejected: {'; '.join(reasons)}")
+        # Sanitize and scan the input once; every check below reads from the result
+        prepared = preprocess(query)
+        preprocess_metrics.record(prepared)
+        cleaned_query = prepared.cleaned
+        if prepared.flagged:
+            print(f"⚠️ Input rejected: {'; '.join(prepared.reasons)}")
             continue
 
         # Small talk
-        if is_small_talk(cleaned_query):
-            print("🤖 Tutor:", is_small_talk(cleaned_query))
+        if prepared.small_talk:
+            print("🤖 Tutor:", prepared.small_talk.format(name=memory_manager.get_user_name() or "there"))
             continue
 
         # Out-of-scope queries
-        if is_out_of_scope(cleaned_query):
+        if prepared.out_of_scope:
             print("🤖 Tutor: Sorry, I can only help with English, Physics, Biology, or Pakistan Studies.")
             continue
 
         # Subject detection
-        subject = detect_subject(cleaned_query)
+        with prepared.stage("route"):
+            subject, prefetched = detect_subject(cleaned_query), None
+            if not subject:
+                subject, prefetched = fanout_subject(cleaned_query)
         if not subject:
             print("🤖 Tutor: Please ask something related to English, Physics, Biology, or Pakistan Studies.")
             continue
 
-        # Generate and display answer
+        # Generate and display answer as it streams in
         try:
-            answer = get_rag_answer(subject, cleaned_query)
-            print(f"📘 [{subject.capitalize()} Tutor]: {answer}")
+            stream = stream_rag_answer(subject, cleaned_query, prefetched=prefetched)
+            print(f"📘 [{subject.capitalize()} Tutor]: ", end="", flush=True)
+            for piece in stream:
+                print(piece, end="", flush=True)
+            print()
         except Exception as e:
-            print(f"⚠️ Error generating answer: {str(e)}")
+            print(f"\n⚠️ Error generating answer: {str(e)}")
 
 # ---------------------------
 # Entry point
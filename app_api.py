@@ -0,0 +1,193 @@
+"""
+app_api.py — Async HTTP service for the Intelligent RAG Tutor
+-------------------------------------------------------------
+Exposes ChatManager over FastAPI so one process can serve many students
+at once. Retrieval and reranking run in a worker thread pool and the LLM
+call is awaited, so a slow generation never blocks other requests.
+POST /ask/stream sends the answer as server-sent events while it is generated.
+
+Run with:
+    uvicorn app_api:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+# ---------------------------
+# Add src folder to path
+# ---------------------------
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from src.rag.micro_batcher import MicroBatchEmbeddings
+from src.utils.chat_manager import ChatManager, answer_text
+from src.utils.memory_manager import DEFAULT_SESSION
+from src.utils.preprocess import PreparedQuery, preprocess
+from src.utils.config_loader import load_config
+
+SUBJECT_NAMES = ["english", "physics", "biology", "pakistan_studies"]
+
+# ---------------------------
+# Request / response models
+# ---------------------------
+class AskRequest(BaseModel):
+    question: str
+    subject: Optional[str] = None  # manual override, same as the Streamlit dropdown
+    session_id: Optional[str] = None  # keeps each student's conversation memory separate
+
+
+class AskResponse(BaseModel):
+    answer: str
+    subject: Optional[str] = None
+    kind: str = "rag"  # "rag" | "small_talk"
+    preprocess_ms: Optional[Dict[str, float]] = None  # per-stage time: clean, scan, decide, route
+
+
+# ---------------------------
+# App lifecycle
+# ---------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load models and vector stores once per worker process."""
+    config = load_config()
+    # Bound the pool used by asyncio.to_thread for retrieval/reranking
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=config["API_WORKER_THREADS"], thread_name_prefix="rag")
+    )
+    app.state.chat_manager = await asyncio.to_thread(ChatManager, config)
+    print("✅ ChatManager loaded for subjects:", ", ".join(app.state.chat_manager.subjects.keys()))
+    yield
+
+
+app = FastAPI(title="EduTutor RAG API", lifespan=lifespan)
+
+# ---------------------------
+# Routes
+# ---------------------------
+@app.get("/health")
+async def health() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/stats")
+async def stats() -> dict:
+    """Answer-cache hit ratio, streaming TTFT and tokens/sec, prompt sizes, preprocessing stage times, embedding batches, memory sessions."""
+    chat_manager: ChatManager = app.state.chat_manager
+    cache = chat_manager.answer_cache
+    batcher = chat_manager.embeddings
+    return {
+        "answer_cache": cache.stats() if cache else None,
+        "streaming": chat_manager.stream_metrics.summary(),
+        "prompts": chat_manager.prompt_metrics.summary(),
+        "preprocess": chat_manager.preprocess_metrics.summary(),
+        "memory": chat_manager.memory_manager.stats(),
+        "embedding_batches": batcher.stats() if isinstance(batcher, MicroBatchEmbeddings) else None,
+    }
+
+
+async def prepare_question(
+    chat_manager: ChatManager, request: AskRequest
+) -> Tuple[PreparedQuery, Optional[str], Optional[List], Optional[str]]:
+    """
+    Validate and route a question.
+    Returns (prepared question, subject, prefetched hits, small-talk reply or None).
+    """
+    prepared = preprocess(request.question)
+    chat_manager.preprocess_metrics.record(prepared)
+    if prepared.flagged:
+        raise HTTPException(status_code=400, detail=f"Input rejected: {'; '.join(prepared.reasons)}")
+    if prepared.empty:
+        raise HTTPException(status_code=400, detail="Empty question.")
+
+    if prepared.small_talk is not None:
+        return prepared, None, None, chat_manager.handle_small_talk(prepared.cleaned)
+
+    if prepared.out_of_scope:
+        raise HTTPException(
+            status_code=400,
+            detail="Sorry, I can only help with English, Physics, Biology, or Pakistan Studies.",
+        )
+
+    if request.subject is not None and request.subject not in SUBJECT_NAMES:
+        raise HTTPException(status_code=422, detail=f"Unknown subject: {request.subject}")
+    subject, prefetched = request.subject, None
+    if not subject:
+        # Routing embeds the query (and may fan out to every subject), so keep it off the event loop
+        with prepared.stage("route"):
+            subject, prefetched = await asyncio.to_thread(chat_manager.resolve_subject, prepared.cleaned)
+    if not subject:
+        raise HTTPException(
+            status_code=422,
+            detail="Please ask something related to English, Physics, Biology, or Pakistan Studies.",
+        )
+    return prepared, subject, prefetched, None
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: AskRequest) -> AskResponse:
+    """Answer a single student question."""
+    chat_manager: ChatManager = app.state.chat_manager
+    prepared, subject, prefetched, small_talk = await prepare_question(chat_manager, request)
+    if small_talk is not None:
+        return AskResponse(answer=small_talk, kind="small_talk", preprocess_ms=prepared.timings_ms)
+
+    try:
+        answer = await chat_manager.aget_rag_answer(
+            subject, prepared.cleaned, prefetched=prefetched, session_id=request.session_id or DEFAULT_SESSION
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error generating answer: {str(e)}")
+
+    return AskResponse(answer=answer_text(answer), subject=subject, preprocess_ms=prepared.timings_ms)
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest) -> StreamingResponse:
+    """
+    Answer a question as server-sent events: "token" events ({"text": ...})
+    as the answer is generated, then one "done" event with the subject and
+    timing ({"ttft_ms", "tokens", "tokens_per_sec", "preprocess_ms"}), or an "error" event.
+    Validation and routing errors are returned as plain HTTP errors, like /ask.
+    """
+    chat_manager: ChatManager = app.state.chat_manager
+    prepared, subject, prefetched, small_talk = await prepare_question(chat_manager, request)
+
+    async def events():
+        if small_talk is not None:
+            yield sse("token", {"text": small_talk})
+            yield sse("done", {"subject": None, "kind": "small_talk", "preprocess_ms": prepared.timings_ms})
+            return
+        try:
+            stream = await chat_manager.astream_rag_answer(
+                subject, prepared.cleaned, prefetched=prefetched, session_id=request.session_id or DEFAULT_SESSION
+            )
+            async for piece in stream:
+                yield sse("token", {"text": piece})
+        except Exception as e:
+            yield sse("error", {"detail": f"Error generating answer: {str(e)}"})
+            return
+        yield sse("done", {"subject": subject, "kind": "rag", **stream.stats.as_dict(),
+                           "preprocess_ms": prepared.timings_ms})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("app_api:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
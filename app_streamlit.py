@@ -1,17 +1,31 @@
 # app_streamlit.py
+import time
+import uuid
+_STARTED = time.perf_counter()
+
 import streamlit as st
 import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 
 from src.utils.config_loader import load_config
-from src.secuirity.sanitizer import sanitize_user_input
-from src.utils.guardrails import is_small_talk, extract_name
-from src.utils.memory_manager import MemoryManager
-from src.rag.hybrib_retriever import hybrid_rank, build_context_string
-from langchain_chroma import Chroma
+from src.utils.preprocess import PreprocessMetrics, preprocess
+from src.utils.memory_manager import memory_manager_from_config
+from src.rag.hybrib_retriever import hybrid_search, hybrid_rank_scored
+from src.rag.context_packer import PromptMetrics, pack_context
+from src.rag.context_compressor import compressor_from_config
+from src.rag.bm25_index import load_lexical_index
+from src.rag.query_embedder import QueryEmbedder
+from src.rag.embedding_backends import embeddings_from_config
+from src.rag.micro_batcher import batched_embeddings
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.vector_stores import open_stores_from_config, reopen_subject_store
+from src.ingest.ingest_worker import IngestionWorker
+from src.routing.router_agent import load_router, detect_subject
+from src.rag.fanout_retriever import fanout_search
+from src.rag.streaming import StreamMetrics, StreamStats, TokenStream
+from src.utils.startup import StartupTimer, WarmEmbeddings, LazyMapping, background
 from langchain_openai import ChatOpenAI
-from langchain_huggingface import HuggingFaceEmbeddings
 
 # ---------------------------
 # Streamlit UI
@@ -27,23 +41,114 @@ CHROMA_DIR = config["CHROMA_DB_DIR"]
 EMBEDDING_MODEL = config["EMBEDDING_MODEL"]
 LLM_MODEL = config["LLM_MODEL"]
 
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-llm = ChatOpenAI(model=LLM_MODEL, temperature=0.2)
+SUBJECT_NAMES = ["english", "physics", "biology", "pakistan_studies"]
+
+@st.cache_resource
+def load_startup_timer():
+    # Created on the first script run only, so it reports the process's cold start
+    timer = StartupTimer(started=_STARTED)
+    timer.record("import", time.perf_counter() - _STARTED)
+    return timer
+
+startup = load_startup_timer()
+
+@st.cache_resource
+def load_embeddings():
+    # The model loads on a background thread while the page renders; questions
+    # from concurrent sessions are micro-batched into one forward pass
+    return batched_embeddings(config, WarmEmbeddings(lambda: embeddings_from_config(config), timer=startup))
+
+@st.cache_resource
+def load_stream_metrics():
+    # Shared by all sessions: recent time-to-first-token and tokens/sec
+    return StreamMetrics()
+
+@st.cache_resource
+def load_prompt_metrics():
+    # Shared by all sessions: prompt tokens after context packing
+    return PromptMetrics(LLM_MODEL)
+
+@st.cache_resource
+def load_llm():
+    return background(lambda: ChatOpenAI(model=LLM_MODEL, temperature=0.2), startup, "llm client")
+
+embeddings = load_embeddings()
 
 # ---------------------------
-# Load Chroma collections
+# Load subject vector stores
 # ---------------------------
 @st.cache_resource
 def load_collections():
-    return {
-        "english": Chroma(persist_directory=f"{CHROMA_DIR}/english", embedding_function=embeddings),
-        "physics": Chroma(persist_directory=f"{CHROMA_DIR}/physics", embedding_function=embeddings),
-        "biology": Chroma(persist_directory=f"{CHROMA_DIR}/biology", embedding_function=embeddings),
-        "pakistan_studies": Chroma(persist_directory=f"{CHROMA_DIR}/pakistan_studies", embedding_function=embeddings),
-    }
+    # Opened in parallel in the background; a question only waits for its own subject
+    return open_stores_from_config(config, SUBJECT_NAMES, embeddings, lazy=True, timer=startup).prefetch()
+
+@st.cache_resource
+def load_lexical_indexes():
+    collections = load_collections()
+
+    def load(name):
+        db_dir = resolve_subject_dir(CHROMA_DIR, name)
+        # Only open the vector store if the BM25 index has to be built from it
+        return load_lexical_index(db_dir) or load_lexical_index(db_dir, collections[name])
+
+    return LazyMapping(SUBJECT_NAMES, load, timer=startup, label="bm25").prefetch()
+
+@st.cache_resource
+def load_ingestion_worker():
+    """One background ingestion thread per server process, shared by all sessions."""
+    collections = load_collections()
+    lexical_indexes = load_lexical_indexes()
+
+    def swap_collection(subject: str, db_path: str):
+        # Open the new generation fully before publishing it; queries use the old one until then
+        store = reopen_subject_store(collections[subject], CHROMA_DIR, subject, db_path, embeddings)
+        lexical_indexes[subject] = load_lexical_index(db_path, store)
+        collections[subject] = store
+        load_subject_router.clear()  # prototypes are rebuilt from the new collection on next use
+
+    return IngestionWorker(CHROMA_DIR, on_complete=swap_collection, embeddings=embeddings).start()
+
+@st.cache_resource
+def load_query_embedder():
+    # Cached across reruns so repeated questions skip the embedding forward pass
+    return QueryEmbedder(embeddings, max_size=config["QUERY_EMBED_CACHE_SIZE"])
+
+@st.cache_resource
+def load_compressor():
+    # None unless CONTEXT_COMPRESSION is on; its sentence-vector cache is shared by all sessions
+    return compressor_from_config(config, embeddings)
+
+@st.cache_resource
+def load_subject_router():
+    # A future: prototypes may need rebuilding, which should not block the first render
+    collections = load_collections()
+    return background(
+        lambda: load_router(CHROMA_DIR, collections, n_prototypes=config["ROUTER_PROTOTYPES"]), startup, "router"
+    )
+
+@st.cache_resource
+def load_preprocess_metrics():
+    return PreprocessMetrics()
+
+@st.cache_resource
+def load_memory_manager():
+    # Shared by every browser session; each one is keyed by its own session_id
+    return memory_manager_from_config(config)
 
 SUBJECTS = load_collections()
-memory_manager = MemoryManager()
+LEXICAL_INDEXES = load_lexical_indexes()
+query_embedder = load_query_embedder()
+compressor = load_compressor()
+router_future = load_subject_router()
+llm_future = load_llm()
+stream_metrics = load_stream_metrics()
+prompt_metrics = load_prompt_metrics()
+preprocess_metrics = load_preprocess_metrics()
+ingestion_worker = load_ingestion_worker()
+memory_manager = load_memory_manager()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
 
 # ---------------------------
 # Sidebar
@@ -66,12 +171,37 @@ with st.sidebar:
                 "biology": "bio.pdf",
                 "pakistan_studies": "pakstudies_dates.pdf"
             }[subject_choice])
-            with open(save_path, "wb") as f:
-                f.write(uploaded.getbuffer())
-            st.success(f"Saved PDF for {subject_choice}. Run ingestion or restart app to reload vectors.")
+            # The uploader keeps its file across reruns; only queue each upload once
+            upload_key = (subject_choice, uploaded.name, uploaded.size)
+            if st.session_state.get("last_upload") != upload_key:
+                with open(save_path, "wb") as f:
+                    f.write(uploaded.getbuffer())
+                ingestion_worker.submit(subject_choice, save_path)
+                st.session_state.last_upload = upload_key
+                st.success(f"Saved PDF for {subject_choice}. Indexing in the background — answers use the current index until it finishes.")
+
+    jobs = ingestion_worker.latest_jobs()
+    if jobs:
+        st.markdown("**Indexing status**")
+        for subj, job in jobs.items():
+            if job.status in ("queued", "running"):
+                st.progress(job.progress, text=f"{subj}: {job.message}")
+            elif job.status == "failed":
+                st.error(f"{subj}: {job.message}")
+            else:
+                st.caption(f"✅ {subj}: {job.message}")
+        st.button("🔄 Refresh status")
     st.markdown("---")
     if st.button("Show Memory (all)"):
         st.session_state.show_memory = True
+    with st.expander("⏱️ Startup timing"):
+        st.code(startup.report())
+    with st.expander("📈 Streaming latency"):
+        st.json(stream_metrics.summary())
+    with st.expander("📏 Prompt size"):
+        st.json(prompt_metrics.summary())
+    with st.expander("🧹 Preprocessing"):
+        st.json(preprocess_metrics.summary())
 
 # ---------------------------
 # Session state
@@ -84,11 +214,20 @@ if "show_memory" not in st.session_state:
 # ---------------------------
 # RAG answer function ✅ FIXED
 # ---------------------------
-def get_rag_answer(subject: str, query: str, k_docs=8, top_k=4, alpha=0.7) -> str:
-    """Retrieve docs, rerank, build context, call LLM, save memory, return plain text."""
-    docs = SUBJECTS[subject].similarity_search(query, k=k_docs)
-    reranked = hybrid_rank(docs, query, alpha=alpha, top_k=top_k)
-    context = build_context_string(reranked)
+def stream_rag_answer(subject: str, query: str, k_docs=config["RAG_K_DOCS"], top_k=config["RAG_TOP_K"], alpha=config["RAG_ALPHA"], prefetched=None) -> TokenStream:
+    """Retrieve docs (unless prefetched by fan-out), rerank, build context and stream the LLM answer; memory is saved when the stream ends."""
+    stats = StreamStats()
+    if prefetched is not None:
+        scored = prefetched
+    else:
+        query_vector = query_embedder.embed(query)
+        scored = hybrid_search(SUBJECTS[subject], LEXICAL_INDEXES[subject], query, query_vector, k=k_docs)
+    reranked = hybrid_rank_scored(scored, query, alpha=alpha, top_k=top_k)
+    docs = [doc for doc, _ in reranked]
+    if compressor is not None:
+        docs = compressor.compress(docs, query_embedder.embed(query))
+    packed = pack_context(docs, config["CONTEXT_TOKEN_BUDGET"], LLM_MODEL)
+    context = packed.text
 
     prompt_text = f"""
 You are an expert tutor. Use only the context below to answer accurately.
@@ -102,23 +241,15 @@ Question:
 
 Answer:
 """.strip()
+    prompt_metrics.record(packed, prompt_text)
 
-    response_obj = llm.invoke(prompt_text)
-
-    # ✅ Extract only the text portion cleanly
-    if hasattr(response_obj, "content"):
-        answer = response_obj.content.strip()
-    elif isinstance(response_obj, dict) and "output_text" in response_obj:
-        answer = response_obj["output_text"].strip()
-    else:
-        answer = str(response_obj).strip()
-
-    # ✅ Save to memory
-    mem = memory_manager.get_memory(subject)
-    if mem:
-        mem.save_context({"input": query}, {"output": answer})
+    # ✅ Save to memory once the full answer has arrived
+    def save_to_memory(answer: str) -> None:
+        mem = memory_manager.get_memory(subject, session_id)
+        if mem:
+            mem.save_context({"input": query}, {"output": answer})
 
-    return answer
+    return TokenStream(llm_future.result().stream(prompt_text), save_to_memory, stats, stream_metrics)
 
 # ---------------------------
 # Chat layout
@@ -143,34 +274,52 @@ with col2:
 # ---------------------------
 # Handle user input
 # ---------------------------
-if query:
-    cleaned, flagged, reasons = sanitize_user_input(query)
-    if flagged:
-        st.error("❌ Input rejected for safety: " + "; ".join(reasons))
+# Any rerun (e.g. "Refresh status") keeps the last question in the box; answer each question once
+if query and query != st.session_state.get("answered_query"):
+    st.session_state.answered_query = query
+    # Sanitize and scan the input once; every check below reads from the result
+    prepared = preprocess(query)
+    preprocess_metrics.record(prepared)
+    cleaned = prepared.cleaned
+    if prepared.flagged:
+        st.error("❌ Input rejected for safety: " + "; ".join(prepared.reasons))
     else:
-        maybe_name = extract_name(cleaned)
-        if maybe_name:
-            memory_manager.set_user_name(maybe_name)
-            st.session_state.conversation.append(("tutor", f"Nice to meet you, {maybe_name}!"))
-            st.success(f"Name saved: {maybe_name}")
-        elif is_small_talk(cleaned):
-            name = memory_manager.get_user_name() or "there"
+        if prepared.user_name:
+            memory_manager.set_user_name(prepared.user_name, session_id)
+            st.session_state.conversation.append(("tutor", f"Nice to meet you, {prepared.user_name}!"))
+            st.success(f"Name saved: {prepared.user_name}")
+        elif prepared.small_talk:
+            name = memory_manager.get_user_name(session_id) or "there"
             st.session_state.conversation.append(("tutor", f"Hello {name}, how can I help you today?"))
+        elif prepared.out_of_scope:
+            st.warning("⚠️ Sorry, I can only help with English, Physics, Biology, or Pakistan Studies.")
         else:
             # Detect subject
             subject = subject_choice if subject_choice != "auto" else None
-            ql = cleaned.lower()
-            if not subject:
-                if any(w in ql for w in ["noun","verb","grammar","english"]): subject="english"
-                elif any(w in ql for w in ["force","energy","motion","physics"]): subject="physics"
-                elif any(w in ql for w in ["cell","protein","dna","biology"]): subject="biology"
-                elif any(w in ql for w in ["pakistan","1947","independence","quaid"]): subject="pakistan_studies"
+            prefetched = None
+            with prepared.stage("route"):
+                if not subject:
+                    router = router_future.result()
+                    query_vector = query_embedder.embed(cleaned) if router is not None else None
+                    subject = detect_subject(cleaned, router, query_vector, min_confidence=config["ROUTER_MIN_CONFIDENCE"])
+                if not subject and config["FANOUT_ENABLED"]:
+                    # Unsure: search every subject at once and let the evidence decide
+                    fan = fanout_search(SUBJECTS, query_embedder.embed(cleaned), k=config["RAG_K_DOCS"])
+                    if fan.subject and fan.score >= config["FANOUT_MIN_RELEVANCE"]:
+                        subject, prefetched = fan.subject, fan.hits
 
             if subject:
                 try:
-                    answer = get_rag_answer(subject, cleaned)
+                    stream = stream_rag_answer(subject, cleaned, prefetched=prefetched)
+                    # Render tokens as they arrive, under the history shown above
+                    with col1:
+                        st.markdown(f"**You:** {cleaned}")
+                        st.markdown("**Tutor:**")
+                        st.write_stream(stream)
+                        timing = stream.stats.as_dict()
+                        st.caption(f"⏱️ first token {timing['ttft_ms']} ms · {timing['tokens_per_sec']} tokens/s")
                     st.session_state.conversation.append(("user", cleaned))
-                    st.session_state.conversation.append(("tutor", answer))
+                    st.session_state.conversation.append(("tutor", stream.text))
                 except Exception as e:
                     st.error(f"⚠️ Generation error: {str(e)}")
             else:
@@ -181,7 +330,7 @@ if query:
 # ---------------------------
 if st.session_state.show_memory:
     st.subheader("🧠 Stored Memory (per subject)")
-    for subj, mem in memory_manager.memories.items():
+    for subj, mem in memory_manager.session(session_id).memories.items():
         st.markdown(f"### {subj.capitalize()}")
         for m in getattr(mem, "chat_memory", []):
             content = getattr(m, "content", str(m))
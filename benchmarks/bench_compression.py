@@ -0,0 +1,106 @@
+"""
+bench_compression.py
+--------------------
+Prompt tokens and end-to-end latency with and without query-focused
+sentence compression (CONTEXT_COMPRESSION).
+
+Each question is a sentence taken from a random chunk of the subject, so we
+know which sentence answers it. For each one we run the same pipeline as
+ChatManager: vector search, hybrid rerank, optional compression,
+pack_context, prompt. The prompt then goes to FakeStreamingLLM, whose
+time to first token grows with prompt length (--prefill-ms per token).
+
+Reported per subject:
+- mean prompt tokens;
+- how often the answer sentence survived compression;
+- p50 compression time, cold (sentences embedded) and warm (cached);
+- p50 end-to-end latency (retrieval to last token).
+
+The embedding model comes from the usual config (EMBEDDING_BACKEND etc.).
+
+Usage:
+    python benchmarks/bench_compression.py [--questions 20] [--sentences 6] [--prefill-ms 0.2]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.context_compressor import SentenceCompressor, split_sentences
+from src.rag.context_packer import count_tokens, pack_context
+from src.rag.embedding_backends import embeddings_from_config
+from src.rag.hybrib_retriever import hybrid_rank_scored, search_with_scores
+from src.rag.streaming import FakeStreamingLLM
+from src.utils.config_loader import load_config
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+PROMPT = "You are an expert tutor. Use only the context from PDFs to answer accurately.\n\n" \
+         "Context:\n{context}\n\nQuestion:\n{question}\n\nAnswer:"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20, help="Questions per subject.")
+    parser.add_argument("--sentences", type=int, default=6, help="COMPRESSION_SENTENCES")
+    parser.add_argument("--neighbours", type=int, default=0, help="COMPRESSION_NEIGHBOURS")
+    parser.add_argument("--prefill-ms", type=float, default=0.2, help="Fake LLM delay per prompt token.")
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    config = load_config()
+    embeddings = embeddings_from_config(config)
+    llm = FakeStreamingLLM("A short answer of about a dozen words drawn from the context above.",
+                           first_token_delay=0.05, token_delay=0.002, prompt_token_delay=args.prefill_ms / 1000)
+
+    print(f"{'subject':>17} {'tokens full':>11} {'compressed':>10} {'answer kept':>11} "
+          f"{'cold ms':>8} {'warm ms':>8} {'e2e full ms':>11} {'e2e comp ms':>11}")
+    for subject in SUBJECTS:
+        store = Chroma(persist_directory=resolve_subject_dir(args.chroma_dir, subject), embedding_function=embeddings)
+        texts = store.get(include=["documents"])["documents"]
+        compressor = SentenceCompressor(embeddings, max_sentences=args.sentences, neighbours=args.neighbours)
+
+        rows = {"full": [], "comp": [], "kept": [], "cold": [], "warm": [], "e2e_full": [], "e2e_comp": []}
+        for pick in rng.integers(0, len(texts), size=args.questions):
+            sentences = [s for s in split_sentences(texts[pick]) if len(s) >= 40] or split_sentences(texts[pick])
+            question = sentences[rng.integers(0, len(sentences))]
+
+            for mode in ("full", "comp"):
+                start = time.perf_counter()
+                query_vector = embeddings.embed_query(question)
+                scored = search_with_scores(store, query_vector, k=config["RAG_K_DOCS"])
+                docs = [doc for doc, _ in hybrid_rank_scored(scored, question, config["RAG_ALPHA"], config["RAG_TOP_K"])]
+                if mode == "comp":
+                    t0 = time.perf_counter()
+                    compressed = compressor.compress(docs, query_vector)
+                    rows["cold"].append((time.perf_counter() - t0) * 1000)
+                    t0 = time.perf_counter()
+                    compressor.compress(docs, query_vector)
+                    rows["warm"].append((time.perf_counter() - t0) * 1000)
+                    in_context = any(question in split_sentences(d.page_content) for d in docs)
+                    if in_context:
+                        rows["kept"].append(any(question in d.page_content for d in compressed))
+                    docs = compressed
+                prompt = PROMPT.format(context=pack_context(docs, config["CONTEXT_TOKEN_BUDGET"]).text,
+                                       question=question)
+                rows[mode].append(count_tokens(prompt))
+                llm.invoke(prompt)
+                rows[f"e2e_{mode}"].append((time.perf_counter() - start) * 1000)
+
+        kept = f"{np.mean(rows['kept']):.0%}" if rows["kept"] else "n/a"
+        print(f"{subject:>17} {np.mean(rows['full']):>11.0f} {np.mean(rows['comp']):>10.0f} {kept:>11} "
+              f"{np.median(rows['cold']):>8.2f} {np.median(rows['warm']):>8.2f} "
+              f"{np.median(rows['e2e_full']):>11.0f} {np.median(rows['e2e_comp']):>11.0f}")
+    print("\n'answer kept' counts only questions whose source sentence was retrieved at all.")
+
+
+if __name__ == "__main__":
+    main()
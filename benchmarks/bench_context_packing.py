@@ -0,0 +1,79 @@
+"""
+bench_context_packing.py
+------------------------
+Prompt-context tokens before and after context packing on the ingested
+subject stores.
+
+Queries are stored chunk vectors with Gaussian noise added (so no embedding
+model is needed). For each query the top --k chunks are fetched from the
+subject's store and the best --top-k become the context, once through
+build_context_string (the old behaviour) and once through pack_context with
+overlap merging only (budget 0) and with each --budgets value.
+
+Usage:
+    python benchmarks/bench_context_packing.py [--queries 100] [--k 5] [--top-k 3] [--budgets 1500 800 400]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.context_packer import count_tokens, pack_context
+from src.rag.hybrib_retriever import build_context_string, search_with_scores
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100, help="Queries per subject.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[1500, 800, 400])
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    budgets = [0] + args.budgets
+    print(f"{'subject':>17} {'unpacked':>9} " + " ".join(f"{f'budget {b}' if b else 'dedup':>12}" for b in budgets)
+          + f" {'merged/q':>9} {'pack ms':>8}")
+    for subject in SUBJECTS:
+        store = Chroma(persist_directory=resolve_subject_dir(args.chroma_dir, subject))
+        vectors = np.asarray(store.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+        picks = rng.integers(0, len(vectors), size=args.queries)
+        queries = vectors[picks] + rng.normal(0, args.noise, size=(args.queries, vectors.shape[1])).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        raw, merged, pack_ms = [], [], []
+        packed_tokens = {b: [] for b in budgets}
+        for query in queries:
+            docs = [doc for doc, _ in search_with_scores(store, query.tolist(), k=args.k)][:args.top_k]
+            raw.append(count_tokens(build_context_string(docs), args.model))
+            for budget in budgets:
+                start = time.perf_counter()
+                packed = pack_context(docs, budget, args.model)
+                if budget == 0:
+                    pack_ms.append((time.perf_counter() - start) * 1000)
+                    merged.append(packed.chunks - packed.blocks)
+                packed_tokens[budget].append(packed.tokens)
+
+        mean_raw = np.mean(raw)
+        cells = " ".join(
+            f"{np.mean(packed_tokens[b]):>6.0f} ({1 - np.mean(packed_tokens[b]) / mean_raw:>3.0%})" for b in budgets
+        )
+        print(f"{subject:>17} {mean_raw:>9.0f} {cells} {np.mean(merged):>9.2f} {np.median(pack_ms):>8.2f}")
+    print("\nMean context tokens per query (saving vs unpacked in brackets).")
+
+
+if __name__ == "__main__":
+    main()
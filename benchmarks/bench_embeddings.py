@@ -0,0 +1,81 @@
+"""
+bench_embeddings.py
+-------------------
+Per-query and per-batch embedding latency for each embedding backend and
+thread count, on real chunk texts from the vector DBs.
+
+Per-query numbers are single embed_query calls on question-sized prefixes
+(the serving path); per-batch numbers are embed_documents on full chunks
+(the ingestion path).
+
+Usage:
+    python benchmarks/bench_embeddings.py [--backends torch onnx onnx-int8] [--threads 1 4] [--queries 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.embedding_backends import BACKENDS, load_embedding_backend
+from src.utils.config_loader import load_config
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+BATCH_SIZES = (1, 8, 32, 128)
+
+
+def corpus(chroma_dir: str) -> list:
+    texts = []
+    for subject in SUBJECTS:
+        texts += Chroma(persist_directory=resolve_subject_dir(chroma_dir, subject)).get(include=["documents"])["documents"]
+    return [t for t in texts if t]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chroma-dir", default="")
+    args = parser.parse_args()
+
+    config = load_config()
+    texts = corpus(args.chroma_dir or config["CHROMA_DB_DIR"])
+    questions = [" ".join(t.split()[:12]) for t in texts]
+
+    print(f"{'backend':>10} {'threads':>7} {'query p50':>10} {'query p99':>10}  "
+          + " ".join(f"{f'batch{b} ms':>11}" for b in BATCH_SIZES) + f" {'texts/s@' + str(BATCH_SIZES[-1]):>13}")
+    for backend in args.backends:
+        for threads in args.threads:
+            embeddings = load_embedding_backend(
+                backend, config["EMBEDDING_MODEL"], threads=threads, onnx_dir=config["EMBEDDING_ONNX_DIR"],
+                batch_size=BATCH_SIZES[-1],
+            )
+            embeddings.embed_query("warm up")
+
+            latencies = []
+            for i in range(args.queries):
+                start = time.perf_counter()
+                embeddings.embed_query(questions[i % len(questions)])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            batch_ms = []
+            for size in BATCH_SIZES:
+                batch = [texts[i % len(texts)] for i in range(size)]
+                start = time.perf_counter()
+                embeddings.embed_documents(batch)
+                batch_ms.append((time.perf_counter() - start) * 1000)
+
+            print(f"{backend:>10} {threads:>7} {np.percentile(latencies, 50):>10.2f} {np.percentile(latencies, 99):>10.2f}  "
+                  + " ".join(f"{ms:>11.1f}" for ms in batch_ms) + f" {BATCH_SIZES[-1] / batch_ms[-1] * 1000:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+bench_faiss.py
+--------------
+Recall@k and per-query latency of Chroma vs the FAISS backends (flat, HNSW,
+IVF) on the ingested subject stores.
+
+Queries are stored chunk vectors with Gaussian noise added (so no embedding
+model is needed), renormalised to unit length. Ground truth is an exact
+numpy brute-force search over the same vectors. FAISS indexes are exported
+to a temporary directory, not to chroma_db/faiss.
+
+Usage:
+    python benchmarks/bench_faiss.py [--queries 200] [--k 5] [--noise 0.05] [--chroma-dir chroma_db]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.ingest.faiss_export import export_subject
+from src.rag.faiss_store import FaissStore, INDEX_TYPES
+from src.routing.router_agent import store_embeddings
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    d2 = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(-1)
+    return np.argsort(d2, axis=1)[:, :k]
+
+
+def measure(search, queries: np.ndarray, truth_ids: list, k: int):
+    """Return (recall@k, p50 ms, p99 ms) for a search(vector, k) -> ids callable."""
+    latencies, hits = [], 0
+    for query, truth in zip(queries, truth_ids):
+        start = time.perf_counter()
+        got = search(query.tolist(), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(got) & set(truth))
+    return hits / (len(queries) * k), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'subject':>17} {'backend':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for subject in SUBJECTS:
+            source_dir = resolve_subject_dir(args.chroma_dir, subject)
+            chroma = Chroma(persist_directory=source_dir)
+            got = chroma.get(include=["embeddings"])
+            ids, vectors = got["ids"], np.asarray(got["embeddings"], dtype=np.float32)
+            k = min(args.k, len(ids))
+
+            picks = rng.integers(0, len(vectors), size=args.queries)
+            queries = vectors[picks] + rng.normal(0, args.noise, size=(args.queries, vectors.shape[1])).astype(np.float32)
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+            truth = [[ids[i] for i in row] for row in exact_top_k(vectors, queries, k)]
+
+            backends = {"chroma": chroma}
+            for index_type in INDEX_TYPES:
+                out_dir = os.path.join(tmp, f"{subject}-{index_type}")
+                export_subject(source_dir, out_dir, index_type)
+                backends[index_type] = FaissStore(out_dir)
+            assert store_embeddings(backends["flat"]).shape == vectors.shape
+
+            for name, store in backends.items():
+                def search(vector, k, store=store):
+                    return [doc.id for doc, _ in store.similarity_search_by_vector_with_relevance_scores(vector, k=k)]
+                recall, p50, p99 = measure(search, queries, truth, k)
+                print(f"{subject:>17} {name:>8} {recall:>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
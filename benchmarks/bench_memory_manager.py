@@ -0,0 +1,112 @@
+"""
+bench_memory_manager.py
+-----------------------
+Memory held by MemoryManager as the number of students grows.
+
+Simulates --sessions students each asking --turns questions (answers of
+--answer-chars characters). Students arrive in waves of --concurrent,
+whose questions interleave at random. Runs with the windowed, evicting
+MemoryManager and with the previous one: a single shared set of unbounded
+buffers that every student wrote into.
+
+Reported for each: sessions held, the manager's own size estimate, the
+growth in process RSS, evictions, and the time per save_context. With
+--spill-dir, evicted sessions are written to disk and a sample of them is
+read back to check nothing was lost.
+
+Usage:
+    python benchmarks/bench_memory_manager.py [--sessions 20000] [--turns 30] [--concurrent 1000] [--max-mb 64]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.utils.memory_manager import SUBJECTS, MemoryManager
+
+
+class LegacyMemoryManager:
+    """The previous MemoryManager: one unbounded buffer per subject, shared by everyone."""
+
+    def __init__(self):
+        self.memories = {subject: [] for subject in SUBJECTS}
+
+    def get_memory(self, subject, session_id=None):
+        return self
+
+    def save(self, subject, query, answer):
+        self.memories[subject] += [query, answer]
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def simulate(args, manager, legacy: bool) -> dict:
+    rng = np.random.default_rng(0)
+    answer = "x" * args.answer_chars
+    # Each wave of students asks its questions interleaved at random, then the next wave arrives
+    waves = [np.arange(first, min(first + args.concurrent, args.sessions))
+             for first in range(0, args.sessions, args.concurrent)]
+    order = np.concatenate([rng.permutation(np.repeat(wave, args.turns)) for wave in waves])
+    before = rss_mb()
+    start = time.perf_counter()
+    for step, student in enumerate(order):
+        subject = SUBJECTS[step % len(SUBJECTS)]
+        query = f"student {student} question {step}"
+        reply = f"{step}: {answer}"  # a fresh string per answer, as from the LLM
+        if legacy:
+            manager.save(subject, query, reply)
+        else:
+            manager.get_memory(subject, f"s{student}").save_context({"input": query}, {"output": reply})
+    per_save_us = (time.perf_counter() - start) / len(order) * 1e6
+    return {"rss_mb": rss_mb() - before, "per_save_us": per_save_us}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--turns", type=int, default=30, help="Questions per student.")
+    parser.add_argument("--concurrent", type=int, default=1000, help="Students active at the same time.")
+    parser.add_argument("--answer-chars", type=int, default=1200)
+    parser.add_argument("--window", type=int, default=10, help="MEMORY_WINDOW_TURNS")
+    parser.add_argument("--max-sessions", type=int, default=5000, help="MEMORY_MAX_SESSIONS")
+    parser.add_argument("--max-mb", type=float, default=64, help="MEMORY_MAX_MB")
+    parser.add_argument("--spill-dir", default=None, help="MEMORY_SPILL_DIR (a temporary directory if 'tmp').")
+    parser.add_argument("--legacy", action="store_true", help="Also run the unbounded shared buffers (slow, large).")
+    args = parser.parse_args()
+
+    print(f"{'manager':>10} {'sessions':>8} {'approx MB':>9} {'RSS +MB':>8} {'idle':>6} {'lru':>6} "
+          f"{'memory':>6} {'spilled':>7} {'save us':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        spill_dir = tmp if args.spill_dir == "tmp" else args.spill_dir
+        manager = MemoryManager(window_turns=args.window, max_sessions=args.max_sessions,
+                                max_memory_mb=args.max_mb, spill_dir=spill_dir)
+        r = simulate(args, manager, legacy=False)
+        s = manager.stats()
+        print(f"{'windowed':>10} {s['sessions']:>8} {s['approx_mb']:>9.1f} {r['rss_mb']:>8.1f} "
+              f"{s['evicted']['idle']:>6} {s['evicted']['lru']:>6} {s['evicted']['memory']:>6} "
+              f"{s['spilled']:>7} {r['per_save_us']:>8.1f}")
+
+        if spill_dir:
+            # Students who were evicted come back with their last window intact
+            sample = [f"s{i}" for i in range(min(100, args.sessions))]
+            lost = sum(1 for sid in sample if not len(manager.get_memory(SUBJECTS[0], sid).chat_memory))
+            print(f"\nrestored {manager.stats()['restored']} spilled sessions; {lost} of {len(sample)} came back empty")
+
+        if args.legacy:
+            legacy = LegacyMemoryManager()
+            r = simulate(args, legacy, legacy=True)
+            print(f"{'legacy':>10} {1:>8} {'n/a':>9} {r['rss_mb']:>8.1f} {'-':>6} {'-':>6} {'-':>6} {'-':>7} "
+                  f"{r['per_save_us']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
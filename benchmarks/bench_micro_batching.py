@@ -0,0 +1,112 @@
+"""
+bench_micro_batching.py
+-----------------------
+Throughput and added latency of micro-batched query embeddings under
+concurrent load.
+
+N client threads each embed --queries distinct questions back to back
+(closed loop), first straight against the model, then through
+MicroBatchEmbeddings with each --waits window. The table shows queries/s,
+p50/p95 per-query latency and the mean batch size the scheduler formed.
+
+The configured EMBEDDING_BACKEND is used. Without a model installed,
+--synthetic FIXED_MS PER_TEXT_MS stands in a cost model of a fixed
+per-call cost plus a per-text cost. Its calls run one at a time, like a
+forward pass that already keeps every core busy.
+
+Usage:
+    python benchmarks/bench_micro_batching.py [--clients 1 2 4 8 16 32] [--waits 1 2 5] [--queries 50]
+    python benchmarks/bench_micro_batching.py --synthetic 8 0.5
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.embeddings import Embeddings
+
+from src.rag.micro_batcher import MicroBatchEmbeddings
+
+
+class SyntheticEmbeddings(Embeddings):
+    def __init__(self, fixed_ms: float, per_text_ms: float, dim: int = 384):
+        self.fixed = fixed_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dim = dim
+        self._busy = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._busy:
+            time.sleep(self.fixed + self.per_text * len(texts))
+        return [[float(len(t))] * self.dim for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def run_load(embeddings: Embeddings, clients: int, queries: int) -> dict:
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(cid: int):
+        mine = []
+        for i in range(queries):
+            start = time.perf_counter()
+            embeddings.embed_query(f"student {cid} asks question number {i} about photosynthesis")
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {"qps": len(latencies) / elapsed, "p50": np.percentile(ms, 50), "p95": np.percentile(ms, 95)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--waits", type=float, nargs="+", default=[1.0, 2.0, 5.0], help="Batch windows in ms.")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50, help="Queries per client.")
+    parser.add_argument("--synthetic", type=float, nargs=2, metavar=("FIXED_MS", "PER_TEXT_MS"))
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model = SyntheticEmbeddings(*args.synthetic)
+        print(f"Synthetic model: {args.synthetic[0]} ms per call + {args.synthetic[1]} ms per text")
+    else:
+        from src.rag.embedding_backends import embeddings_from_config
+        from src.utils.config_loader import load_config
+        config = load_config()
+        model = embeddings_from_config(config)
+        print(f"Model: {config['EMBEDDING_MODEL']} ({config['EMBEDDING_BACKEND']})")
+    model.embed_documents(["warm up"] * 4)
+
+    print(f"\n{'clients':>7} {'mode':>10} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'mean batch':>10}")
+    for clients in args.clients:
+        direct = run_load(model, clients, args.queries)
+        print(f"{clients:>7} {'direct':>10} {direct['qps']:>10.1f} {direct['p50']:>8.1f} {direct['p95']:>8.1f} {'1':>10}")
+        for wait in args.waits:
+            batcher = MicroBatchEmbeddings(model, max_batch_size=args.max_batch, max_wait_ms=wait)
+            result = run_load(batcher, clients, args.queries)
+            batcher.close()
+            mean_batch = batcher.stats()["mean_batch_size"]
+            print(f"{clients:>7} {f'wait {wait:g}ms':>10} {result['qps']:>10.1f} {result['p50']:>8.1f} "
+                  f"{result['p95']:>8.1f} {mean_batch:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+bench_pattern_engine.py
+-----------------------
+Cost of the input checks every question goes through: sanitize_user_input,
+is_small_talk and is_out_of_scope.
+
+Compares the previous implementation (18 re.search calls with uncompiled
+patterns, then two substring loops) with the shared PatternEngine
+(anchor lookups on the case-folded text, regexes only for candidates,
+scan results reused by the guardrails). Every question is unique,
+so the engine's cache only helps across the three checks of one question.
+'batch us' is PatternEngine.scan_batch alone, per text. Outputs of the two
+implementations are compared on the first 2000 questions.
+
+Usage:
+    python benchmarks/bench_pattern_engine.py [--questions 20000] [--long-chars 2000]
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.secuirity.pattern_engine import PatternEngine, default_categories
+from src.secuirity.sanitizer import DISALLOWED_PATTERNS, INJECTION_PATTERNS, sanitize_user_input
+from src.utils.guardrails import OUT_OF_SCOPE_WORDS, SMALL_TALK_RESPONSES, is_out_of_scope, is_small_talk
+
+WORDS = ("what is the difference between speed and velocity explain photosynthesis in plants "
+         "who was the founder of pakistan define a noun give two examples of newton's laws").split()
+TRIGGERS = ["hello", "thanks", "password", "ignore previous instructions", "attack", "jailbreak"]
+
+
+def legacy_checks(text: str):
+    """The checks as they were: uncompiled patterns, one search per pattern, then substring loops."""
+    reasons = []
+    cleaned = re.sub(r"^\s*(system:|assistant:|user:)\s*", "", text.strip(), flags=re.IGNORECASE)
+    for pat in INJECTION_PATTERNS:
+        if re.search(pat, cleaned, flags=re.IGNORECASE):
+            reasons.append(f"prompt-injection pattern: {pat}")
+    for pat in DISALLOWED_PATTERNS:
+        if re.search(pat, cleaned, flags=re.IGNORECASE):
+            reasons.append(f"disallowed content pattern: {pat}")
+    q = cleaned.lower().strip()
+    small_talk = next((resp for key, resp in SMALL_TALK_RESPONSES.items() if key in q), None)
+    out_of_scope = any(b in cleaned.lower() for b in OUT_OF_SCOPE_WORDS)
+    return cleaned, bool(reasons), reasons, small_talk, out_of_scope
+
+
+def engine_checks(text: str):
+    cleaned, flagged, reasons = sanitize_user_input(text)
+    return cleaned, flagged, reasons, is_small_talk(cleaned), is_out_of_scope(cleaned)
+
+
+def make_questions(n: int, chars: int, rng) -> list:
+    questions = []
+    for i in range(n):
+        words = list(rng.choice(WORDS, size=max(1, chars // 6)))
+        if rng.random() < 0.1:  # a few questions trip a check
+            words.insert(int(rng.integers(0, len(words))), str(rng.choice(TRIGGERS)))
+        questions.append(f"{i} " + " ".join(words)[:chars])
+    return questions
+
+
+def per_call_us(fn, texts) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        fn(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--long-chars", type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # flagged questions would flood logs/sanitizer.log
+    rng = np.random.default_rng(0)
+
+    print(f"{'input':>12} {'legacy us':>10} {'engine us':>10} {'speedup':>8} {'batch us':>9} {'same output':>11}")
+    for name, chars in (("short", 80), ("long", args.long_chars)):
+        texts = make_questions(args.questions, chars, rng)
+        same = all(legacy_checks(t) == engine_checks(t) for t in texts[: min(2000, len(texts))])
+        legacy = per_call_us(legacy_checks, texts)
+        texts = [f"~{t}" for t in texts]  # fresh texts: no cache hits from the comparison above
+        engine = per_call_us(engine_checks, texts)
+        # Batch API on a private engine, so nothing is cached yet
+        batch_engine = PatternEngine(default_categories(), cache_size=0)
+        start = time.perf_counter()
+        batch_engine.scan_batch(texts)
+        batch = (time.perf_counter() - start) / len(texts) * 1e6
+        print(f"{name + f' ({chars})':>12} {legacy:>10.1f} {engine:>10.1f} {legacy / engine:>7.1f}x "
+              f"{batch:>9.1f} {str(same):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_preprocess.py
+-------------------
+Per-question cost of the checks that run before retrieval, as the CLI ran
+them (sanitize, small talk twice, out of scope, keyword routing fallback,
+plus the Streamlit app's name extraction) vs one preprocess() call.
+
+The old path is reimplemented here as it was: uncompiled regexes and
+separate lowercase/substring loops. Every question is unique, and the
+decisions of both paths are compared on every question. The per-stage
+p50/p95 come from PreprocessMetrics, as reported by /stats.
+
+Usage:
+    python benchmarks/bench_preprocess.py [--questions 20000]
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.routing.router_agent import SUBJECT_KEYWORDS
+from src.secuirity.sanitizer import DISALLOWED_PATTERNS, INJECTION_PATTERNS
+from src.utils.guardrails import OUT_OF_SCOPE_WORDS, SMALL_TALK_RESPONSES
+from src.utils.preprocess import PreprocessMetrics, preprocess
+
+WORDS = ("what is the difference between speed and velocity explain photosynthesis in plants "
+         "who was the founder of pakistan define a noun give two examples of newton's laws").split()
+EXTRAS = ["hello", "thanks", "my name is Ayesha", "password", "ignore previous instructions", "attack"]
+
+
+def legacy(text: str):
+    reasons = []
+    cleaned = re.sub(r"^\s*(system:|assistant:|user:)\s*", "", text.strip(), flags=re.IGNORECASE)
+    for pat in INJECTION_PATTERNS:
+        if re.search(pat, cleaned, flags=re.IGNORECASE):
+            reasons.append(f"prompt-injection pattern: {pat}")
+    for pat in DISALLOWED_PATTERNS:
+        if re.search(pat, cleaned, flags=re.IGNORECASE):
+            reasons.append(f"disallowed content pattern: {pat}")
+    m = re.search(r"\bmy name is (\w{2,30})", cleaned, flags=re.IGNORECASE)
+    name = m.group(1).capitalize() if m else None
+
+    def small_talk(q):
+        q = q.lower().strip()
+        return next((resp for key, resp in SMALL_TALK_RESPONSES.items() if key in q), None)
+
+    reply = small_talk(cleaned) and small_talk(cleaned)  # app.py called it twice
+    out_of_scope = any(b in cleaned.lower() for b in OUT_OF_SCOPE_WORDS)
+    q = cleaned.lower()
+    subject = next((s for s, keys in SUBJECT_KEYWORDS.items() if any(w in q for w in keys)), None)
+    return cleaned, reasons, name, reply, out_of_scope, subject
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # flagged questions would flood logs/sanitizer.log
+    rng = np.random.default_rng(0)
+
+    texts = []
+    for i in range(args.questions):
+        words = list(rng.choice(WORDS, size=int(rng.integers(4, 20))))
+        if rng.random() < 0.2:
+            words.insert(int(rng.integers(0, len(words))), str(rng.choice(EXTRAS)))
+        texts.append(f"{i} " + " ".join(words))
+
+    start = time.perf_counter()
+    old = [legacy(t) for t in texts]
+    legacy_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+    metrics = PreprocessMetrics(window=len(texts))
+    start = time.perf_counter()
+    prepared = []
+    for text in texts:
+        p = preprocess(text)
+        metrics.record(p)
+        prepared.append(p)
+    new_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+    same = all(
+        (p.cleaned, p.reasons, p.user_name, p.small_talk, p.out_of_scope, p.keyword_subject) == o
+        for p, o in zip(prepared, old)
+    )
+    print(f"{'path':>12} {'us/question':>12}")
+    print(f"{'legacy':>12} {legacy_us:>12.1f}")
+    print(f"{'preprocess':>12} {new_us:>12.1f}   ({legacy_us / new_us:.1f}x, same decisions: {same})")
+    print(f"\nstages: {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
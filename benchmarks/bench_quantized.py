@@ -0,0 +1,94 @@
+"""
+bench_quantized.py
+------------------
+Memory footprint and recall loss of the quantized FAISS index types
+(sq8 = int8 codes, fp16 = float16 codes) against exact float32 search, per
+subject, with and without full-precision rescoring.
+
+"index MB" is the size of the vector codes a search scans and keeps
+resident; the float32 vectors used for rescoring stay in a memory-mapped
+file and only the candidates' rows are paged in.
+
+The bundled subjects are small, so --synthetic N adds a clustered random
+corpus of N vectors to show how the numbers hold up at textbook scale.
+
+Usage:
+    python benchmarks/bench_quantized.py [--queries 200] [--k 5] [--rescore 4] [--synthetic 100000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_chroma import Chroma
+
+from bench_faiss import exact_top_k
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.faiss_store import FaissStore, write_faiss_dir
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+
+
+def noisy_queries(vectors: np.ndarray, n: int, noise: float, rng) -> np.ndarray:
+    picks = rng.integers(0, len(vectors), size=n)
+    queries = vectors[picks] + rng.normal(0, noise, size=(n, vectors.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def synthetic_corpus(n: int, dim: int, rng, clusters: int = 200) -> np.ndarray:
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, size=n)] + rng.normal(0, 0.6, size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def report(name: str, vectors: np.ndarray, queries: np.ndarray, k: int, rescore: int, tmp: str) -> None:
+    k = min(k, len(vectors))
+    truth = exact_top_k(vectors, queries, k) if len(vectors) <= 20000 else None
+    ids = [str(i) for i in range(len(vectors))]
+    texts, metas = [""] * len(vectors), [{}] * len(vectors)
+    float_mb = vectors.nbytes / 2**20
+
+    for index_type in ("flat", "sq8", "fp16"):
+        out_dir = os.path.join(tmp, f"{name}-{index_type}")
+        write_faiss_dir(out_dir, ids, texts, metas, vectors, index_type)
+        for factor in ((0,) if index_type == "flat" else (0, rescore)):
+            store = FaissStore(out_dir, rescore=factor)
+            _, got = store.search_vectors(queries, k)
+            if truth is None:  # too big for brute force in numpy; the flat index is exact
+                truth = got
+            recall = np.mean([len(set(g) & set(t)) / k for g, t in zip(got, truth)])
+            mb = store.index_bytes() / 2**20
+            label = index_type if index_type == "flat" else f"{index_type}{'+rescore' if factor else ''}"
+            print(f"{name:>17} {label:>13} {mb:>9.2f} {float_mb / mb:>6.1f}x {recall:>9.4f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, default=4)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--synthetic", type=int, default=0, help="Also benchmark a synthetic corpus of N vectors.")
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'corpus':>17} {'index':>13} {'index MB':>9} {'saved':>7} {'recall@k':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for subject in SUBJECTS:
+            got = Chroma(persist_directory=resolve_subject_dir(args.chroma_dir, subject)).get(include=["embeddings"])
+            vectors = np.asarray(got["embeddings"], dtype=np.float32)
+            report(subject, vectors, noisy_queries(vectors, args.queries, args.noise, rng), args.k, args.rescore, tmp)
+        if args.synthetic:
+            vectors = synthetic_corpus(args.synthetic, 384, rng)
+            queries = noisy_queries(vectors, args.queries, args.noise * 4, rng)
+            report(f"synthetic-{args.synthetic}", vectors, queries, args.k, args.rescore, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+bench_rerank.py
+---------------
+Per-query lexical rerank cost as the candidate count grows: the original
+per-document partial_ratio loop vs the batched rapidfuzz cdist path.
+
+Usage:
+    python benchmarks/bench_rerank.py [--repeat 50] [--workers -1]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.rag.hybrib_retriever import lexical_score, lexical_scores, lowered_chunk
+
+WORDS = (
+    "force motion energy newton velocity gravity cell protein enzyme photosynthesis "
+    "pakistan independence constitution movement grammar noun verb sentence essay "
+    "the of and to in is that for with as on by was were from this which"
+).split()
+
+
+def make_chunks(n: int, size: int = 1000) -> list:
+    rng = random.Random(n)
+    chunks = []
+    for _ in range(n):
+        words = []
+        while sum(len(w) + 1 for w in words) < size:
+            words.append(rng.choice(WORDS).capitalize() if rng.random() < 0.1 else rng.choice(WORDS))
+        chunks.append(" ".join(words))
+    return chunks
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=-1)
+    args = parser.parse_args()
+
+    query = "What is Newton's law of motion about force and velocity?"
+    print(f"{'candidates':>10} {'loop ms':>10} {'batch ms':>10} {'speedup':>8}")
+    for n in (5, 10, 25, 50, 100, 200, 400):
+        chunks = make_chunks(n)
+        lowered = [lowered_chunk(c) for c in chunks]
+
+        loop_ms = timed(lambda: [lexical_score(query, c[:2000]) for c in chunks], args.repeat)
+        batch_ms = timed(
+            lambda: lexical_scores(query, [lowered_chunk(c) for c in chunks], workers=args.workers), args.repeat
+        )
+        assert np.allclose(lexical_scores(query, lowered), [lexical_score(query, c[:2000]) for c in chunks], atol=1e-3)
+        print(f"{n:>10} {loop_ms:>10.3f} {batch_ms:>10.3f} {loop_ms / batch_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
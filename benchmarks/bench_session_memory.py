@@ -0,0 +1,112 @@
+"""
+bench_session_memory.py
+-----------------------
+Write and read cost of SessionMemory for long sessions: the append-only
+JSONL log (batched fsync, and fsync on every add) vs the previous
+implementation, which rewrote the whole JSON file on every message.
+
+For each session length the table shows the total time to write every
+turn, p50/p99 per add, the time to reopen the session and read its last
+20 messages (lazy tail), and a full show().
+
+The old implementation is O(n^2) over a session, so it only runs up to
+--legacy-max turns.
+
+Usage:
+    python benchmarks/bench_session_memory.py [--turns 1000 10000 50000] [--legacy-max 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.memory.session_memory import SessionMemory
+
+MESSAGE = "Explain the difference between speed and velocity with an everyday example. " * 3
+
+
+class LegacySessionMemory:
+    """The previous SessionMemory: the whole history is rewritten on every add."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.data = []
+        if os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def add(self, role: str, content: str):
+        self.data.append({"role": role, "content": content})
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+
+    def show(self):
+        return self.data
+
+    def tail(self, n: int):
+        return self.data[-n:]
+
+    def close(self):
+        pass
+
+
+def run(factory, path: str, turns: int) -> dict:
+    memory = factory(path)
+    adds = np.empty(turns)
+    start = time.perf_counter()
+    for i in range(turns):
+        t0 = time.perf_counter()
+        memory.add("user" if i % 2 == 0 else "tutor", f"{i}: {MESSAGE}")
+        adds[i] = time.perf_counter() - t0
+    total = time.perf_counter() - start
+    memory.close()
+
+    t0 = time.perf_counter()
+    reopened = factory(path)
+    last = reopened.tail(20)
+    tail_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    messages = reopened.show()
+    show_ms = (time.perf_counter() - t0) * 1000
+    reopened.close()
+    assert len(messages) == turns and last[-1]["content"].startswith(f"{turns - 1}:")
+    return {
+        "total_s": total, "p50_us": np.percentile(adds, 50) * 1e6, "p99_us": np.percentile(adds, 99) * 1e6,
+        "tail_ms": tail_ms, "show_ms": show_ms, "mb": os.path.getsize(path) / 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    args = parser.parse_args()
+
+    variants = {
+        "jsonl": (lambda p: SessionMemory(p, fsync_interval=1.0), ".jsonl"),
+        "jsonl+fsync": (lambda p: SessionMemory(p, fsync_interval=0), ".jsonl"),
+        "legacy json": (LegacySessionMemory, ".json"),
+    }
+    print(f"{'turns':>6} {'backend':>12} {'write s':>8} {'add p50 us':>10} {'add p99 us':>10} "
+          f"{'open+tail ms':>12} {'show ms':>8} {'MB':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for turns in args.turns:
+            for name, (factory, suffix) in variants.items():
+                if name == "legacy json" and turns > args.legacy_max:
+                    print(f"{turns:>6} {name:>12} {'skipped (O(n^2))':>30}")
+                    continue
+                path = os.path.join(tmp, f"{name.replace(' ', '_').replace('+', '_')}-{turns}{suffix}")
+                r = run(factory, path, turns)
+                print(f"{turns:>6} {name:>12} {r['total_s']:>8.2f} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} "
+                      f"{r['tail_ms']:>12.2f} {r['show_ms']:>8.1f} {r['mb']:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+bench_startup.py
+----------------
+Startup cost of the two vector-store layouts: four per-subject Chroma
+directories vs one unified collection with subject filters.
+
+Each run is a fresh Python process that imports the retrieval stack, opens
+every subject store plus its BM25 index and runs one vector query per
+subject (HNSW segments load lazily, on first query). It reports wall time,
+resident memory above the post-import baseline, and open file handles.
+The embedding model is not loaded; queries reuse a stored chunk vector.
+
+Run `python -m src.ingest.unified_index` first to build the unified collection.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--chroma-dir chroma_db]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def child(layout: str, chroma_dir: str) -> None:
+    from src.rag.vector_stores import open_subject_stores
+    from src.rag.bm25_index import load_lexical_index
+    from src.ingest.collection_paths import resolve_subject_dir
+    from src.rag.hybrib_retriever import search_with_scores
+
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    stores = open_subject_stores(chroma_dir, SUBJECTS, layout=layout)
+    lexical = {s: load_lexical_index(resolve_subject_dir(chroma_dir, s)) for s in SUBJECTS}
+    opened = time.perf_counter()
+    for store in stores.values():
+        vector = store.get(include=["embeddings"], limit=1)["embeddings"][0]
+        search_with_scores(store, list(vector), k=5)
+    ready = time.perf_counter()
+    print(json.dumps({
+        "open_ms": (opened - start) * 1000,
+        "ready_ms": (ready - start) * 1000,
+        "rss_mb": rss_mb() - base_rss,
+        "fds": open_fds(),
+        "lexical": sum(1 for idx in lexical.values() if idx is not None),
+    }))
+
+
+def run_once(layout: str, chroma_dir: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", layout, "--chroma-dir", chroma_dir],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--child", choices=["per_subject", "unified"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.chroma_dir)
+        return
+
+    print(f"{'layout':>12} {'open ms':>9} {'ready ms':>9} {'RSS +MB':>8} {'fds':>5}")
+    for layout in ("per_subject", "unified"):
+        runs = [run_once(layout, args.chroma_dir) for _ in range(args.runs)]
+        med = {key: statistics.median(r[key] for r in runs) for key in ("open_ms", "ready_ms", "rss_mb", "fds")}
+        print(f"{layout:>12} {med['open_ms']:>9.1f} {med['ready_ms']:>9.1f} {med['rss_mb']:>8.1f} {med['fds']:>5.0f}")
+
+
+if __name__ == "__main__":
+    main()
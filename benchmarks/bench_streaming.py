@@ -0,0 +1,58 @@
+"""
+bench_streaming.py
+------------------
+Time-to-first-token vs full-answer latency with the local FakeStreamingLLM,
+through the same TokenStream / AsyncTokenStream wrappers ChatManager and
+the apps use. The streaming contract itself (on_complete only after the
+last token, nothing saved for an abandoned stream) is covered by
+tests/test_streaming.py.
+
+Usage:
+    python benchmarks/bench_streaming.py [--tokens 200] [--first-token-delay 0.3] [--token-delay 0.01]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.rag.streaming import AsyncTokenStream, FakeStreamingLLM, StreamMetrics, StreamStats, TokenStream
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    answer = " ".join(f"word{i}" for i in range(args.tokens))
+    llm = FakeStreamingLLM(answer, first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    metrics = StreamMetrics()
+
+    start = time.perf_counter()
+    invoked = llm.invoke("prompt")
+    blocking_ms = (time.perf_counter() - start) * 1000
+
+    stream = TokenStream(llm.stream("prompt"), lambda text: None, StreamStats(), metrics)
+    streamed = "".join(stream)
+
+    async def consume():
+        astream = AsyncTokenStream(llm.astream("prompt"), lambda text: None, StreamStats(), metrics)
+        return "".join([piece async for piece in astream]), astream.stats
+
+    astreamed, async_stats = asyncio.run(consume())
+
+    print(f"{'mode':>10} {'first token ms':>15} {'full answer ms':>15} {'tokens/s':>9}")
+    print(f"{'blocking':>10} {blocking_ms:>15.0f} {blocking_ms:>15.0f} {'-':>9}")
+    for name, stats in (("stream", stream.stats), ("astream", async_stats)):
+        total = (stats.finished_at - stats.started) * 1000
+        print(f"{name:>10} {stats.ttft_ms:>15.0f} {total:>15.0f} {stats.tokens_per_sec:>9.1f}")
+    print(f"\nsame text as invoke: {streamed == invoked == astreamed}; metrics: {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+check_embedding_parity.py
+-------------------------
+Checks that an embedding backend reproduces the vectors already stored in
+the vector DBs (which were written by the default torch backend).
+
+Every sampled chunk is re-embedded with the chosen backend and compared
+with its stored vector (cosine), and we check that each re-embedded chunk
+still retrieves itself as the nearest stored vector. Exits non-zero when
+the lowest cosine falls below --min-cosine.
+
+Usage:
+    python benchmarks/check_embedding_parity.py --backend onnx [--min-cosine 0.99]
+    python benchmarks/check_embedding_parity.py --backend onnx-int8 --min-cosine 0.97
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.embedding_backends import BACKENDS, load_embedding_backend
+from src.utils.config_loader import load_config
+
+SUBJECTS = ["english", "physics", "biology", "pakistan_studies"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default="onnx")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--sample", type=int, default=200, help="Chunks per subject (0 = all).")
+    parser.add_argument("--chroma-dir", default="")
+    args = parser.parse_args()
+
+    config = load_config()
+    chroma_dir = args.chroma_dir or config["CHROMA_DB_DIR"]
+    embeddings = load_embedding_backend(
+        args.backend, config["EMBEDDING_MODEL"], threads=args.threads, onnx_dir=config["EMBEDDING_ONNX_DIR"]
+    )
+
+    worst = 1.0
+    print(f"{'subject':>17} {'chunks':>7} {'min cos':>8} {'mean cos':>9} {'self@1':>7}")
+    for subject in SUBJECTS:
+        got = Chroma(persist_directory=resolve_subject_dir(chroma_dir, subject)).get(
+            include=["documents", "embeddings"], limit=args.sample or None
+        )
+        stored = np.asarray(got["embeddings"], dtype=np.float32)
+        stored /= np.linalg.norm(stored, axis=1, keepdims=True)
+        fresh = np.asarray(embeddings.embed_documents(got["documents"]), dtype=np.float32)
+        fresh /= np.linalg.norm(fresh, axis=1, keepdims=True)
+
+        cosine = (stored * fresh).sum(axis=1)
+        self_hit = np.mean((fresh @ stored.T).argmax(axis=1) == np.arange(len(stored)))
+        worst = min(worst, float(cosine.min()))
+        print(f"{subject:>17} {len(stored):>7} {cosine.min():>8.4f} {cosine.mean():>9.4f} {self_hit:>7.3f}")
+
+    ok = worst >= args.min_cosine
+    print(f"\n{'✅' if ok else '❌'} {args.backend}: lowest cosine {worst:.4f} (threshold {args.min_cosine})")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
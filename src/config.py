@@ -44,6 +44,13 @@ VECTOR_DB_DIRS: dict[str, Path] = {
     subject: Path(CHROMA_DB_DIR) / subject for subject in SUBJECT_PATHS
 }
 
+# -----------------------------------------------------
+# 4️⃣b Ingestion pipeline
+# -----------------------------------------------------
+INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_PAGES_PER_TASK: int = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
 # -----------------------------------------------------
 # 5️⃣ LLM configuration
 # -----------------------------------------------------
@@ -61,6 +68,7 @@ def check_config() -> None:
     print(f"ChromaDB directory: {CHROMA_DB_DIR}")
     print(f"Embedding model: {EMBEDDING_MODEL}")
     print(f"Persistence enabled: {PERSIST_CHROMA}")
+    print(f"Ingest workers: {INGEST_WORKERS} (embed batch size {EMBED_BATCH_SIZE})")
     print("\nSubjects and PDF paths:")
     for name, path in SUBJECT_PATHS.items():
         print(f"  • {name}: exists={path.exists()} ({path.name})")
@@ -0,0 +1,57 @@
+"""
+collection_paths.py
+-------------------
+Resolves which on-disk directory currently backs each subject's vector DB.
+
+Background re-ingestion builds a new *generation* directory next to the
+live one (``chroma_db/<subject>@<timestamp>``) and then flips a small
+pointer file (``chroma_db/<subject>.current``). Readers always go through
+resolve_subject_dir, so they keep using the old index until the flip and
+pick up the new one afterwards, including after a restart. Subjects that
+were never re-ingested this way simply resolve to ``chroma_db/<subject>``.
+"""
+
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable
+
+POINTER_SUFFIX = ".current"
+GENERATION_SEP = "@"
+
+
+def resolve_subject_dir(chroma_dir: str, subject: str) -> str:
+    """Return the directory that currently holds a subject's vector DB."""
+    pointer = Path(chroma_dir) / f"{subject}{POINTER_SUFFIX}"
+    try:
+        name = pointer.read_text(encoding="utf-8").strip()
+    except OSError:
+        name = ""
+    return str(Path(chroma_dir) / (name or subject))
+
+
+def new_generation_dir(chroma_dir: str, subject: str) -> str:
+    """Return a fresh (not yet created) generation directory path for a subject."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return str(Path(chroma_dir) / f"{subject}{GENERATION_SEP}{stamp}-{uuid.uuid4().hex[:6]}")
+
+
+def activate_generation(chroma_dir: str, subject: str, generation_dir: str) -> None:
+    """Atomically point a subject at a new generation directory."""
+    pointer = Path(chroma_dir) / f"{subject}{POINTER_SUFFIX}"
+    tmp = pointer.with_suffix(".tmp")
+    tmp.write_text(Path(generation_dir).name, encoding="utf-8")
+    os.replace(tmp, pointer)
+
+
+def prune_generations(chroma_dir: str, subject: str, keep: Iterable[str]) -> None:
+    """
+    Delete a subject's generation directories except those in `keep`.
+    Directories still held open (e.g. on Windows) are skipped silently.
+    """
+    keep_names = {Path(k).name for k in keep}
+    for path in Path(chroma_dir).glob(f"{subject}{GENERATION_SEP}*"):
+        if path.is_dir() and path.name not in keep_names:
+            shutil.rmtree(path, ignore_errors=True)
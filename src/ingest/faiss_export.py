@@ -0,0 +1,103 @@
+"""
+faiss_export.py
+---------------
+Exports the per-subject Chroma stores to FAISS indexes.
+
+Chroma stays the ingestion source of truth; this copies each subject's
+chunks and stored embeddings (nothing is re-embedded) into
+``chroma_db/faiss/<subject>`` in the layout src/rag/faiss_store.py reads.
+Each export records the ingest stamp it was built from, so re-running only
+rebuilds subjects that were re-ingested, whose index type changed, or
+whose export predates the current on-disk layout (FORMAT).
+
+Usage:
+    python -m src.ingest.faiss_export [--index flat|hnsw|ivf] [--force]
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.ingest.unified_index import source_fingerprint
+from src.rag.faiss_store import FORMAT, INDEX_TYPES, read_faiss_meta, write_faiss_dir
+from src.logger import get_logger
+
+logger = get_logger("faiss_export")
+
+FAISS_DIRNAME = "faiss"
+
+
+def faiss_subject_dir(chroma_dir: str, subject: str) -> str:
+    return str(Path(chroma_dir) / FAISS_DIRNAME / subject)
+
+
+def export_subject(source_dir: str, out_dir: str, index_type: str = "flat", batch_size: int = 1000) -> int:
+    """Copy one Chroma store into a FAISS directory. Returns the number of chunks."""
+    source = Chroma(persist_directory=source_dir)
+    ids, texts, metadatas, parts = [], [], [], []
+    offset = 0
+    while True:
+        batch = source.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        texts.extend(batch["documents"])
+        metadatas.extend(meta or {} for meta in batch["metadatas"])
+        parts.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+    if not parts:
+        raise ValueError(f"No chunks found in {source_dir}")
+    write_faiss_dir(
+        out_dir, ids, texts, metadatas, np.concatenate(parts), index_type,
+        meta=source_fingerprint(source_dir),
+    )
+    return len(ids)
+
+
+def is_export_current(chroma_dir: str, subject: str, index_type: str) -> bool:
+    meta = read_faiss_meta(faiss_subject_dir(chroma_dir, subject))
+    if not meta or meta.get("index_type") != index_type or meta.get("format") != FORMAT:
+        return False
+    current = source_fingerprint(resolve_subject_dir(chroma_dir, subject))
+    return all(meta.get(k) == v for k, v in current.items())
+
+
+def export_all(chroma_dir: str, subjects: Iterable[str], index_type: str = "flat", force: bool = False) -> Dict[str, int]:
+    """
+    Export every stale subject. Returns {subject: chunks exported} for the
+    subjects that were (re)built.
+    """
+    exported = {}
+    for subject in subjects:
+        if not force and is_export_current(chroma_dir, subject, index_type):
+            continue
+        source_dir = resolve_subject_dir(chroma_dir, subject)
+        if not Path(source_dir).exists():
+            logger.warning("No vector DB for '%s' at %s; skipping", subject, source_dir)
+            continue
+        exported[subject] = export_subject(source_dir, faiss_subject_dir(chroma_dir, subject), index_type)
+        logger.info("Exported %d chunks of '%s' to a FAISS %s index", exported[subject], subject, index_type)
+    return exported
+
+
+def main() -> None:
+    from src.config import CHROMA_DB_DIR, SUBJECT_PATHS
+
+    parser = argparse.ArgumentParser(description="Export the per-subject Chroma stores to FAISS indexes.")
+    parser.add_argument("--index", choices=INDEX_TYPES, default="flat", help="FAISS index type.")
+    parser.add_argument("--force", action="store_true", help="Rebuild every subject, not just stale ones.")
+    args = parser.parse_args()
+
+    exported = export_all(CHROMA_DB_DIR, SUBJECT_PATHS.keys(), index_type=args.index, force=args.force)
+    if not exported:
+        print("⏩ FAISS indexes are up to date — nothing to do.")
+    for subject, chunks in exported.items():
+        print(f"✅ '{subject}': {chunks} chunks → {faiss_subject_dir(CHROMA_DB_DIR, subject)} ({args.index})")
+
+
+if __name__ == "__main__":
+    main()
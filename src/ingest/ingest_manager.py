@@ -3,40 +3,342 @@ ingest_manager.py
 -----------------
 Controls the ingestion process for all subjects.
 Embeds PDF text and stores them in Chroma vector DBs.
+
+Ingestion is incremental: every chunk gets an id derived from its content,
+and a per-subject manifest records the PDF hash. Re-ingesting only embeds
+new or changed chunks, deletes removed ones, and returns immediately when
+the PDF itself is unchanged.
+
+The pipeline streams: pages are parsed and chunked lazily (in a process
+pool, a bounded window of page ranges ahead), chunks are embedded by a
+single shared model in fixed-size batches and upserted batch by batch.
+Peak memory is bounded by the batch size and parse window rather than by
+the size of the PDF. Each run reports pages/sec and chunks/sec per stage.
 """
 
+import hashlib
+import json
 import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
-from src.config import SUBJECT_PATHS, VECTOR_DB_DIRS, EMBEDDING_MODEL, PERSIST_CHROMA
-from src.ingest.pdf_loader import load_and_split_pdf
+from src.config import (
+    SUBJECT_PATHS, CHROMA_DB_DIR, EMBEDDING_MODEL, PERSIST_CHROMA,
+    INGEST_WORKERS, INGEST_PAGES_PER_TASK, EMBED_BATCH_SIZE,
+)
+from src.ingest.pdf_loader import count_pdf_pages, parse_and_split_pages, iter_pdf_pages, iter_chunks
+from src.ingest.ingest_stamp import write_ingest_stamp
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.bm25_index import BM25Builder
 
-def ingest_subject(subject_name: str, pdf_path: str, db_path: str):
-    """Ingests a single subject’s PDF into a Chroma collection."""
-    print(f"\n📘 Ingesting data for subject: {subject_name}")
-    docs = load_and_split_pdf(str(pdf_path))
+MANIFEST_FILE = "ingest_manifest.json"
+# Chroma rejects very large delete/update calls, so they are chunked
+WRITE_BATCH_SIZE = 1000
+_DONE = object()
+# Page ranges parsed ahead of the embedder (per worker) — bounds parse memory
+PARSE_WINDOW_PER_WORKER = 2
+
+# ---------------------------
+# Hashing & manifest
+# ---------------------------
+def file_sha256(path: str) -> str:
+    """Stream a file through SHA-256."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def iter_with_chunk_ids(docs: Iterable) -> Iterator[Tuple[str, object]]:
+    """
+    Pair each chunk with a deterministic id from its text alone, so a chunk
+    keeps its id when edits elsewhere shift it to another page (the page
+    stays in its metadata). Repeated identical chunks get an occurrence
+    suffix, counted in document order.
+    """
+    seen = defaultdict(int)
+    for doc in docs:
+        digest = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:32]
+        yield f"{digest}-{seen[digest]}", doc
+        seen[digest] += 1
+
+
+def load_manifest(db_path: str) -> Optional[dict]:
+    try:
+        with open(Path(db_path) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_manifest(db_path: str, manifest: dict) -> None:
+    path = Path(db_path) / MANIFEST_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def is_up_to_date(db_path: str, pdf_hash: str) -> bool:
+    manifest = load_manifest(db_path)
+    return bool(
+        manifest
+        and manifest.get("pdf_sha256") == pdf_hash
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+    )
+
+# ---------------------------
+# Stage statistics
+# ---------------------------
+class IngestStats:
+    """Accumulates items processed and wall time per pipeline stage."""
+
+    def __init__(self):
+        self.stages: Dict[str, list] = {}
+
+    def add(self, stage: str, items: int, seconds: float, unit: str) -> None:
+        entry = self.stages.setdefault(stage, [0, 0.0, unit])
+        entry[0] += items
+        entry[1] += seconds
+
+    def report(self) -> str:
+        lines = []
+        for stage, (items, seconds, unit) in self.stages.items():
+            rate = items / seconds if seconds > 0 else float("inf")
+            lines.append(f"  • {stage:<7} {items:>7} {unit:<6} in {seconds:7.2f}s → {rate:9.1f} {unit}/sec")
+        return "\n".join(lines)
+
+# ---------------------------
+# Pipeline stages
+# ---------------------------
+def build_embeddings(batch_size: int = EMBED_BATCH_SIZE) -> HuggingFaceEmbeddings:
+    """One embedding model for the whole run, encoding in large batches."""
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": batch_size},
+    )
+
+
+def iter_pdf_chunks(pdf_path: str, pool: Optional[ProcessPoolExecutor] = None, window: int = 1) -> Iterator:
+    """
+    Stream a PDF's chunks in page order.
+
+    Without a pool, pages are extracted and split lazily in-process. With a
+    pool, page ranges are parsed in worker processes with at most `window`
+    ranges in flight, so parsing runs ahead of embedding without ever
+    materializing the whole document.
+    """
+    if pool is None:
+        yield from iter_chunks(iter_pdf_pages(pdf_path))
+        return
 
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    n_pages = count_pdf_pages(pdf_path)
+    in_flight = deque()
+    for start in range(0, n_pages, INGEST_PAGES_PER_TASK):
+        in_flight.append(pool.submit(parse_and_split_pages, pdf_path, start, start + INGEST_PAGES_PER_TASK))
+        if len(in_flight) >= window:
+            yield from in_flight.popleft().result()
+    while in_flight:
+        yield from in_flight.popleft().result()
 
-    db = Chroma.from_documents(
-        documents=docs,
-        embedding=embeddings,
-        persist_directory=db_path,
+
+def _timed(iterable: Iterable, stats: IngestStats, stage: str, unit: str) -> Iterator:
+    """Charge the time spent waiting on `iterable` to `stage` (items are counted by the caller)."""
+    it = iter(iterable)
+    while True:
+        t0 = time.perf_counter()
+        item = next(it, _DONE)
+        stats.add(stage, 0, time.perf_counter() - t0, unit)
+        if item is _DONE:
+            return
+        yield item
+
+
+def _write_batch(db, embeddings, batch, stats: Optional[IngestStats]) -> None:
+    """Embed one fixed-size batch of (id, chunk) pairs and upsert it."""
+    texts = [doc.page_content for _, doc in batch]
+    t0 = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    t1 = time.perf_counter()
+    db._collection.upsert(
+        ids=[cid for cid, _ in batch],
+        embeddings=vectors,
+        documents=texts,
+        metadatas=[doc.metadata for _, doc in batch],
     )
+    t2 = time.perf_counter()
+    if stats is not None:
+        stats.add("embed", len(batch), t1 - t0, "chunks")
+        stats.add("upsert", len(batch), t2 - t1, "chunks")
+
+
+def _update_metadata(db, moved) -> None:
+    """Rewrite the metadata of (id, metadata) pairs whose text, and so vector, is unchanged."""
+    db._collection.update(ids=[cid for cid, _ in moved], metadatas=[meta for _, meta in moved])
+
+
+def sync_subject(
+    subject_name: str,
+    chunks: Iterable,
+    db_path: str,
+    pdf_hash: str,
+    embeddings,
+    force: bool = False,
+    stats: Optional[IngestStats] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    progress: Optional[Callable[[float], None]] = None,
+) -> bool:
+    """
+    Stream one subject's chunks into its collection: embed + upsert new chunks
+    in fixed-size batches, delete removed ones, rebuild the BM25 index and
+    write the manifest. Returns True if the collection changed.
+
+    `progress`, if given, is called with the fraction of pages processed.
+    """
+    manifest = load_manifest(db_path)
+    db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+
+    # The store itself is the source of truth (also covers DBs built before manifests)
+    got = db.get(include=["metadatas"])
+    stored_meta = dict(zip(got["ids"], got["metadatas"]))
+    stored = set(stored_meta)
+    existing = stored
+    if manifest is None or manifest.get("embedding_model") != EMBEDDING_MODEL or force:
+        # Different or unknown vectors: re-embed everything. Chunks are upserted over
+        # the old ones and only leftovers are deleted at the end, so the store is never
+        # half empty; the manifest goes first, so an interrupted run is not "up to date".
+        try:
+            os.remove(Path(db_path) / MANIFEST_FILE)
+        except FileNotFoundError:
+            pass
+        existing = set()
+
+    wanted = set()
+    lexical = BM25Builder()
+    pending = []
+    moved = []
+    added = relocated = 0
+    for cid, doc in iter_with_chunk_ids(chunks):
+        wanted.add(cid)
+        lexical.add(cid, doc.page_content)
+        if cid not in existing:
+            pending.append((cid, doc))
+            if len(pending) >= batch_size:
+                _write_batch(db, embeddings, pending, stats)
+                added += len(pending)
+                pending = []
+        elif stored_meta[cid] != doc.metadata:
+            # Same text, new place (e.g. shifted to another page): refresh metadata, keep the vector
+            moved.append((cid, doc.metadata))
+            if len(moved) >= WRITE_BATCH_SIZE:
+                _update_metadata(db, moved)
+                relocated += len(moved)
+                moved = []
+        if progress is not None and doc.metadata.get("total_pages"):
+            progress((doc.metadata.get("page", 0) + 1) / doc.metadata["total_pages"])
+    if pending:
+        _write_batch(db, embeddings, pending, stats)
+        added += len(pending)
+    if moved:
+        _update_metadata(db, moved)
+        relocated += len(moved)
+
+    stale = sorted(stored - wanted)
+    for i in range(0, len(stale), WRITE_BATCH_SIZE):
+        db.delete(ids=stale[i:i + WRITE_BATCH_SIZE])
+    removed = len(stale)
 
-    if PERSIST_CHROMA:
+    if PERSIST_CHROMA and hasattr(db, "persist"):
         db.persist()
 
-    print(f"✅ Successfully created ChromaDB for '{subject_name}' → {db_path}")
+    # Lexical (BM25) index for hybrid retrieval, stored next to the vectors
+    lexical.finish().save(db_path)
 
+    save_manifest(db_path, {"pdf_sha256": pdf_hash, "embedding_model": EMBEDDING_MODEL, "chunks": len(wanted)})
 
-def ingest_all_subjects():
-    """Iterates through all subjects and builds their vector DBs."""
+    changed = bool(added or removed or relocated)
+    if changed:
+        # Tell running apps that cached answers for this subject are stale
+        write_ingest_stamp(db_path)
+
+    print(
+        f"✅ Updated ChromaDB for '{subject_name}' → {db_path} "
+        f"(+{added} new, -{removed} removed, {relocated} moved, {len(wanted) - added - relocated} unchanged)"
+    )
+    return changed
+
+
+def _stream_subject(subject_name, pdf_path, db_path, pdf_hash, embeddings, pool, workers, force, stats,
+                    progress=None) -> bool:
+    print(f"\n📘 Ingesting data for subject: {subject_name}")
+    chunks = iter_pdf_chunks(str(pdf_path), pool=pool, window=max(workers, 1) * PARSE_WINDOW_PER_WORKER)
+    changed = sync_subject(subject_name, _timed(chunks, stats, "parse", "pages"), db_path, pdf_hash, embeddings,
+                           force=force, stats=stats, progress=progress)
+    stats.add("parse", count_pdf_pages(str(pdf_path)), 0.0, "pages")
+    return changed
+
+# ---------------------------
+# Ingestion entry points
+# ---------------------------
+def ingest_subject(
+    subject_name: str, pdf_path: str, db_path: str, force: bool = False, embeddings=None,
+    workers: int = INGEST_WORKERS, progress: Optional[Callable[[float], None]] = None,
+) -> bool:
+    """
+    Ingests a single subject’s PDF into a Chroma collection, incrementally.
+
+    Returns True if the collection changed.
+    """
+    pdf_hash = file_sha256(str(pdf_path))
+    if not force and is_up_to_date(db_path, pdf_hash):
+        print(f"⏩ '{subject_name}' is up to date — nothing to do.")
+        return False
+
+    stats = IngestStats()
+    embeddings = embeddings or build_embeddings()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            changed = _stream_subject(subject_name, pdf_path, db_path, pdf_hash, embeddings, pool, workers, force,
+                                      stats, progress)
+    else:
+        changed = _stream_subject(subject_name, pdf_path, db_path, pdf_hash, embeddings, None, 1, force,
+                                  stats, progress)
+    print(stats.report())
+    return changed
+
+
+def ingest_all_subjects(force: bool = False, workers: int = INGEST_WORKERS):
+    """Streams every changed subject through one worker pool and one shared embedding model."""
+    stats = IngestStats()
+    pending = {}
+    db_dirs = {subject: resolve_subject_dir(CHROMA_DB_DIR, subject) for subject in SUBJECT_PATHS}
     for subject, pdf_path in SUBJECT_PATHS.items():
-        db_dir = VECTOR_DB_DIRS[subject]
+        db_dir = db_dirs[subject]
         os.makedirs(db_dir, exist_ok=True)
-        ingest_subject(subject, pdf_path, str(db_dir))
+        pdf_hash = file_sha256(str(pdf_path))
+        if not force and is_up_to_date(str(db_dir), pdf_hash):
+            print(f"⏩ '{subject}' is up to date — nothing to do.")
+        else:
+            pending[subject] = (str(pdf_path), pdf_hash)
+
+    if pending:
+        embeddings = build_embeddings()
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            for subject, (pdf_path, pdf_hash) in pending.items():
+                _stream_subject(subject, pdf_path, db_dirs[subject], pdf_hash, embeddings,
+                                pool, workers, force, stats)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        print("\n📊 Ingestion throughput:")
+        print(stats.report())
 
     print("\n🎉 All subjects successfully ingested!")
 
@@ -0,0 +1,35 @@
+"""
+ingest_stamp.py
+---------------
+Tiny marker file written into a subject's vector DB directory every time
+the subject is (re-)ingested. Long-running processes compare the stamp
+they last saw with the one on disk to know when derived state (answer
+cache, lexical index, ...) has gone stale, even when ingestion ran in a
+different process.
+"""
+
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+STAMP_FILE = ".ingest_stamp"
+
+
+def write_ingest_stamp(db_path: str) -> str:
+    """Write a fresh, unique stamp into db_path and return it."""
+    stamp = f"{time.time():.6f}-{uuid.uuid4().hex}"
+    path = Path(db_path) / STAMP_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(stamp, encoding="utf-8")
+    os.replace(tmp, path)  # atomic, readers never see a half-written stamp
+    return stamp
+
+
+def read_ingest_stamp(db_path: str) -> Optional[str]:
+    """Return the current stamp for db_path, or None if it was never stamped."""
+    try:
+        return (Path(db_path) / STAMP_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
@@ -0,0 +1,133 @@
+"""
+ingest_worker.py
+----------------
+Background ingestion queue for the Streamlit app.
+
+Uploaded PDFs are queued and ingested one at a time on a daemon thread.
+Each job builds a new generation of the subject's vector DB (a copy of the
+live one, updated incrementally), so queries keep being served from the
+old index. When the job finishes `on_complete(subject, db_path)` lets the
+app open and swap in the new collection; only once that succeeds is the
+generation pointer flipped, so restarts load the same index.
+"""
+
+import queue
+import shutil
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.ingest.collection_paths import (
+    activate_generation, new_generation_dir, prune_generations, resolve_subject_dir,
+)
+from src.ingest.ingest_manager import file_sha256, ingest_subject, is_up_to_date
+from src.logger import get_logger
+
+logger = get_logger("ingest_worker")
+
+
+class IngestJob:
+    """Status of one queued ingestion, readable from the UI thread."""
+
+    def __init__(self, subject: str, pdf_path: str):
+        self.subject = subject
+        self.pdf_path = pdf_path
+        self.status = "queued"  # queued | running | done | failed
+        self.progress = 0.0
+        self.message = "Waiting in queue"
+        self.submitted = time.time()
+        self.finished: Optional[float] = None
+
+    def update(self, status: Optional[str] = None, progress: Optional[float] = None, message: Optional[str] = None):
+        if status is not None:
+            self.status = status
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+
+
+class IngestionWorker:
+    """
+    Single background thread draining a queue of ingestion jobs.
+
+    Parameters:
+    - chroma_dir: Root directory of the per-subject vector DBs.
+    - on_complete: Called as on_complete(subject, db_path) from the worker
+      thread once the new generation is built, before it is activated; if it
+      raises, the generation is discarded and the pointer is left alone.
+    - embeddings: Embedding model shared with the app (avoids a second copy).
+    """
+
+    def __init__(self, chroma_dir: str, on_complete: Callable[[str, str], None], embeddings=None):
+        self.chroma_dir = chroma_dir
+        self.on_complete = on_complete
+        self.embeddings = embeddings
+        self.jobs: List[IngestJob] = []
+        self._queue: "queue.Queue[IngestJob]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+
+    def start(self) -> "IngestionWorker":
+        self._thread.start()
+        return self
+
+    def submit(self, subject: str, pdf_path: str) -> IngestJob:
+        job = IngestJob(subject, pdf_path)
+        self.jobs.append(job)
+        self._queue.put(job)
+        return job
+
+    def latest_jobs(self) -> Dict[str, IngestJob]:
+        """Most recent job per subject."""
+        return {job.subject: job for job in self.jobs}
+
+    # ---------------------------
+    # Worker loop
+    # ---------------------------
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                self._ingest(job)
+            except Exception as e:
+                logger.error("Ingestion of %s failed: %s\n%s", job.subject, e, traceback.format_exc())
+                job.update(status="failed", message=f"Failed: {e}")
+            finally:
+                job.finished = time.time()
+                self._queue.task_done()
+
+    def _ingest(self, job: IngestJob) -> None:
+        job.update(status="running", message="Checking for changes")
+        live_dir = resolve_subject_dir(self.chroma_dir, job.subject)
+        if is_up_to_date(live_dir, file_sha256(job.pdf_path)):
+            job.update(status="done", progress=1.0, message="Already up to date")
+            return
+
+        # Build the next generation from a copy of the live one so only changed chunks are embedded
+        staging_dir = new_generation_dir(self.chroma_dir, job.subject)
+        try:
+            job.update(message="Copying current index")
+            if Path(live_dir).exists():
+                shutil.copytree(live_dir, staging_dir)
+
+            job.update(message="Embedding new chunks")
+            ingest_subject(
+                job.subject, job.pdf_path, staging_dir,
+                embeddings=self.embeddings, workers=1,
+                progress=lambda fraction: job.update(progress=fraction),
+            )
+
+            # The app opens and swaps in the new store before the pointer names it, so a
+            # restart never loads a generation that failed to open
+            job.update(message="Opening new index")
+            self.on_complete(job.subject, staging_dir)
+        except BaseException:
+            # Never activated: the pointer still names the live generation, so drop this one
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        activate_generation(self.chroma_dir, job.subject, staging_dir)
+        prune_generations(self.chroma_dir, job.subject, keep=[staging_dir, live_dir])
+        job.update(status="done", progress=1.0, message="Index updated")
+        logger.info("Swapped %s to %s", job.subject, staging_dir)
@@ -5,8 +5,19 @@ Handles loading and text extraction from PDF files.
 Supports both text-based and scanned PDFs.
 """
 
+from typing import Iterable, Iterator, List, Optional
+
+from pypdf import PdfReader
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+
+def _make_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n", " ", ".", "!", "?", ","],
+    )
 
 def load_and_split_pdf(pdf_path: str, chunk_size: int = 1000, chunk_overlap: int = 200):
     """
@@ -19,12 +30,59 @@ def load_and_split_pdf(pdf_path: str, chunk_size: int = 1000, chunk_overlap: int
     except Exception as e:
         raise RuntimeError(f"❌ Failed to load {pdf_path}: {e}")
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n", " ", ".", "!", "?", ","],
-    )
+    splitter = _make_splitter(chunk_size, chunk_overlap)
 
     docs = splitter.split_documents(documents)
     print(f"✅ Loaded {len(docs)} text chunks from {pdf_path}")
     return docs
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Return the number of pages without extracting any text."""
+    try:
+        return len(PdfReader(pdf_path).pages)
+    except Exception as e:
+        raise RuntimeError(f"❌ Failed to load {pdf_path}: {e}")
+
+def iter_pdf_pages(pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Document]:
+    """
+    Lazily yield pages [start, end) of a PDF as Documents.
+
+    Text is extracted one page at a time, so only the current page is held in
+    memory no matter how large the PDF is.
+    """
+    try:
+        reader = PdfReader(pdf_path)
+    except Exception as e:
+        raise RuntimeError(f"❌ Failed to load {pdf_path}: {e}")
+
+    total = len(reader.pages)
+    end = total if end is None else min(end, total)
+    labels = reader.page_labels
+    for page_number in range(start, end):
+        yield Document(
+            page_content=reader.pages[page_number].extract_text().strip(),
+            metadata={
+                "source": pdf_path,
+                "page": page_number,
+                "page_label": labels[page_number],
+                "total_pages": total,
+            },
+        )
+
+def iter_chunks(pages: Iterable[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> Iterator[Document]:
+    """Split pages into chunks as they arrive (pages are split independently)."""
+    splitter = _make_splitter(chunk_size, chunk_overlap)
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+def parse_and_split_pages(
+    pdf_path: str, start: int, end: int, chunk_size: int = 1000, chunk_overlap: int = 200
+) -> List[Document]:
+    """
+    Extract and chunk pages [start, end) of a PDF.
+
+    Pages are split independently (as split_documents does), so chunking a
+    PDF range by range gives the same chunks as load_and_split_pdf. Runs in
+    worker processes, hence a plain top-level function.
+    """
+    return list(iter_chunks(iter_pdf_pages(pdf_path, start, end), chunk_size, chunk_overlap))
@@ -0,0 +1,185 @@
+"""
+unified_index.py
+----------------
+Builds and maintains one combined Chroma collection holding every subject.
+
+The per-subject stores under ``chroma_db/<subject>`` stay the ingestion
+source of truth. This module copies their chunks (text, metadata and the
+already computed embeddings, so nothing is re-embedded) into
+``chroma_db/unified``, tags every chunk with a ``subject`` metadata field
+and prefixes its id with the subject name. Query-time code then opens a
+single SQLite file / HNSW segment and narrows per-subject searches with a
+metadata filter (see src/rag/vector_stores.py).
+
+A small manifest records which ingest stamp each subject was copied from,
+so re-running the migration only touches subjects that were re-ingested.
+
+Usage:
+    python -m src.ingest.unified_index [--force]
+"""
+
+import argparse
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from langchain_chroma import Chroma
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.ingest.ingest_stamp import read_ingest_stamp
+from src.logger import get_logger
+
+logger = get_logger("unified_index")
+
+UNIFIED_DIRNAME = "unified"
+UNIFIED_COLLECTION = "tutor_chunks"
+SUBJECT_FIELD = "subject"
+MANIFEST_FILE = "unified_manifest.json"
+ID_SEP = "/"
+
+# Subjects may be migrated from several threads at once; the manifest is shared
+_MANIFEST_LOCK = threading.Lock()
+
+
+def unified_dir(chroma_dir: str) -> str:
+    return str(Path(chroma_dir) / UNIFIED_DIRNAME)
+
+
+def unified_id(subject: str, chunk_id: str) -> str:
+    """Chunk ids are only unique within a subject, so they are namespaced here."""
+    return f"{subject}{ID_SEP}{chunk_id}"
+
+
+def open_unified_collection(chroma_dir: str, embeddings=None) -> Chroma:
+    return Chroma(
+        collection_name=UNIFIED_COLLECTION,
+        persist_directory=unified_dir(chroma_dir),
+        embedding_function=embeddings,
+    )
+
+
+def load_unified_manifest(chroma_dir: str) -> dict:
+    try:
+        with open(Path(unified_dir(chroma_dir)) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_unified_manifest(chroma_dir: str, manifest: dict) -> None:
+    path = Path(unified_dir(chroma_dir)) / MANIFEST_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def source_fingerprint(source_dir: str) -> dict:
+    """What a subject's unified copy was built from; any change means it is stale."""
+    return {"source": Path(source_dir).name, "stamp": read_ingest_stamp(source_dir) or ""}
+
+
+# ---------------------------
+# Copy one subject
+# ---------------------------
+def sync_unified_subject(unified: Chroma, subject: str, source_dir: str, batch_size: int = 1000) -> int:
+    """
+    Copy a subject's per-subject store into the unified collection.
+
+    New and changed chunks are upserted before stale ones are deleted, so
+    readers of the unified collection never see the subject half-empty.
+    Returns the number of chunks copied.
+    """
+    source = Chroma(persist_directory=source_dir)
+    keep = set()
+    offset = 0
+    while True:
+        batch = source.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        ids = [unified_id(subject, cid) for cid in batch["ids"]]
+        unified._collection.upsert(
+            ids=ids,
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=[{**(meta or {}), SUBJECT_FIELD: subject} for meta in batch["metadatas"]],
+        )
+        keep.update(ids)
+        offset += len(batch["ids"])
+
+    existing = unified.get(where={SUBJECT_FIELD: subject}, include=[])["ids"]
+    stale = [cid for cid in existing if cid not in keep]
+    if stale:
+        unified._collection.delete(ids=stale)
+    return len(keep)
+
+
+def record_unified_subject(chroma_dir: str, subject: str, source_dir: str, chunks: int) -> None:
+    with _MANIFEST_LOCK:
+        manifest = load_unified_manifest(chroma_dir)
+        manifest[subject] = {**source_fingerprint(source_dir), "chunks": chunks}
+        save_unified_manifest(chroma_dir, manifest)
+
+
+def stale_subjects(chroma_dir: str, subjects: Iterable[str]) -> list:
+    """Subjects whose unified copy is missing or older than their per-subject store."""
+    manifest = load_unified_manifest(chroma_dir)
+    stale = []
+    for subject in subjects:
+        recorded = manifest.get(subject) or {}
+        current = source_fingerprint(resolve_subject_dir(chroma_dir, subject))
+        if {k: recorded.get(k) for k in current} != current:
+            stale.append(subject)
+    return stale
+
+
+# ---------------------------
+# Migrate everything
+# ---------------------------
+def migrate_to_unified(
+    chroma_dir: str,
+    subjects: Iterable[str],
+    embeddings=None,
+    force: bool = False,
+    unified: Optional[Chroma] = None,
+) -> Dict[str, int]:
+    """
+    Bring the unified collection up to date with every per-subject store.
+    Returns {subject: chunks copied} for the subjects that were (re)copied.
+    """
+    subjects = list(subjects)
+    todo = subjects if force else stale_subjects(chroma_dir, subjects)
+    if not todo:
+        return {}
+    unified = unified or open_unified_collection(chroma_dir, embeddings)
+    copied = {}
+    for subject in todo:
+        source_dir = resolve_subject_dir(chroma_dir, subject)
+        if not Path(source_dir).exists():
+            logger.warning("No vector DB for '%s' at %s; skipping", subject, source_dir)
+            continue
+        copied[subject] = sync_unified_subject(unified, subject, source_dir)
+        record_unified_subject(chroma_dir, subject, source_dir, copied[subject])
+        logger.info("Copied %d chunks of '%s' into the unified collection", copied[subject], subject)
+    return copied
+
+
+def main() -> None:
+    from src.config import CHROMA_DB_DIR, SUBJECT_PATHS
+
+    parser = argparse.ArgumentParser(description="Build chroma_db/unified from the per-subject stores.")
+    parser.add_argument("--force", action="store_true", help="Re-copy every subject, not just stale ones.")
+    args = parser.parse_args()
+
+    copied = migrate_to_unified(CHROMA_DB_DIR, SUBJECT_PATHS.keys(), force=args.force)
+    if not copied:
+        print("⏩ Unified collection is up to date — nothing to do.")
+    for subject, chunks in copied.items():
+        print(f"✅ '{subject}': {chunks} chunks copied into {unified_dir(CHROMA_DB_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
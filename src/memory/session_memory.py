@@ -1,30 +1,180 @@
 # src/memory/session_memory.py
 """
 SessionMemory: Simple persistent memory for chat sessions.
-Stores messages in a JSON file with role and content.
+Stores messages with role and content in an append-only JSONL log.
+
+- add() appends one line, so each turn costs O(1) however long the session
+  is. A crash can at worst tear the last line, which is dropped on the next
+  open; earlier messages are never rewritten.
+- fsync is batched: a background flusher syncs at most every
+  `fsync_interval` seconds (0 = sync on every add).
+- Opening a session does not parse its history. tail(n) reads only the
+  end of the file, and show() parses it on demand.
+- clear() appends a marker, and with max_messages older messages become
+  obsolete. A background compaction rewrites the log without them once
+  enough have piled up.
+
+Sessions saved by older versions as a JSON array (session_memory.json) are
+converted to JSONL the first time they are opened.
 """
 
 import json
 import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from src.logger import get_logger
+
+logger = get_logger("session_memory")
+
+CLEAR_RECORD = json.dumps({"op": "clear"}).encode("utf-8") + b"\n"
+_BLOCK = 1 << 20
+
+
+def _encode(record: dict) -> bytes:
+    # json.dumps escapes newlines and quotes, so a record is always exactly one line
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _is_clear(line: bytes) -> bool:
+    return line + b"\n" == CLEAR_RECORD
+
 
 class SessionMemory:
-    def __init__(self, file_path: str = "session_memory.json"):
+    def __init__(self, file_path: str = "session_memory.jsonl", fsync_interval: float = 1.0,
+                 max_messages: int = 0, compact_min_obsolete: int = 1000, tail_cache: int = 200):
         """
-        Initialize session memory.
-        If the file exists, load previous session data.
+        Open (or create) a session log.
 
         Parameters:
-        - file_path: Path to the JSON file for storing messages.
+        - file_path: Path to the JSONL log. A legacy ".json" path is migrated to ".jsonl" alongside it.
+        - fsync_interval: Seconds between background fsyncs; 0 syncs on every add.
+        - max_messages: Keep only the newest N messages (0 = keep everything).
+        - compact_min_obsolete: Obsolete lines needed before a background compaction runs.
+        - tail_cache: Recent messages kept in memory for tail().
         """
-        self.file_path = file_path
-        self.data = []
+        path = Path(file_path)
+        if path.suffix == ".json":
+            legacy, path = path, path.with_suffix(".jsonl")
+            if legacy.exists() and not path.exists():
+                self._migrate_legacy(legacy, path)
+        self.file_path = str(path)
+        self.fsync_interval = fsync_interval
+        self.max_messages = max_messages
+        self.compact_min_obsolete = compact_min_obsolete
+
+        self._lock = threading.Lock()
+        self._recent: Deque[dict] = deque(maxlen=tail_cache)
+        self._recent_loaded = False
+        self._compacting = False
+        self._dirty = False
+        self._closed = False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._repair_torn_tail()
+        self._lines, self._since_clear = self._scan()
+        self._file = open(self.file_path, "ab")
+
+        self._wake = threading.Event()
+        self._flusher = None
+        if fsync_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-fsync", daemon=True)
+            self._flusher.start()
+
+    # ---------------------------
+    # Opening
+    # ---------------------------
+    @staticmethod
+    def _migrate_legacy(legacy: Path, path: Path) -> None:
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            messages = []
+        tmp = path.with_suffix(".jsonl.tmp")
+        with open(tmp, "wb") as f:
+            f.writelines(_encode(m) for m in messages)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        logger.info("Migrated %d messages from %s to %s", len(messages), legacy, path)
+
+    def _repair_torn_tail(self) -> None:
+        """Drop a half-written last line left by a crash, so appends start on a fresh line."""
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            keep = self._last_newline(f, size) + 1
+            f.truncate(keep)
+            logger.warning("Dropped a torn record (%d bytes) at the end of %s", size - keep, self.file_path)
+
+    @staticmethod
+    def _last_newline(f, end: int) -> int:
+        """Offset of the last b"\\n" before `end`, or -1."""
+        pos = end
+        while pos > 0:
+            start = max(0, pos - _BLOCK)
+            f.seek(start)
+            idx = f.read(pos - start).rfind(b"\n")
+            if idx >= 0:
+                return start + idx
+            pos = start
+        return -1
+
+    def _scan(self):
+        """(lines in the log, messages after the last clear) from a byte scan; nothing is parsed."""
+        if not os.path.exists(self.file_path):
+            return 0, 0
+        lines = since_clear = 0
+        tail = b""
+        with open(self.file_path, "rb") as f:
+            while True:
+                block = f.read(_BLOCK)
+                if not block:
+                    break
+                lines += block.count(b"\n")
+                since_clear += block.count(b"\n")
+                # A clear record can straddle two blocks; search with the previous block's tail
+                window = tail + block
+                idx = window.rfind(CLEAR_RECORD)
+                if idx >= 0:
+                    since_clear = window[idx + len(CLEAR_RECORD):].count(b"\n")
+                tail = block[-len(CLEAR_RECORD):]
+        return lines, since_clear
 
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                self.data = []
+    # ---------------------------
+    # Writing
+    # ---------------------------
+    def _append(self, line: bytes, record: Optional[dict]) -> None:
+        """Write one line; record is the message (None for a clear marker)."""
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Session memory {self.file_path} is closed")
+            self._file.write(line)
+            self._file.flush()  # in the OS page cache: survives a process crash
+            self._lines += 1
+            if record is None:
+                self._since_clear = 0
+                self._recent.clear()
+                self._recent_loaded = True
+            else:
+                self._since_clear += 1
+                if self._recent_loaded:
+                    self._recent.append(record)
+            if self.fsync_interval <= 0:
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+        if self._obsolete() >= self.compact_min_obsolete:
+            self.compact(background=True)
 
     def add(self, role: str, content: str):
         """
@@ -34,17 +184,183 @@ class SessionMemory:
         - role: "user" or "tutor"
         - content: Message text
         """
-        self.data.append({"role": role, "content": content})
-        self.save()
+        record = {"role": role, "content": content}
+        self._append(_encode(record), record)
+
+    def clear(self):
+        """Forget every message so far (O(1); the space is reclaimed by compaction)."""
+        self._append(CLEAR_RECORD, None)
 
     def save(self):
-        """Save session memory to the JSON file."""
-        try:
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-        except IOError as e:
-            print(f"Error saving session memory: {e}")
+        """Force everything written so far to disk (fsync)."""
+        with self._lock:
+            if not self._closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._dirty = False
+
+    def _flush_loop(self) -> None:
+        while not self._wake.wait(self.fsync_interval):
+            if self._dirty:
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.error("fsync of %s failed: %s", self.file_path, e)
+
+    def close(self):
+        """Sync and close the log; further add() calls raise."""
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if self._closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------
+    # Reading
+    # ---------------------------
+    def __len__(self) -> int:
+        with self._lock:
+            live = self._since_clear
+        return min(live, self.max_messages) if self.max_messages else live
+
+    def tail(self, n: int = 20) -> List[dict]:
+        """The last n messages, read from the end of the log without parsing the rest."""
+        n = min(n, len(self))
+        if n <= 0:
+            return []
+        with self._lock:
+            self._file.flush()
+            if not self._recent_loaded:
+                self._recent.extend(self._read_tail(self._recent.maxlen or n))
+                self._recent_loaded = True
+            if n <= len(self._recent):
+                return list(self._recent)[-n:]
+        return self._read_tail(n)
+
+    def _read_tail(self, n: int) -> List[dict]:
+        """Parse the last n messages after the last clear by reading blocks backwards."""
+        out: List[dict] = []
+        with open(self.file_path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            rest = b""
+            while pos > 0 and len(out) < n:
+                start = max(0, pos - _BLOCK)
+                f.seek(start)
+                block = f.read(pos - start) + rest
+                lines = block.split(b"\n")
+                # The first piece may be a partial line unless we reached the file start
+                rest = lines.pop(0) if start > 0 else b""
+                for line in reversed(lines):
+                    if not line:
+                        continue
+                    if _is_clear(line):
+                        return out[::-1]
+                    out.append(json.loads(line))
+                    if len(out) >= n:
+                        break
+                pos = start
+        return out[::-1]
 
     def show(self):
-        """Return the current session memory as a list of messages."""
-        return self.data
+        """Return the current session memory as a list of messages (parses the log)."""
+        with self._lock:
+            self._file.flush()
+        messages: List[dict] = []
+        with open(self.file_path, "rb") as f:
+            for line in f:
+                line = line.rstrip(b"\n")
+                if not line:
+                    continue
+                if _is_clear(line):
+                    messages = []
+                    continue
+                messages.append(json.loads(line))
+        return messages[-self.max_messages:] if self.max_messages else messages
+
+    @property
+    def data(self) -> List[dict]:
+        """All live messages (kept for callers of the old in-memory list)."""
+        return self.show()
+
+    # ---------------------------
+    # Compaction
+    # ---------------------------
+    def _obsolete(self) -> int:
+        """Lines compaction would drop: cleared messages, clear markers and messages past max_messages."""
+        with self._lock:
+            live = min(self._since_clear, self.max_messages) if self.max_messages else self._since_clear
+            return self._lines - live
+
+    def compact(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Rewrite the log with only the live messages.
+
+        Appends continue while the live part is copied; only the final swap
+        holds the lock. With background=True it runs on a daemon thread
+        (returned), and at most one compaction runs at a time.
+        """
+        with self._lock:
+            if self._compacting or self._closed:
+                return None
+            self._compacting = True
+        if background:
+            thread = threading.Thread(target=self._compact, name="session-compact", daemon=True)
+            thread.start()
+            return thread
+        self._compact()
+        return None
+
+    def _compact(self) -> None:
+        tmp = self.file_path + ".compact"
+        try:
+            with self._lock:
+                self._file.flush()
+                snapshot = self._file.tell()
+            keep = self.max_messages or None
+            live: Deque[bytes] = deque(maxlen=keep)
+            with open(self.file_path, "rb") as src:
+                remaining = snapshot
+                for line in src:
+                    remaining -= len(line)
+                    if remaining < 0:
+                        break
+                    if _is_clear(line.rstrip(b"\n")):
+                        live.clear()
+                    elif line.strip():
+                        live.append(line)
+            with open(tmp, "wb") as out:
+                out.writelines(live)
+                with self._lock:
+                    if self._closed:
+                        return
+                    # Copy whatever was appended while the snapshot was being rewritten
+                    self._file.flush()
+                    with open(self.file_path, "rb") as src:
+                        src.seek(snapshot)
+                        out.write(src.read())
+                    out.flush()
+                    os.fsync(out.fileno())
+                    self._file.close()
+                    os.replace(tmp, self.file_path)
+                    self._file = open(self.file_path, "ab")
+                    self._dirty = False
+                    self._lines, self._since_clear = self._scan()
+            logger.info("Compacted %s to %d lines", self.file_path, self._lines)
+        except OSError as e:
+            logger.error("Compaction of %s failed: %s", self.file_path, e)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            with self._lock:
+                self._compacting = False
@@ -0,0 +1,224 @@
+# src/rag/answer_cache.py
+"""
+Semantic answer cache for EduTutor RAG.
+
+Keeps recent answers per subject keyed by the query embedding. A new
+question whose embedding is close enough (cosine >= threshold) to a cached
+one is answered from the cache, skipping retrieval, reranking and the LLM.
+Entries are evicted LRU-first, by TTL and by an approximate memory cap,
+and a subject's entries are dropped as soon as its collection is
+re-ingested (detected through the ingest stamp).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.ingest.ingest_stamp import read_ingest_stamp
+from src.logger import get_logger
+
+logger = get_logger("answer_cache")
+
+# Rough per-entry bookkeeping overhead (dict slot, object headers, floats)
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+class CacheEntry:
+    __slots__ = ("query", "vector", "answer", "latency", "created", "nbytes")
+
+    def __init__(self, query: str, vector: np.ndarray, answer: str, latency: float):
+        self.query = query
+        self.vector = vector
+        self.answer = answer
+        self.latency = latency
+        self.created = time.monotonic()
+        self.nbytes = (
+            vector.nbytes + len(answer.encode("utf-8")) + len(query.encode("utf-8")) + _ENTRY_OVERHEAD_BYTES
+        )
+
+
+# ---------------------------
+# Per-subject cache
+# ---------------------------
+class SubjectAnswerCache:
+    """LRU + TTL cache of answers for one subject, searched by cosine similarity."""
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self.nbytes = 0
+        self._next_key = 0
+        # Stacked vectors, rebuilt lazily after inserts/evictions
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.nbytes = 0
+        self._matrix = None
+        self._keys = []
+
+    def _remove(self, key: int) -> None:
+        entry = self.entries.pop(key)
+        self.nbytes -= entry.nbytes
+        self._matrix = None
+
+    def _expire(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [k for k, e in self.entries.items() if e.created < cutoff]
+        for key in expired:
+            self._remove(key)
+
+    def lookup(self, vector: np.ndarray) -> Optional[CacheEntry]:
+        """Return the closest entry if it is within the similarity threshold."""
+        self._expire()
+        if not self.entries:
+            return None
+        if self._matrix is None:
+            self._keys = list(self.entries.keys())
+            self._matrix = np.stack([self.entries[k].vector for k in self._keys])
+
+        sims = self._matrix @ vector
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+
+        key = self._keys[best]
+        self.entries.move_to_end(key)  # mark as recently used
+        return self.entries[key]
+
+    def put(self, query: str, vector: np.ndarray, answer: str, latency: float) -> None:
+        entry = CacheEntry(query, vector, answer, latency)
+        if entry.nbytes > self.max_bytes:
+            return
+        self.entries[self._next_key] = entry
+        self._next_key += 1
+        self.nbytes += entry.nbytes
+        self._matrix = None
+
+        # Evict least recently used entries until both caps hold
+        while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+
+# ---------------------------
+# Multi-subject cache
+# ---------------------------
+class SemanticAnswerCache:
+    """
+    Per-subject semantic answer cache shared by all sessions of a process.
+
+    Parameters:
+    - chroma_dir: Root directory of the per-subject vector DBs (for ingest stamps).
+    - subjects: Subject names to keep a cache for.
+    - threshold: Minimum cosine similarity for a cache hit.
+    - ttl_seconds: Maximum age of an entry (0 disables expiry).
+    - max_entries: Maximum entries per subject.
+    - max_memory_mb: Approximate memory cap for all subjects together.
+    - stamp_check_interval: Seconds between checks for re-ingestion.
+    """
+
+    def __init__(
+        self,
+        chroma_dir: str,
+        subjects: List[str],
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        max_memory_mb: float = 64,
+        stamp_check_interval: float = 1.0,
+    ):
+        self.chroma_dir = chroma_dir
+        self.stamp_check_interval = stamp_check_interval
+        max_bytes = int(max_memory_mb * 1024 * 1024 / max(len(subjects), 1))
+        self.caches: Dict[str, SubjectAnswerCache] = {
+            s: SubjectAnswerCache(threshold, ttl_seconds, max_entries, max_bytes) for s in subjects
+        }
+        self._stamps = {s: read_ingest_stamp(self._db_path(s)) for s in subjects}
+        self._last_stamp_check = {s: time.monotonic() for s in subjects}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def _db_path(self, subject: str) -> str:
+        # Re-resolved on every check so a hot-swapped generation is noticed too
+        return resolve_subject_dir(self.chroma_dir, subject)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _check_stamp(self, subject: str) -> None:
+        """Drop a subject's entries if its collection was re-ingested."""
+        now = time.monotonic()
+        if now - self._last_stamp_check[subject] < self.stamp_check_interval:
+            return
+        self._last_stamp_check[subject] = now
+        stamp = read_ingest_stamp(self._db_path(subject))
+        if stamp != self._stamps[subject]:
+            logger.info("Subject '%s' was re-ingested; clearing %d cached answers", subject, len(self.caches[subject]))
+            self.caches[subject].clear()
+            self._stamps[subject] = stamp
+
+    def get(self, subject: str, query_vector) -> Optional[str]:
+        """Return a cached answer for a semantically equivalent question, if any."""
+        if subject not in self.caches:
+            return None
+        start = time.perf_counter()
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_stamp(subject)
+            entry = self.caches[subject].lookup(vector)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            saved = max(entry.latency - (time.perf_counter() - start), 0.0)
+            self.latency_saved += saved
+        logger.info("Cache hit [%s] for '%s' (saved %.2fs)", subject, entry.query, saved)
+        return entry.answer
+
+    def put(self, subject: str, query: str, query_vector, answer: str, latency: float) -> None:
+        """Store an answer together with the time it took to produce it."""
+        if subject not in self.caches:
+            return
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_stamp(subject)
+            self.caches[subject].put(query, vector, answer, latency)
+
+    def invalidate(self, subject: Optional[str] = None) -> None:
+        """Clear one subject's cache, or every subject's if none is given."""
+        with self._lock:
+            for name, cache in self.caches.items():
+                if subject is None or name == subject:
+                    cache.clear()
+
+    def stats(self) -> dict:
+        """Return hit ratio, latency saved and per-subject sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+                "entries": {s: len(c) for s, c in self.caches.items()},
+                "memory_bytes": sum(c.nbytes for c in self.caches.values()),
+            }
@@ -0,0 +1,211 @@
+# src/rag/bm25_index.py
+"""
+Compact BM25 inverted index for EduTutor RAG.
+
+Built once per subject at ingest time and persisted next to the subject's
+Chroma directory, so keyword-heavy questions (dates, term names) can reach
+chunks the vector search missed. Postings are stored as flat NumPy arrays
+(CSR layout: one offsets array, one doc-id array, one weight array) with
+the BM25 term weight precomputed per posting, so a query is just a few
+array slices and a scatter-add.
+"""
+
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.logger import get_logger
+
+logger = get_logger("bm25_index")
+
+INDEX_FILE = "bm25_index.npz"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no signal for lexical matching
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were "
+    "what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/number tokens without stopwords (keeps years like 1947)."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Array-backed BM25 index over the chunks of one subject.
+
+    Parameters:
+    - terms: Vocabulary, index i corresponds to postings offsets[i]:offsets[i+1].
+    - offsets: int64 array of length len(terms) + 1.
+    - postings_doc: int32 array with the chunk position of each posting.
+    - postings_weight: float32 array with the precomputed BM25 weight of each posting.
+    - chunk_ids: Vector-store ids of the chunks, by position.
+    """
+
+    def __init__(self, terms, offsets, postings_doc, postings_weight, chunk_ids):
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.postings_doc = postings_doc
+        self.postings_weight = postings_weight
+        self.chunk_ids = list(chunk_ids)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    # ---------------------------
+    # Build
+    # ---------------------------
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Build an index from (chunk_id, text) pairs."""
+        builder = BM25Builder(k1=k1, b=b)
+        for chunk_id, text in chunks:
+            builder.add(chunk_id, text)
+        return builder.finish()
+
+    @classmethod
+    def from_store(cls, store, batch_size: int = 1000) -> "BM25Index":
+        """Build an index from every chunk already stored in a Chroma collection."""
+        def iter_chunks():
+            offset = 0
+            while True:
+                batch = store.get(include=["documents"], limit=batch_size, offset=offset)
+                if not batch["ids"]:
+                    return
+                yield from zip(batch["ids"], batch["documents"])
+                offset += len(batch["ids"])
+
+        return cls.build(iter_chunks())
+
+    # ---------------------------
+    # Query
+    # ---------------------------
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Return up to k (chunk_id, bm25 score) pairs, best first."""
+        term_ids = {self.term_ids[t] for t in tokenize(query) if t in self.term_ids}
+        if not term_ids or not self.chunk_ids:
+            return []
+
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        for t in term_ids:
+            s, e = self.offsets[t], self.offsets[t + 1]
+            # A chunk appears at most once per term, so plain fancy-index add is safe
+            scores[self.postings_doc[s:e]] += self.postings_weight[s:e]
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.chunk_ids[i], float(scores[i])) for i in hits]
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    def save(self, db_path: str) -> Path:
+        """Persist the index into the subject's vector DB directory."""
+        path = Path(db_path) / INDEX_FILE
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        terms = sorted(self.term_ids, key=self.term_ids.get)
+        np.savez_compressed(
+            tmp,
+            terms=np.asarray(terms, dtype=str),
+            offsets=self.offsets,
+            postings_doc=self.postings_doc,
+            postings_weight=self.postings_weight,
+            chunk_ids=np.asarray(self.chunk_ids, dtype=str),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, db_path: str) -> "BM25Index":
+        with np.load(Path(db_path) / INDEX_FILE, allow_pickle=False) as data:
+            return cls(
+                data["terms"].tolist(),
+                data["offsets"],
+                data["postings_doc"],
+                data["postings_weight"],
+                data["chunk_ids"].tolist(),
+            )
+
+
+class BM25Builder:
+    """
+    Incremental index builder: chunks are added one at a time and only term
+    counts are kept, so ingestion can stream text through without holding it.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunk_ids: List[str] = []
+        self.doc_lens: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    def add(self, chunk_id: str, text: str) -> None:
+        pos = len(self.chunk_ids)
+        tokens = tokenize(text or "")
+        self.chunk_ids.append(chunk_id)
+        self.doc_lens.append(len(tokens))
+        counts: Dict[str, int] = defaultdict(int)
+        for tok in tokens:
+            counts[tok] += 1
+        for tok, tf in counts.items():
+            self.postings[tok].append((pos, tf))
+
+    def finish(self) -> BM25Index:
+        k1, b, postings = self.k1, self.b, self.postings
+        n_docs = len(self.chunk_ids)
+        dl = np.asarray(self.doc_lens, dtype=np.float32)
+        avgdl = float(dl.mean()) if n_docs and dl.mean() > 0 else 1.0
+        length_norm = k1 * (1.0 - b + b * dl / avgdl)
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+
+        postings_doc = np.empty(int(offsets[-1]), dtype=np.int32)
+        postings_weight = np.empty(int(offsets[-1]), dtype=np.float32)
+        for i, term in enumerate(terms):
+            plist = postings[term]
+            docs = np.fromiter((p for p, _ in plist), dtype=np.int32, count=len(plist))
+            tf = np.fromiter((f for _, f in plist), dtype=np.float32, count=len(plist))
+            df = len(plist)
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            s, e = offsets[i], offsets[i + 1]
+            postings_doc[s:e] = docs
+            postings_weight[s:e] = idf * tf * (k1 + 1.0) / (tf + length_norm[docs])
+
+        return BM25Index(terms, offsets, postings_doc, postings_weight, self.chunk_ids)
+
+
+def load_lexical_index(db_path: str, store=None) -> Optional[BM25Index]:
+    """
+    Load a subject's BM25 index, building (and saving) it from the vector
+    store when the subject was ingested before lexical indexes existed.
+    Returns None when neither is available.
+    """
+    if (Path(db_path) / INDEX_FILE).exists():
+        return BM25Index.load(db_path)
+    if store is None:
+        return None
+    try:
+        index = BM25Index.from_store(store)
+    except Exception as e:
+        logger.warning("Could not build BM25 index for %s: %s", db_path, e)
+        return None
+    if len(index):
+        try:
+            index.save(db_path)
+        except OSError as e:
+            logger.warning("Could not save BM25 index for %s: %s", db_path, e)
+        logger.info("Built BM25 index for %s (%d chunks)", db_path, len(index))
+    return index
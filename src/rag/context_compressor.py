@@ -0,0 +1,149 @@
+# src/rag/context_compressor.py
+"""
+Query-focused extractive compression of retrieved chunks.
+
+Often one or two sentences of a 1000-character chunk answer the question.
+When CONTEXT_COMPRESSION is on, the reranked chunks are split into
+sentences, every sentence is scored against the query embedding in one
+matrix product, and only the best sentences survive. They are kept in
+their original order, and gaps are marked with "…". Each chunk keeps its
+metadata, so the context still carries its source labels.
+
+Sentence vectors are cached by text: the same chunks come back for many
+questions, so after warm-up compression costs one dot product per sentence.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+# Sentence ends, or line breaks (headings, list items and table rows in the PDFs)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+# Fragments shorter than this (page numbers, bullets) are kept with their neighbour
+MIN_SENTENCE_CHARS = 25
+GAP = "…"
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split chunk text into sentences, folding very short fragments into the next one."""
+    sentences: List[str] = []
+    carry = ""
+    for part in _SENTENCE_END.split(text.strip()):
+        part = f"{carry} {part}".strip() if carry else part.strip()
+        if len(part) < MIN_SENTENCE_CHARS:
+            carry = part
+            continue
+        carry = ""
+        sentences.append(part)
+    if carry:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {carry}"
+        else:
+            sentences.append(carry)
+    return sentences
+
+
+class SentenceCompressor:
+    """
+    Keeps the sentences of the selected chunks that best match the query.
+
+    Parameters:
+    - embeddings: The query's Embeddings; sentences not cached yet go through embed_documents.
+    - max_sentences: Sentences kept across all chunks (each chunk keeps at least its best one).
+    - neighbours: Sentences kept on either side of a selected one, for context.
+    - cache_size: Sentence vectors kept in the LRU cache.
+    """
+
+    def __init__(self, embeddings, max_sentences: int = 6, neighbours: int = 0, cache_size: int = 20000):
+        self.embeddings = embeddings
+        self.max_sentences = max_sentences
+        self.neighbours = neighbours
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, sentences: List[str]) -> Dict[str, np.ndarray]:
+        vectors = np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return dict(zip(sentences, vectors))
+
+    def _vectors(self, sentences: List[str]) -> np.ndarray:
+        """Unit-length vectors for sentences, embedding only the ones not cached yet."""
+        with self._lock:
+            missing = list(dict.fromkeys(s for s in sentences if s not in self._cache))
+        fresh = self._embed(missing) if missing else {}
+        with self._lock:
+            # Another thread may have evicted sentences that were cached at the first look
+            evicted = [s for s in dict.fromkeys(sentences) if s not in fresh and s not in self._cache]
+            if evicted:
+                fresh.update(self._embed(evicted))
+            self._cache.update(fresh)
+            rows = []
+            for sentence in sentences:
+                self._cache.move_to_end(sentence)
+                rows.append(self._cache[sentence])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return np.stack(rows)
+
+    def compress(self, docs: Sequence[Document], query_vector: Sequence[float]) -> List[Document]:
+        """Return docs (same order and metadata) cut down to their query-relevant sentences."""
+        docs = list(docs)
+        per_doc = [split_sentences(doc.page_content) for doc in docs]
+        flat = [(d, i, s) for d, sentences in enumerate(per_doc) for i, s in enumerate(sentences)]
+        if not flat or self.max_sentences <= 0:
+            return docs
+
+        query = np.array(query_vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = self._vectors([s for _, _, s in flat]) @ query  # one pass over every sentence
+
+        keep = [set() for _ in docs]
+        seen = set()  # overlapping chunks repeat sentences; keep each once per source
+        order = np.argsort(-scores, kind="stable")
+        # Each chunk's best sentence goes first (the chunk was reranked in for a reason), then the global best
+        firsts = {}
+        for j in order:
+            firsts.setdefault(flat[j][0], j)
+        first_rows = set(firsts.values())
+        candidates = list(firsts.values()) + [j for j in order if j not in first_rows]
+        limit = max(self.max_sentences, len(firsts))
+        picked = 0
+        for j in candidates:
+            if picked >= limit:
+                break
+            d, i, sentence = flat[j]
+            key = (docs[d].metadata.get("source"), sentence)
+            if key in seen:
+                continue
+            seen.add(key)
+            keep[d].update(range(max(0, i - self.neighbours), min(len(per_doc[d]), i + self.neighbours + 1)))
+            picked += 1
+
+        compressed = []
+        for doc, sentences, kept in zip(docs, per_doc, keep):
+            if not kept:
+                continue
+            parts, last = [], None
+            for i in sorted(kept):
+                if last is not None and i != last + 1:
+                    parts.append(GAP)
+                parts.append(sentences[i])
+                last = i
+            compressed.append(Document(page_content=" ".join(parts), metadata=doc.metadata))
+        return compressed
+
+
+def compressor_from_config(config: dict, embeddings):
+    """SentenceCompressor when CONTEXT_COMPRESSION is on, else None."""
+    if not config.get("CONTEXT_COMPRESSION", False):
+        return None
+    return SentenceCompressor(
+        embeddings,
+        max_sentences=config.get("COMPRESSION_SENTENCES", 6),
+        neighbours=config.get("COMPRESSION_NEIGHBOURS", 0),
+    )
@@ -0,0 +1,265 @@
+# src/rag/context_packer.py
+"""
+Token-budget-aware context packing for EduTutor RAG prompts.
+
+Chunks are split with a 200-character overlap, so neighbouring chunks of
+the same page repeat text and build_context_string pastes every one of
+them in full. pack_context instead:
+
+1. merges chunks of the same source that overlap (or contain each other)
+   into one block, dropping the repeated span;
+2. keeps blocks in score order (a merged block ranks as its best chunk);
+3. adds blocks until the token budget is spent, trimming the block that
+   crosses the budget at a sentence boundary when enough room is left.
+
+Tokens are counted with tiktoken for the configured LLM when it is
+available (it ships with langchain-openai but downloads its vocabulary on
+first use), otherwise estimated at four characters per token.
+"""
+
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+from src.logger import get_logger
+from src.rag.hybrib_retriever import build_context_string
+
+logger = get_logger("context_packer")
+
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# Splitter overlap is 200 chars; leave headroom for separators kept on either side
+MAX_OVERLAP_CHARS = 400
+# A block trimmed to fewer tokens than this isn't worth its source header
+MIN_PARTIAL_TOKENS = 48
+BLOCK_SEP = "\n\n"
+
+
+# ---------------------------
+# Token counting
+# ---------------------------
+@lru_cache(maxsize=8)
+def _encoder(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # BPE files are downloaded on first use; offline, fall back to the estimate
+        logger.warning("tiktoken unavailable for '%s' (%s); estimating 4 chars per token", model, e)
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    enc = _encoder(model)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Cut text to at most max_tokens, preferring to end on a sentence or line."""
+    enc = _encoder(model)
+    if enc is None:
+        cut = text[:max_tokens * 4]
+    else:
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = enc.decode(tokens[:max_tokens])
+    if len(cut) >= len(text):
+        return text
+    end = max(cut.rfind(". "), cut.rfind("\n"))
+    if end >= len(cut) * 0.6:
+        cut = cut[:end + 1]
+    return cut.rstrip() + " …"
+
+
+# ---------------------------
+# Overlap merging
+# ---------------------------
+def overlap_length(first: str, second: str) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second` (0 if shorter than MIN_OVERLAP_CHARS)."""
+    tail = first[-MAX_OVERLAP_CHARS:]
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = 0
+    while True:
+        # The earliest match in the tail is the longest overlap
+        pos = tail.find(probe, start)
+        if pos < 0:
+            return 0
+        if second.startswith(tail[pos:]):
+            return len(tail) - pos
+        start = pos + 1
+
+
+def merge_texts(a: str, b: str) -> Optional[str]:
+    """a and b as one text if one contains the other or they overlap (either order); else None."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    n = overlap_length(a, b)
+    if n:
+        return a + b[n:]
+    n = overlap_length(b, a)
+    if n:
+        return b + a[n:]
+    return None
+
+
+def _source(doc: Document) -> str:
+    return doc.metadata.get("source") or doc.metadata.get("source_file") or "unknown"
+
+
+class ContextBlock:
+    """One or more merged chunks of a single source."""
+
+    def __init__(self, source: str, text: str, rank: int):
+        self.source = source
+        self.text = text
+        self.rank = rank  # best (lowest) rank among the merged chunks
+        self.chunks = 1
+
+    def render(self) -> str:
+        # Same layout as build_context_string
+        return f"Source: {self.source}\n{self.text}\n---"
+
+
+def merge_chunks(docs: Sequence[Document]) -> List[ContextBlock]:
+    """Merge overlapping/duplicate chunks of the same source; blocks come back in score order."""
+    blocks: List[ContextBlock] = []
+    for rank, doc in enumerate(docs):
+        block = ContextBlock(_source(doc), doc.page_content.strip(), rank)
+        # A new chunk can bridge two existing blocks, so keep merging until nothing changes
+        merged = True
+        while merged:
+            merged = False
+            for other in blocks:
+                if other.source != block.source:
+                    continue
+                text = merge_texts(other.text, block.text)
+                if text is not None:
+                    blocks.remove(other)
+                    block.text, block.rank = text, min(block.rank, other.rank)
+                    block.chunks += other.chunks
+                    merged = True
+                    break
+        blocks.append(block)
+    return sorted(blocks, key=lambda b: b.rank)
+
+
+# ---------------------------
+# Packing
+# ---------------------------
+class PackedContext:
+    """Packed context text plus what packing did, for logging and /stats."""
+
+    def __init__(self, text: str, tokens: int, raw_tokens: int, chunks: int, blocks: int, dropped: int,
+                 trimmed: bool):
+        self.text = text
+        self.tokens = tokens
+        self.raw_tokens = raw_tokens  # what build_context_string would have produced
+        self.chunks = chunks
+        self.blocks = blocks
+        self.dropped = dropped  # blocks left out for lack of budget
+        self.trimmed = trimmed
+
+    def as_dict(self) -> dict:
+        return {
+            "context_tokens": self.tokens,
+            "unpacked_tokens": self.raw_tokens,
+            "chunks": self.chunks,
+            "blocks": self.blocks,
+            "dropped": self.dropped,
+            "trimmed": self.trimmed,
+        }
+
+
+def pack_context(docs: Sequence[Document], token_budget: int = 0, model: str = "gpt-4o-mini") -> PackedContext:
+    """
+    Build the prompt context from ranked docs (best first).
+
+    Parameters:
+    - docs: Reranked chunks, best first.
+    - token_budget: Maximum context tokens; 0 means no limit (dedup only).
+    - model: LLM whose tokenizer counts the tokens.
+    """
+    docs = list(docs)
+    raw_tokens = count_tokens(build_context_string(docs), model) if docs else 0
+    blocks = merge_chunks(docs)
+
+    pieces: List[str] = []
+    used = 0
+    dropped = 0
+    trimmed = False
+    sep_tokens = count_tokens(BLOCK_SEP, model)
+    for block in blocks:
+        rendered = block.render()
+        cost = count_tokens(rendered, model) + (sep_tokens if pieces else 0)
+        if not token_budget or used + cost <= token_budget:
+            pieces.append(rendered)
+            used += cost
+            continue
+        # Trim the block that crosses the budget if a useful part of it still fits
+        header = count_tokens(f"Source: {block.source}\n\n---", model) + (sep_tokens if pieces else 0)
+        room = token_budget - used - header
+        if room >= MIN_PARTIAL_TOKENS:
+            block.text = truncate_to_tokens(block.text, room, model)
+            pieces.append(block.render())
+            trimmed = True
+        dropped = len(blocks) - len(pieces)
+        break
+
+    text = BLOCK_SEP.join(pieces)
+    return PackedContext(text, count_tokens(text, model) if text else 0, raw_tokens, len(docs), len(pieces),
+                         dropped, trimmed)
+
+
+# ---------------------------
+# Prompt token reporting
+# ---------------------------
+class PromptMetrics:
+    """Rolling window of prompt sizes (after packing) and the tokens packing saved."""
+
+    def __init__(self, model: str = "gpt-4o-mini", window: int = 500):
+        self.model = model
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, packed: PackedContext, prompt: str) -> int:
+        """Count and log the final prompt's tokens; returns the count."""
+        prompt_tokens = count_tokens(prompt, self.model)
+        with self._lock:
+            self._recent.append((prompt_tokens, packed.raw_tokens - packed.tokens))
+        logger.info(
+            "Prompt %d tokens (context %d, %d before packing; %d chunks -> %d blocks, %d dropped%s)",
+            prompt_tokens, packed.tokens, packed.raw_tokens, packed.chunks, packed.blocks, packed.dropped,
+            ", trimmed" if packed.trimmed else "",
+        )
+        return prompt_tokens
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = list(self._recent)
+        if not recent:
+            return {"prompts": 0}
+        tokens = np.array([t for t, _ in recent])
+        saved = np.array([s for _, s in recent])
+        return {
+            "prompts": len(recent),
+            "prompt_tokens_p50": int(np.percentile(tokens, 50)),
+            "prompt_tokens_p95": int(np.percentile(tokens, 95)),
+            "context_tokens_saved_mean": round(float(saved.mean()), 1),
+        }
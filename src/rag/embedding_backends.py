@@ -0,0 +1,175 @@
+# src/rag/embedding_backends.py
+"""
+Pluggable embedding backends for CPU-only serving.
+
+EMBEDDING_BACKEND (see src/utils/config_loader.py) selects:
+- "torch":     HuggingFaceEmbeddings / sentence-transformers (the default).
+- "onnx":      the same model exported to ONNX, run with ONNX Runtime.
+- "onnx-int8": the ONNX model with dynamically quantized int8 weights.
+
+The ONNX backends reproduce sentence-transformers' MiniLM pipeline
+(WordPiece tokenization, mean pooling over the attention mask, L2
+normalisation), so their vectors are interchangeable with the ones already
+stored in the vector DBs; benchmarks/check_embedding_parity.py verifies it.
+
+Export the model once (needs torch + transformers, only on the build box):
+    python -m src.rag.embedding_backends --model sentence-transformers/all-MiniLM-L6-v2
+"""
+
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def default_onnx_dir(model_name: str) -> str:
+    return str(Path("models") / f"{model_name.rstrip('/').split('/')[-1]}-onnx")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an exported ONNX transformer.
+
+    Parameters:
+    - model_dir: Directory holding the .onnx file and tokenizer.json.
+    - model_file: ONNX file to load (fp32 or int8).
+    - threads: ONNX Runtime intra-op threads (0 = runtime default).
+    - max_length: Tokens per text; MiniLM was trained with 256.
+    - batch_size: Texts per forward pass in embed_documents.
+    """
+
+    def __init__(self, model_dir: str, model_file: str = ONNX_MODEL_FILE, threads: int = 0,
+                 max_length: int = 256, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = Path(model_dir)
+        if not (path / model_file).exists():
+            raise FileNotFoundError(
+                f"No ONNX model at {path / model_file}; run `python -m src.rag.embedding_backends` to export it."
+            )
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(path / model_file), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(path / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, feeds)[0]  # (batch, tokens, dim) last_hidden_state
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Batch texts of similar length together so little compute goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            vectors = self._encode([texts[i] for i in idx])
+            if not out.shape[1]:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[idx] = vectors
+        return out.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+def load_embedding_backend(
+    backend: str = "torch",
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    threads: int = 0,
+    onnx_dir: str = "",
+    batch_size: int = 32,
+) -> Embeddings:
+    """Build the Embeddings object for a backend name (see BACKENDS)."""
+    if backend == "torch":
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+    if backend in ("onnx", "onnx-int8"):
+        model_file = ONNX_INT8_MODEL_FILE if backend == "onnx-int8" else ONNX_MODEL_FILE
+        return OnnxEmbeddings(onnx_dir or default_onnx_dir(model_name), model_file, threads=threads,
+                              batch_size=batch_size)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'; expected one of {', '.join(BACKENDS)}")
+
+
+def embeddings_from_config(config: dict) -> Embeddings:
+    """load_embedding_backend with the EMBEDDING_* settings from load_config()."""
+    return load_embedding_backend(
+        config.get("EMBEDDING_BACKEND", "torch"),
+        config["EMBEDDING_MODEL"],
+        threads=config.get("EMBEDDING_THREADS", 0),
+        onnx_dir=config.get("EMBEDDING_ONNX_DIR", ""),
+    )
+
+
+# ---------------------------
+# Export
+# ---------------------------
+def export_onnx_model(model_name: str, out_dir: str, opset: int = 14) -> None:
+    """
+    Export a Hugging Face encoder to ONNX (fp32) plus a dynamically quantized
+    int8 copy, with its fast tokenizer, into out_dir.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(str(out))  # writes tokenizer.json for fast tokenizers
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), str(out / ONNX_MODEL_FILE),
+            input_names=names, output_names=["last_hidden_state"], dynamic_axes=dynamic, opset_version=opset,
+        )
+    quantize_dynamic(str(out / ONNX_MODEL_FILE), str(out / ONNX_INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (fp32 + int8).")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--out", default="", help="Output directory (default: models/<model>-onnx).")
+    args = parser.parse_args()
+
+    out_dir = args.out or default_onnx_dir(args.model)
+    export_onnx_model(args.model, out_dir)
+    print(f"✅ Exported {args.model} to {out_dir} ({ONNX_MODEL_FILE}, {ONNX_INT8_MODEL_FILE})")
+
+
+if __name__ == "__main__":
+    main()
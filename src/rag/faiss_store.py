@@ -0,0 +1,343 @@
+# src/rag/faiss_store.py
+"""
+FAISS-backed subject store.
+
+A subject's FAISS directory holds one or more version directories and a
+CURRENT pointer file naming the live one. Each version holds:
+- index.faiss   the ANN index (flat, HNSW, IVF, or int8/float16 scalar
+                quantized), read memory-mapped so several worker processes
+                share the same page-cache pages
+- vectors.npy   the float32 chunk embeddings (memory-mapped; used for
+                router/cache reads and to rescore quantized candidates)
+- chunks.bin    one JSON [text, metadata] record per chunk, in index order,
+                memory-mapped and decoded only for the chunks a call returns
+- chunk_offsets.npy  byte offset of each record in chunks.bin (memory-mapped)
+- ids.json      chunk ids in index order; the only per-chunk data each
+                process loads into its own heap (for get by id)
+- faiss_meta.json  index type, layout format and the Chroma source it was
+                exported from
+
+An export builds a new version directory under a unique name and then
+replaces CURRENT, so readers see either the old set of files or the new
+one, and concurrent exports never write to the same paths. Exports in an
+older layout (chunks.json, or no CURRENT) have an older FORMAT and are
+rebuilt by src/ingest/faiss_export.py before they are opened.
+
+FaissStore answers the same calls the retrieval code makes on a Chroma
+store (vector search with relevance scores, get by id / page), so the
+two backends are interchangeable behind src/rag/vector_stores.py.
+Distances are squared L2, like Chroma's default "l2" space, and are turned
+into relevance with the same formula, so scores and thresholds match.
+
+The quantized types ("sq8": 1 byte per dimension, "fp16": 2 bytes) keep
+only compact codes in the index. A search over them fetches `rescore` x k
+candidates and re-ranks those with exact float32 distances read from
+vectors.npy, so only the candidates' rows are ever paged in and the
+reported distances are exact.
+"""
+
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+IDS_FILE = "ids.json"
+META_FILE = "faiss_meta.json"
+LEGACY_CHUNKS_FILE = "chunks.json"
+# Layout version recorded in faiss_meta.json; exports with another one are rebuilt
+FORMAT = 2
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+INDEX_TYPES = ("flat", "hnsw", "ivf", "sq8", "fp16")
+QUANTIZED_TYPES = {"sq8": "QT_8bit", "fp16": "QT_fp16"}
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+IVF_MIN_POINTS_PER_LIST = 39
+
+# Versions are pruned only once finished this long ago (one may be about to
+# become current) or, if unfinished, started this long ago (its export died)
+RETIRE_GRACE_SECONDS = 60
+STALE_BUILD_SECONDS = 3600
+
+
+def euclidean_relevance(distance: float) -> float:
+    """Same mapping langchain applies to Chroma's l2 distances."""
+    return 1.0 - distance / math.sqrt(2)
+
+
+def _mmap_flags() -> int:
+    # IO_FLAG_MMAP_IFC also maps flat/HNSW vector codes, not just IVF lists
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return flag | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+
+
+def build_index(vectors: np.ndarray, index_type: str = "flat", nlist: Optional[int] = None):
+    """Build an L2 index of the requested type over (n, d) float32 vectors."""
+    n, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivf":
+        # ~sqrt(n) lists, capped so k-means gets the ~39 points per list it needs
+        nlist = max(1, min(nlist or int(math.sqrt(n)), n // IVF_MIN_POINTS_PER_LIST))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.train(vectors)
+    elif index_type in QUANTIZED_TYPES:
+        index = faiss.IndexScalarQuantizer(
+            dim, getattr(faiss.ScalarQuantizer, QUANTIZED_TYPES[index_type]), faiss.METRIC_L2
+        )
+        index.train(vectors)  # learns per-dimension ranges (a no-op for fp16)
+    else:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'; expected one of {', '.join(INDEX_TYPES)}")
+    if n:
+        index.add(vectors)
+    return index
+
+
+def resolve_faiss_dir(db_dir: str) -> Path:
+    """The version directory CURRENT names, or db_dir itself for an unversioned export."""
+    path = Path(db_dir)
+    try:
+        name = (path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        name = ""
+    return path / name if name else path
+
+
+def _prune_versions(root: Path, keep: Sequence[str]) -> None:
+    """
+    Delete old versions other than `keep` and the live one, and files left
+    from before versioning. The version just replaced is in `keep`, since
+    readers that resolved CURRENT before the flip may still be opening it.
+    """
+    keep = set(keep) | {resolve_faiss_dir(str(root)).name}
+    now = time.time()
+    for path in root.glob(f"{VERSION_PREFIX}*"):
+        if not path.is_dir() or path.name in keep:
+            continue
+        try:
+            finished = now - (path / META_FILE).stat().st_mtime > RETIRE_GRACE_SECONDS
+        except OSError:
+            try:
+                finished = now - path.stat().st_mtime > STALE_BUILD_SECONDS
+            except OSError:
+                continue
+        if finished:
+            shutil.rmtree(path, ignore_errors=True)
+    for name in (INDEX_FILE, VECTORS_FILE, LEGACY_CHUNKS_FILE, META_FILE):
+        try:
+            (root / name).unlink()
+        except OSError:
+            pass
+
+
+def write_faiss_dir(
+    out_dir: str,
+    ids: List[str],
+    texts: List[str],
+    metadatas: List[dict],
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    meta: Optional[dict] = None,
+) -> None:
+    """
+    Write a new version of a subject's FAISS directory and make it current.
+    Files are written into a version directory no other export uses
+    (faiss_meta.json last, marking it finished), then CURRENT is replaced.
+    Processes that already mapped the old files keep reading them.
+    """
+    root = Path(out_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    previous = resolve_faiss_dir(out_dir).name
+    version = root / f"{VERSION_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    version.mkdir()
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    try:
+        faiss.write_index(build_index(vectors, index_type), str(version / INDEX_FILE))
+        with open(version / VECTORS_FILE, "wb") as f:
+            np.save(f, vectors)
+        offsets = [0]
+        with open(version / RECORDS_FILE, "wb") as f:
+            for text, metadata in zip(texts, metadatas):
+                offsets.append(offsets[-1] + f.write(json.dumps([text, metadata], ensure_ascii=False).encode("utf-8")))
+        np.save(version / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+        with open(version / IDS_FILE, "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+        with open(version / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({**(meta or {}), "index_type": index_type, "count": len(ids), "format": FORMAT}, f)
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+
+    pointer = root / f"{CURRENT_FILE}.{version.name}.tmp"
+    pointer.write_text(version.name, encoding="utf-8")
+    os.replace(pointer, root / CURRENT_FILE)
+    _prune_versions(root, keep=[version.name, previous])
+
+
+def read_faiss_meta(db_dir: str) -> Optional[dict]:
+    try:
+        with open(resolve_faiss_dir(db_dir) / META_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+class FaissStore:
+    """
+    Read-only subject store over a FAISS directory.
+
+    Parameters:
+    - db_dir: Directory written by write_faiss_dir (its current version is opened).
+    - embedding_function: Only needed for text queries (similarity_search).
+    - nprobe: IVF lists probed per query (recall vs latency).
+    - ef_search: HNSW candidate list size per query (recall vs latency).
+    - rescore: Candidates per result re-ranked at full precision for
+      quantized indexes (0 = use the quantized distances as they are).
+    """
+
+    def __init__(self, db_dir: str, embedding_function=None, nprobe: int = 8, ef_search: int = 64,
+                 rescore: int = 4):
+        # Resolved once, so every file below comes from the same version
+        path = resolve_faiss_dir(db_dir)
+        self.db_dir = str(db_dir)
+        self.embedding_function = embedding_function
+        self.meta = read_faiss_meta(str(path)) or {}
+        self.rescore_factor = rescore
+        self.rescore = rescore if self.meta.get("index_type") in QUANTIZED_TYPES else 0
+        self.index = faiss.read_index(str(path / INDEX_FILE), _mmap_flags())
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = nprobe
+        if hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = ef_search
+        self.vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+        # Texts and metadata stay in the page cache, shared by every worker process
+        self._offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        self._records = (np.memmap(path / RECORDS_FILE, dtype=np.uint8, mode="r")
+                         if os.path.getsize(path / RECORDS_FILE) else np.zeros(0, dtype=np.uint8))
+        with open(path / IDS_FILE, "r", encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+        self._positions: Dict[str, int] = {cid: i for i, cid in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def index_bytes(self) -> int:
+        """Bytes of vector codes held by the index (what a search scans)."""
+        codes = getattr(self.index, "code_size", None) or self.index.d * 4
+        return int(codes * self.index.ntotal)
+
+    def _record(self, pos: int) -> Tuple[str, dict]:
+        """(text, metadata) of one chunk, decoded from the mapped records."""
+        text, meta = json.loads(self._records[self._offsets[pos]:self._offsets[pos + 1]].tobytes())
+        return text or "", meta or {}
+
+    def _document(self, pos: int) -> Document:
+        text, meta = self._record(pos)
+        return Document(page_content=text, metadata=meta, id=self.ids[pos])
+
+    def _matches(self, pos: int, where: Optional[dict]) -> bool:
+        if not where:
+            return True
+        meta = self._record(pos)[1]
+        return all(meta.get(key) == value for key, value in where.items())
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def search_vectors(self, query_vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched search: (distances, positions), -1 where fewer than k hits exist.
+        Quantized indexes over-fetch and return exact float32 distances.
+        """
+        queries = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        k = min(k, max(len(self), 1))
+        if not self.rescore:
+            return self.index.search(queries, k)
+        _, candidates = self.index.search(queries, min(k * self.rescore, len(self)))
+        return self._rescore(queries, candidates, k)
+
+    def _rescore(self, queries: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, cand) in enumerate(zip(queries, candidates)):
+            cand = cand[cand >= 0]
+            if not len(cand):
+                continue
+            # Sorted fancy-indexing reads the memmap in file order
+            cand = np.sort(cand)
+            exact = ((np.asarray(self.vectors[cand]) - query) ** 2).sum(axis=1)
+            best = np.argsort(exact)[:k]
+            distances[row, :len(best)] = exact[best]
+            positions[row, :len(best)] = cand[best]
+        return distances, positions
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: Sequence[float], k: int = 4, filter: Optional[dict] = None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        """Return (Document, squared L2 distance) pairs, nearest first."""
+        if not len(self):
+            return []
+        # Over-fetch when filtering, since FAISS cannot filter on metadata itself
+        fetch = k if not filter else len(self)
+        distances, positions = self.search_vectors(np.asarray([embedding]), fetch)
+        hits = []
+        for distance, pos in zip(distances[0], positions[0]):
+            if pos < 0 or not self._matches(pos, filter):
+                continue
+            hits.append((self._document(pos), float(distance)))
+            if len(hits) == k:
+                break
+        return hits
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        if self.embedding_function is None:
+            raise ValueError("FaissStore needs an embedding_function for text queries")
+        vector = self.embedding_function.embed_query(query)
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(vector, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return euclidean_relevance
+
+    # ---------------------------
+    # Chroma-style get
+    # ---------------------------
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None, **kwargs) -> dict:
+        include = ["documents", "metadatas"] if include is None else include
+        if ids is not None:
+            ids = [ids] if isinstance(ids, str) else ids
+            positions = [self._positions[cid] for cid in ids if cid in self._positions]
+        else:
+            positions = range(len(self))
+        if where:
+            positions = [pos for pos in positions if self._matches(pos, where)]
+        positions = list(positions)[offset or 0:]
+        if limit is not None:
+            positions = positions[:limit]
+
+        got = {"ids": [self.ids[pos] for pos in positions]}
+        if "documents" in include or "metadatas" in include:
+            records = [self._record(pos) for pos in positions]
+            if "documents" in include:
+                got["documents"] = [text for text, _ in records]
+            if "metadatas" in include:
+                got["metadatas"] = [meta for _, meta in records]
+        if "embeddings" in include:
+            got["embeddings"] = np.asarray(self.vectors[positions]) if positions else np.zeros((0, 0), np.float32)
+        return got
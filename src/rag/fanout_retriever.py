@@ -0,0 +1,87 @@
+# src/rag/fanout_retriever.py
+"""
+Fan-out retrieval across every subject collection.
+
+Used when routing cannot pick a subject with confidence: the query vector
+is searched against all subject stores concurrently on a thread pool
+(Chroma/HNSW release the GIL, so wall-clock time is about one search), the
+hits are merged by relevance score, and the subject with the strongest
+evidence wins. The winner's hits are returned so the caller can build the
+prompt without searching again.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain.schema import Document
+
+from src.rag.hybrib_retriever import search_with_scores
+from src.logger import get_logger
+
+logger = get_logger("fanout_retriever")
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    """Process-wide pool so fan-out never pays thread start-up per question."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fanout")
+        return _POOL
+
+
+class FanoutResult:
+    """Merged fan-out hits plus the subject the evidence points to."""
+
+    def __init__(self, per_subject: Dict[str, List[Tuple[Document, float]]], evidence_k: int):
+        self.per_subject = per_subject
+        # Evidence = mean relevance of each subject's top hits
+        self.subject_scores = {
+            subject: (sum(score for _, score in hits[:evidence_k]) / min(len(hits), evidence_k)) if hits else 0.0
+            for subject, hits in per_subject.items()
+        }
+        self.subject = max(self.subject_scores, key=self.subject_scores.get) if self.subject_scores else None
+        self.score = self.subject_scores.get(self.subject, 0.0)
+
+    @property
+    def hits(self) -> List[Tuple[Document, float]]:
+        """The winning subject's hits, best first."""
+        return self.per_subject.get(self.subject, [])
+
+    def merged(self) -> List[Tuple[str, Document, float]]:
+        """All hits from every subject as (subject, doc, score), best first."""
+        rows = [(s, doc, score) for s, hits in self.per_subject.items() for doc, score in hits]
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+
+def fanout_search(
+    stores: Dict[str, object],
+    query_vector: Sequence[float],
+    k: int = 5,
+    evidence_k: int = 3,
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> FanoutResult:
+    """
+    Search all subject stores concurrently and pick the best-supported subject.
+
+    Relevance scores come from each store's own relevance function, so they
+    share the 0..1 scale; they are clipped to it before merging.
+    """
+    pool = executor or _shared_pool()
+    futures = {
+        subject: pool.submit(search_with_scores, store, query_vector, k)
+        for subject, store in stores.items()
+    }
+    per_subject = {}
+    for subject, future in futures.items():
+        try:
+            hits = future.result()
+        except Exception as e:
+            logger.warning("Fan-out search failed for '%s': %s", subject, e)
+            hits = []
+        per_subject[subject] = [(doc, min(max(score, 0.0), 1.0)) for doc, score in hits]
+    return FanoutResult(per_subject, evidence_k)
@@ -4,13 +4,112 @@ Hybrid document retriever and re-ranker for EduTutor RAG.
 Combines embedding similarity and lexical overlap for improved context selection.
 """
 
-from typing import List, Optional
-from rapidfuzz import fuzz
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
 from langchain.schema import Document
 
+# ---------------------------
+# Vector retrieval with scores
+# ---------------------------
+def _relevance_fn(store):
+    try:
+        return store._select_relevance_score_fn()
+    except (AttributeError, NotImplementedError, ValueError):
+        return lambda distance: 1.0 / (1.0 + distance)
+
+def search_with_scores(store, query_vector: Sequence[float], k: int = 4) -> List[Tuple[Document, float]]:
+    """
+    Vector search that also returns relevance scores (higher = more similar).
+
+    Chroma's *_by_vector_with_relevance_scores returns raw distances, so they
+    are converted with the store's own relevance function (the same one
+    similarity_search_with_relevance_scores uses), without re-embedding the query.
+    """
+    results = store.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
+    to_relevance = _relevance_fn(store)
+    return [(doc, float(to_relevance(distance))) for doc, distance in results]
+
+def fetch_with_scores(store, chunk_ids: List[str], query_vector: Sequence[float]) -> Dict[str, Tuple[Document, float]]:
+    """
+    Load chunks from the vector store by id (used for lexical-only hits),
+    each with its vector relevance to the query, as search_with_scores
+    would have reported it. Distances are squared L2, the space every store
+    here uses (Chroma's default, and FaissStore).
+    """
+    if not chunk_ids:
+        return {}
+    got = store.get(ids=chunk_ids, include=["documents", "metadatas", "embeddings"])
+    ids = list(got["ids"])
+    embeddings = got.get("embeddings")
+    if embeddings is not None and len(embeddings) == len(ids):
+        diff = np.asarray(embeddings, dtype=np.float32) - np.asarray(query_vector, dtype=np.float32)
+        to_relevance = _relevance_fn(store)
+        relevance = [float(to_relevance(float(d))) for d in np.einsum("ij,ij->i", diff, diff)]
+    else:
+        relevance = [0.0] * len(ids)  # no stored vector: no vector evidence
+    return {
+        cid: (Document(page_content=text or "", metadata=meta or {}), score)
+        for cid, text, meta, score in zip(ids, got["documents"], got["metadatas"], relevance)
+    }
+
+# ---------------------------
+# Rank fusion
+# ---------------------------
+def reciprocal_rank_fusion(
+    rankings: List[List[Tuple[Document, float]]],
+    k: int = 60
+) -> List[Tuple[Document, float]]:
+    """
+    Merge several ranked lists with reciprocal-rank fusion: sum of 1 / (k + rank).
+
+    Only ranks are used, so lists with incomparable score scales (BM25 vs
+    cosine relevance) can be merged. Documents are matched by their text.
+    """
+    fused: Dict[str, List] = {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking, start=1):
+            entry = fused.setdefault(doc.page_content, [doc, 0.0])
+            entry[1] += 1.0 / (k + rank)
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda x: x[1], reverse=True)
+
+def hybrid_search(
+    store,
+    lexical_index,
+    query: str,
+    query_vector: Sequence[float],
+    k: int = 5
+) -> List[Tuple[Document, float]]:
+    """
+    Run vector and BM25 search for one subject and pick candidates with RRF.
+
+    RRF only chooses which chunks to keep. Each one is returned with its
+    vector relevance, the same score a plain vector search gives, so
+    hybrid_rank_scored can add the lexical signal once without counting BM25
+    twice. Falls back to plain vector search when the subject has no
+    lexical index. Returns up to k (Document, vector relevance) pairs.
+    """
+    vector_hits = search_with_scores(store, query_vector, k=k)
+    if lexical_index is None:
+        return vector_hits
+
+    lexical = lexical_index.search(query, k=k)
+    scored_by_id = fetch_with_scores(store, [cid for cid, _ in lexical], query_vector)
+    lexical_hits = [scored_by_id[cid] for cid, _ in lexical if cid in scored_by_id]
+    relevance = {doc.page_content: score for doc, score in lexical_hits + vector_hits}
+    fused = reciprocal_rank_fusion([vector_hits, lexical_hits])[:k]
+    return [(doc, relevance[doc.page_content]) for doc, _ in fused]
+
 # ---------------------------
 # Lexical scoring
 # ---------------------------
+# Only the first 2000 chars of a chunk are scored, for efficiency
+LEXICAL_MAX_CHARS = 2000
+# Below this many candidates, thread start-up costs more than it saves
+LEXICAL_PARALLEL_MIN = 64
+
 def lexical_score(query: str, text: str) -> float:
     """
     Compute a lexical overlap score using rapidfuzz's partial_ratio.
@@ -21,9 +120,67 @@ def lexical_score(query: str, text: str) -> float:
     except Exception:
         return 0.0
 
+@lru_cache(maxsize=8192)
+def lowered_chunk(text: str) -> str:
+    """Truncated, lowercased chunk text; memoized because the same chunks recur across queries."""
+    return text[:LEXICAL_MAX_CHARS].lower()
+
+def lexical_scores(query: str, texts: List[str], workers: int = -1) -> np.ndarray:
+    """
+    Batch version of lexical_score over already-lowered texts.
+
+    Uses rapidfuzz.process.cdist so the whole candidate set is scored in one
+    C++ call, spread over `workers` threads (-1 = all cores) for large sets.
+    Returns a float32 array of scores between 0 and 100.
+    """
+    if not texts:
+        return np.zeros(0, dtype=np.float32)
+    if len(texts) < LEXICAL_PARALLEL_MIN:
+        workers = 1
+    scores = process.cdist(
+        [query.lower()], texts, scorer=fuzz.partial_ratio, dtype=np.float32, workers=workers
+    )
+    return scores[0]
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """Scale scores to 0..1; a constant signal carries no ranking information."""
+    lo, hi = scores.min(), scores.max()
+    if hi - lo < 1e-9:
+        return np.full_like(scores, 0.5)
+    return (scores - lo) / (hi - lo)
+
 # ---------------------------
 # Hybrid ranking
 # ---------------------------
+def hybrid_rank_scored(
+    scored_docs: List[Tuple[Document, float]],
+    query: str,
+    alpha: float = 0.6,
+    top_k: int = 5,
+    workers: int = -1
+) -> List[Tuple[Document, float]]:
+    """
+    Re-rank (document, vector relevance) pairs by fusing both signals.
+
+    Vector relevance and lexical overlap are each min-max normalized over the
+    candidate set so neither dominates because of its scale, then combined as
+    alpha * vector + (1 - alpha) * lexical.
+
+    Returns:
+    - List of up to top_k (Document, fused score in 0..1) pairs, best first.
+    """
+    if not scored_docs:
+        return []
+
+    emb = np.fromiter((score for _, score in scored_docs), dtype=np.float64, count=len(scored_docs))
+    lex = lexical_scores(query, [lowered_chunk(doc.page_content) for doc, _ in scored_docs], workers=workers)
+    lex = lex.astype(np.float64)
+    fused = alpha * _min_max(emb) + (1.0 - alpha) * _min_max(lex)
+
+    # Stable sort keeps vector-store order on ties
+    order = np.argsort(-fused, kind="stable")[:top_k]
+    return [(scored_docs[i][0], float(fused[i])) for i in order]
+
 def hybrid_rank(
     docs: List[Document],
     query: str,
@@ -38,24 +195,16 @@ def hybrid_rank(
     - docs: List of Document objects retrieved from vector store.
     - query: User query string.
     - embedding_scores: Optional list of floats (0..1) corresponding to each doc.
-      If None, defaults to 50 for all.
+      If None, ranking falls back to lexical overlap only.
     - alpha: Weight for embedding similarity (0..1), (1-alpha) is lexical weight.
     - top_k: Number of top documents to return.
     
     Returns:
     - List of top_k Document objects, sorted by combined score.
     """
-    # Normalize embedding scores to 0..100
-    emb_scores = [s * 100 for s in embedding_scores] if embedding_scores else [50.0] * len(docs)
-    ranked = []
-
-    for doc, emb in zip(docs, emb_scores):
-        lex = lexical_score(query, doc.page_content[:2000])  # Only first 2000 chars for efficiency
-        score = alpha * emb + (1.0 - alpha) * lex
-        ranked.append((score, doc))
-
-    ranked.sort(key=lambda x: x[0], reverse=True)
-    return [doc for _, doc in ranked][:top_k]
+    scores = embedding_scores if embedding_scores else [0.5] * len(docs)
+    ranked = hybrid_rank_scored(list(zip(docs, scores)), query, alpha=alpha, top_k=top_k)
+    return [doc for doc, _ in ranked]
 
 # ---------------------------
 # Build context string
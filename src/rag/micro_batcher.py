@@ -0,0 +1,132 @@
+# src/rag/micro_batcher.py
+"""
+Dynamic micro-batching of query embeddings.
+
+Under concurrent load every question would otherwise run its own
+single-text forward pass. MicroBatchEmbeddings puts a small scheduler in
+front of the embedding model: callers enqueue their text and block on a
+Future, while one worker thread collects whatever arrives within a few
+milliseconds (or until max_batch_size texts are waiting), encodes them with
+a single embed_documents call and resolves every caller's Future.
+
+A lone caller pays at most max_wait_ms extra; under load, texts that
+arrive while a batch is being encoded simply form the next batch.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from src.logger import get_logger
+
+logger = get_logger("micro_batcher")
+
+_STOP = object()
+
+
+class MicroBatchEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that batches concurrent embed_query calls.
+
+    Parameters:
+    - embeddings: The Embeddings to wrap (its embed_documents does the work).
+    - max_batch_size: Texts encoded together at most.
+    - max_wait_ms: How long the first text of a batch waits for company.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._largest = 0
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    # ---------------------------
+    # Embeddings interface
+    # ---------------------------
+    def embed_query(self, text: str) -> List[float]:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Ingestion-sized calls are already batched; don't queue them behind queries
+        return self.embeddings.embed_documents(texts)
+
+    def close(self) -> None:
+        """Stop the worker once the texts already queued have been encoded."""
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "texts": self._texts,
+                "mean_batch_size": round(self._texts / self._batches, 2) if self._batches else None,
+                "largest_batch": self._largest,
+            }
+
+    # ---------------------------
+    # Worker
+    # ---------------------------
+    def _collect(self, first: Tuple[str, Future]) -> Tuple[List[Tuple[str, Future]], bool]:
+        """The first item plus whatever arrives within the wait window; True if _STOP was seen."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                # Take what is already queued without waiting, then wait out the window
+                remaining = deadline - time.perf_counter()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _encode(self, batch: List[Tuple[str, Future]]) -> None:
+        # Identical questions in one batch (a class asking the same thing) are encoded once
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = self.embeddings.embed_documents(unique)
+        except Exception as e:
+            logger.exception("Embedding a batch of %d texts failed", len(unique))
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        by_text = dict(zip(unique, vectors))
+        for text, future in batch:
+            future.set_result(by_text[text])
+        with self._lock:
+            self._batches += 1
+            self._texts += len(batch)
+            self._largest = max(self._largest, len(batch))
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = self._collect(first)
+            self._encode(batch)
+            if stop:
+                return
+
+
+def batched_embeddings(config: dict, embeddings: Embeddings) -> Embeddings:
+    """Wrap embeddings in MicroBatchEmbeddings unless QUERY_BATCH_WAIT_MS is 0."""
+    wait_ms = config.get("QUERY_BATCH_WAIT_MS", 2.0)
+    if wait_ms <= 0:
+        return embeddings
+    return MicroBatchEmbeddings(embeddings, config.get("QUERY_BATCH_MAX_SIZE", 32), wait_ms)
@@ -0,0 +1,62 @@
+# src/rag/query_embedder.py
+"""
+Query embedding layer for EduTutor RAG.
+
+Embeds each question once and hands the same vector to the answer cache,
+the vector store (similarity_search_by_vector) and any embedding-based
+routing. A bounded LRU keyed on the normalized query text means repeated
+questions never pay for a second MiniLM forward pass.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivial variants share a cache slot."""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbedder:
+    """
+    Thread-safe LRU cache in front of an Embeddings object.
+
+    Parameters:
+    - embeddings: Any LangChain Embeddings implementation (embed_query).
+    - max_size: Maximum number of cached query vectors.
+    """
+
+    def __init__(self, embeddings, max_size: int = 2048):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, query: str) -> List[float]:
+        """Return the embedding for query, computing it at most once."""
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        # Forward pass outside the lock so concurrent misses don't serialize.
+        # The default MiniLM tokenizer is uncased, so embedding the key is lossless.
+        vector = self.embeddings.embed_query(key)
+
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
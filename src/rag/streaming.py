@@ -0,0 +1,226 @@
+# src/rag/streaming.py
+"""
+Token streaming for EduTutor RAG answers.
+
+TokenStream / AsyncTokenStream wrap an LLM's .stream() / .astream() output:
+they yield plain text pieces as they arrive, time the stream (time to first
+token, tokens per second) and call an on_complete callback with the full
+answer once the stream has finished, which is where callers save memory and
+fill the answer cache. A stream abandoned part-way (client disconnect) or
+failing mid-way does not call on_complete.
+
+FakeStreamingLLM is a local stand-in for ChatOpenAI with the same
+invoke/ainvoke/stream/astream surface, for benchmarks and offline runs.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from src.logger import get_logger
+
+logger = get_logger("streaming")
+
+
+def chunk_text(chunk) -> str:
+    """Text of one streamed chunk (AIMessageChunk, str or dict)."""
+    if hasattr(chunk, "content"):
+        return chunk.content or ""
+    if isinstance(chunk, dict):
+        return chunk.get("content") or chunk.get("output_text") or ""
+    return str(chunk)
+
+
+class StreamStats:
+    """Timing of one streamed answer. Each non-empty chunk counts as one token."""
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.tokens = 0
+
+    def on_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        """Milliseconds from the request (retrieval included) to the first token."""
+        return None if self.first_token_at is None else (self.first_token_at - self.started) * 1000
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        if self.first_token_at is None or self.finished_at is None or self.tokens < 2:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> dict:
+        return {
+            "ttft_ms": None if self.ttft_ms is None else round(self.ttft_ms, 1),
+            "tokens": self.tokens,
+            "tokens_per_sec": None if self.tokens_per_sec is None else round(self.tokens_per_sec, 1),
+        }
+
+
+class StreamMetrics:
+    """Rolling window of recent StreamStats for the /stats endpoint and logs."""
+
+    def __init__(self, window: int = 500):
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, stats: StreamStats) -> None:
+        if stats.ttft_ms is None:
+            return
+        with self._lock:
+            self._recent.append((stats.ttft_ms, stats.tokens_per_sec))
+        logger.info("Streamed %d tokens, TTFT %.0f ms, %s tok/s", stats.tokens, stats.ttft_ms,
+                    "n/a" if stats.tokens_per_sec is None else f"{stats.tokens_per_sec:.1f}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = list(self._recent)
+        if not recent:
+            return {"streams": 0}
+        ttft = np.array([t for t, _ in recent])
+        rates = np.array([r for _, r in recent if r is not None])
+        return {
+            "streams": len(recent),
+            "ttft_ms_p50": round(float(np.percentile(ttft, 50)), 1),
+            "ttft_ms_p95": round(float(np.percentile(ttft, 95)), 1),
+            "tokens_per_sec_p50": round(float(np.percentile(rates, 50)), 1) if len(rates) else None,
+        }
+
+
+class TokenStream:
+    """
+    Iterable of answer text pieces.
+
+    Parameters:
+    - chunks: The LLM's .stream(...) iterator (or any iterable of chunks/strings).
+    - on_complete: Called with the full text after the last piece was consumed.
+    - stats: StreamStats to fill in (create it before retrieval to include it in TTFT).
+    - metrics: Optional StreamMetrics the finished stats are recorded into.
+    """
+
+    def __init__(self, chunks: Iterable, on_complete: Optional[Callable[[str], None]] = None,
+                 stats: Optional[StreamStats] = None, metrics: Optional[StreamMetrics] = None):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self.stats = stats or StreamStats()
+        self._metrics = metrics
+        self.text: Optional[str] = None  # set once the stream has completed
+
+    def __iter__(self) -> Iterator[str]:
+        parts: List[str] = []
+        for chunk in self._chunks:
+            piece = chunk_text(chunk)
+            if piece:
+                self.stats.on_token()
+                parts.append(piece)
+                yield piece
+        self.stats.finish()
+        self.text = "".join(parts).strip()
+        if self._metrics is not None:
+            self._metrics.record(self.stats)
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+
+class AsyncTokenStream(TokenStream):
+    """
+    Async counterpart of TokenStream over an LLM's .astream(...) iterator.
+
+    on_complete runs in a worker thread: it may block (memory summaries call
+    the LLM, evicted sessions are written to disk) and must not stall the
+    event loop.
+    """
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        parts: List[str] = []
+        async for chunk in self._chunks:
+            piece = chunk_text(chunk)
+            if piece:
+                self.stats.on_token()
+                parts.append(piece)
+                yield piece
+        self.stats.finish()
+        self.text = "".join(parts).strip()
+        if self._metrics is not None:
+            self._metrics.record(self.stats)
+        if self._on_complete is not None:
+            await asyncio.to_thread(self._on_complete, self.text)
+
+
+def single_chunk(text: str) -> Iterator[str]:
+    """Stream a ready-made answer (cache hit, small talk) as one piece."""
+    yield text
+
+
+async def asingle_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+# ---------------------------
+# Local fake LLM
+# ---------------------------
+class FakeStreamingLLM:
+    """
+    Deterministic stand-in for ChatOpenAI: answers with `answer` (or echoes
+    the last line of the prompt), one word per chunk.
+
+    Parameters:
+    - answer: Fixed answer text; None echoes the prompt's last non-empty line.
+    - first_token_delay: Seconds before the first chunk (model "thinking").
+    - token_delay: Seconds between chunks.
+    - prompt_token_delay: Extra seconds before the first chunk per prompt token
+      (prefill), so longer prompts answer later like a real model.
+    """
+
+    def __init__(self, answer: Optional[str] = None, first_token_delay: float = 0.2, token_delay: float = 0.02,
+                 prompt_token_delay: float = 0.0):
+        self.answer = answer
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompt_token_delay = prompt_token_delay
+
+    def _prefill(self, prompt) -> float:
+        if not self.prompt_token_delay:
+            return self.first_token_delay
+        from src.rag.context_packer import count_tokens
+        return self.first_token_delay + self.prompt_token_delay * count_tokens(str(prompt))
+
+    def _tokens(self, prompt) -> List[str]:
+        if self.answer is not None:
+            text = self.answer
+        else:
+            lines = [line for line in str(prompt).splitlines() if line.strip()]
+            text = f"You asked: {lines[-1].strip() if lines else ''}"
+        words = text.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def stream(self, prompt, **kwargs) -> Iterator[str]:
+        for i, token in enumerate(self._tokens(prompt)):
+            time.sleep(self._prefill(prompt) if i == 0 else self.token_delay)
+            yield token
+
+    async def astream(self, prompt, **kwargs) -> AsyncIterator[str]:
+        for i, token in enumerate(self._tokens(prompt)):
+            await asyncio.sleep(self._prefill(prompt) if i == 0 else self.token_delay)
+            yield token
+
+    def invoke(self, prompt, **kwargs) -> str:
+        return "".join(self.stream(prompt))
+
+    async def ainvoke(self, prompt, **kwargs) -> str:
+        return "".join([token async for token in self.astream(prompt)])
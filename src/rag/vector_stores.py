@@ -0,0 +1,225 @@
+# src/rag/vector_stores.py
+"""
+Opens the vector stores the apps query, one entry per subject.
+
+Every store answers the same few calls (see SubjectStore), so the
+retrievers, BM25, router and fan-out code never care which backend is used.
+
+Backends (config VECTOR_BACKEND):
+- "chroma" (default), in one of two layouts (config VECTOR_LAYOUT):
+  - "per_subject": one Chroma persist directory per subject.
+  - "unified": a single combined collection (see src/ingest/unified_index.py);
+    each subject gets a SubjectView that filters on the ``subject`` field.
+- "faiss": memory-mapped FAISS indexes exported from the Chroma stores
+  (see src/ingest/faiss_export.py and src/rag/faiss_store.py).
+"""
+
+import threading
+from typing import Callable, Iterable, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+from langchain_chroma import Chroma
+from langchain.schema import Document
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.ingest.faiss_export import export_all, export_subject, faiss_subject_dir
+from src.rag.faiss_store import FaissStore
+from src.utils.startup import LazyMapping, StartupTimer
+from src.ingest.unified_index import (
+    SUBJECT_FIELD,
+    migrate_to_unified,
+    open_unified_collection,
+    record_unified_subject,
+    sync_unified_subject,
+    unified_id,
+)
+
+LAYOUTS = ("per_subject", "unified")
+BACKENDS = ("chroma", "faiss")
+
+
+class SubjectStore(Protocol):
+    """The store calls the retrieval, routing and caching code relies on."""
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: Sequence[float], k: int = 4, filter: Optional[dict] = None, **kwargs
+    ) -> List[Tuple[Document, float]]: ...
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]: ...
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None, **kwargs) -> dict: ...
+
+    def _select_relevance_score_fn(self): ...
+
+
+class SubjectView:
+    """
+    One subject's slice of the unified collection.
+
+    Exposes the Chroma calls the retrieval code makes, with the subject
+    filter applied and chunk ids translated back to per-subject ids (the
+    ids BM25 indexes and manifests use). Anything else is delegated.
+    """
+
+    def __init__(self, store: Chroma, subject: str):
+        self.store = store
+        self.subject = subject
+        self._prefix = unified_id(subject, "")
+
+    def _where(self, extra: Optional[dict]) -> dict:
+        own = {SUBJECT_FIELD: self.subject}
+        return {"$and": [own, extra]} if extra else own
+
+    def _local_id(self, cid: Optional[str]) -> Optional[str]:
+        return cid[len(self._prefix):] if cid and cid.startswith(self._prefix) else cid
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k: int = 4, filter: Optional[dict] = None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        results = self.store.similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=self._where(filter), **kwargs
+        )
+        for doc, _ in results:
+            doc.id = self._local_id(doc.id)
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        docs = self.store.similarity_search(query, k=k, filter=self._where(filter), **kwargs)
+        for doc in docs:
+            doc.id = self._local_id(doc.id)
+        return docs
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None, **kwargs) -> dict:
+        if isinstance(ids, str):
+            ids = [ids]
+        got = self.store.get(
+            ids=[unified_id(self.subject, cid) for cid in ids] if ids else None,
+            where=self._where(where),
+            limit=limit,
+            offset=offset,
+            include=include,
+            **kwargs,
+        )
+        got["ids"] = [self._local_id(cid) for cid in got["ids"]]
+        return got
+
+    def _select_relevance_score_fn(self):
+        return self.store._select_relevance_score_fn()
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def subject_store_opener(
+    chroma_dir: str,
+    embeddings=None,
+    layout: str = "per_subject",
+    backend: str = "chroma",
+    index_type: str = "flat",
+    nprobe: int = 8,
+    ef_search: int = 64,
+    rescore: int = 4,
+) -> Callable[[str], SubjectStore]:
+    """
+    Return a function that opens one subject's store for the requested
+    backend and layout. It is safe to call for several subjects at once.
+
+    Derived stores (the unified collection, FAISS exports) are brought up to
+    date with the per-subject Chroma stores first, so they never serve stale chunks.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{backend}'; expected one of {', '.join(BACKENDS)}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown VECTOR_LAYOUT '{layout}'; expected one of {', '.join(LAYOUTS)}")
+
+    if backend == "faiss":
+        def open_faiss(name: str) -> SubjectStore:
+            export_all(chroma_dir, [name], index_type=index_type)
+            return FaissStore(
+                faiss_subject_dir(chroma_dir, name), embeddings, nprobe=nprobe, ef_search=ef_search, rescore=rescore
+            )
+        return open_faiss
+
+    if layout == "unified":
+        shared: List[Chroma] = []
+        lock = threading.Lock()
+
+        def open_view(name: str) -> SubjectStore:
+            with lock:
+                if not shared:
+                    shared.append(open_unified_collection(chroma_dir, embeddings))
+            migrate_to_unified(chroma_dir, [name], unified=shared[0])
+            return SubjectView(shared[0], name)
+        return open_view
+
+    def open_chroma(name: str) -> SubjectStore:
+        return Chroma(persist_directory=resolve_subject_dir(chroma_dir, name), embedding_function=embeddings)
+    return open_chroma
+
+
+def open_subject_stores(
+    chroma_dir: str,
+    subjects: Iterable[str],
+    embeddings=None,
+    layout: str = "per_subject",
+    backend: str = "chroma",
+    index_type: str = "flat",
+    nprobe: int = 8,
+    ef_search: int = 64,
+    rescore: int = 4,
+    lazy: bool = False,
+    timer: Optional[StartupTimer] = None,
+) -> Mapping[str, SubjectStore]:
+    """
+    Return {subject: store} for the requested backend and layout.
+
+    Stores are opened in parallel. With lazy=True a LazyMapping is returned
+    instead and each store opens on first use (call prefetch() on it to
+    open the rest in the background).
+    """
+    opener = subject_store_opener(
+        chroma_dir, embeddings, layout=layout, backend=backend,
+        index_type=index_type, nprobe=nprobe, ef_search=ef_search, rescore=rescore,
+    )
+    stores = LazyMapping(subjects, opener, timer=timer)
+    if lazy:
+        return stores
+    stores.prefetch(wait=True)
+    return dict(stores)
+
+
+def open_stores_from_config(config: dict, subjects: Iterable[str], embeddings=None, lazy: bool = False,
+                            timer: Optional[StartupTimer] = None) -> Mapping[str, SubjectStore]:
+    """open_subject_stores with the VECTOR_* / FAISS_* settings from load_config()."""
+    return open_subject_stores(
+        config["CHROMA_DB_DIR"],
+        subjects,
+        embeddings,
+        layout=config.get("VECTOR_LAYOUT", "per_subject"),
+        backend=config.get("VECTOR_BACKEND", "chroma"),
+        index_type=config.get("FAISS_INDEX", "flat"),
+        nprobe=config.get("FAISS_NPROBE", 8),
+        ef_search=config.get("FAISS_EF_SEARCH", 64),
+        rescore=config.get("FAISS_RESCORE", 4),
+        lazy=lazy,
+        timer=timer,
+    )
+
+
+def reopen_subject_store(current, chroma_dir: str, subject: str, db_path: str, embeddings=None):
+    """
+    Return the store to serve for a subject whose per-subject DB now lives at
+    db_path (after background re-ingestion). A unified view is refreshed in
+    place from db_path; FAISS indexes are re-exported and reopened; a
+    per-subject Chroma store is replaced by one opened there.
+    """
+    if isinstance(current, SubjectView):
+        chunks = sync_unified_subject(current.store, subject, db_path)
+        record_unified_subject(chroma_dir, subject, db_path, chunks)
+        return current
+    if isinstance(current, FaissStore):
+        out_dir = faiss_subject_dir(chroma_dir, subject)
+        export_subject(db_path, out_dir, current.meta.get("index_type", "flat"))
+        nprobe = getattr(current.index, "nprobe", 8)
+        ef_search = current.index.hnsw.efSearch if hasattr(current.index, "hnsw") else 64
+        return FaissStore(out_dir, embeddings, nprobe=nprobe, ef_search=ef_search, rescore=current.rescore_factor)
+    return Chroma(persist_directory=db_path, embedding_function=embeddings)
@@ -1,40 +1,260 @@
 # src/routing/router_agent.py
 """
-Router Agent: Automatically routes user queries to the correct subject QA agent
-based on keyword matching and fuzzy similarity.
+Router Agent: Automatically routes user queries to the correct subject QA agent.
+
+The primary router compares the query embedding with per-subject prototype
+vectors computed from the subjects' own vector stores: one NumPy matrix
+product, a per-subject max, and a temperature-scaled softmax whose
+temperature is fitted on held-out chunks so the confidence is calibrated.
+Keyword matching is kept only as a fallback for when no router is loaded
+or the router is unsure.
 """
 
-from difflib import SequenceMatcher
-from typing import Optional
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.ingest.collection_paths import resolve_subject_dir
+from src.ingest.ingest_stamp import read_ingest_stamp
+from src.logger import get_logger
+from src.secuirity.pattern_engine import get_engine
+
+logger = get_logger("router_agent")
+
+ROUTER_FILE = "router_prototypes.npz"
+# Held-out chunks are easier to classify than short student questions, so
+# calibration on them is capped at this sharpness to avoid overconfidence
+MIN_TEMPERATURE = 0.02
 
 SUBJECT_KEYWORDS = {
-    "english": ["noun", "verb", "grammar", "sentence", "tense", "english"],
-    "physics": ["force", "motion", "energy", "light", "speed", "physics"],
-    "biology": ["cell", "organism", "protein", "photosynthesis", "biology"],
-    "pakistan_studies": ["pakistan", "independence", "1947", "quaid", "lahore", "pakistan studies"],
+    "english": ["grammar", "english", "sentence", "verb", "noun", "essay", "adjective", "paragraph", "tense"],
+    "physics": ["physics", "force", "motion", "energy", "newton", "velocity", "optics", "gravity", "speed"],
+    "biology": ["biology", "cell", "organism", "photosynthesis", "dna", "protein", "enzyme", "plant", "animal"],
+    "pakistan_studies": ["pakistan", "independence", "quaid", "1947", "constitution", "lahore"],
 }
 
-def detect_subject(query: str, threshold: float = 0.45) -> Optional[str]:
+# ---------------------------
+# Keyword fallback
+# ---------------------------
+def keyword_subject(query: str) -> Optional[str]:
+    """Return the first subject with a keyword contained in the query, if any."""
+    # The keywords are part of the shared pattern engine, whose scan of this text is usually cached
+    engine = get_engine()
+    keywords = engine.scan(query).get("subject")
+    return engine.payloads["subject"][keywords[0]] if keywords else None
+
+# ---------------------------
+# Embedding router
+# ---------------------------
+class RouteResult:
+    """Outcome of routing one query."""
+
+    __slots__ = ("subject", "confidence", "scores")
+
+    def __init__(self, subject: str, confidence: float, scores: Dict[str, float]):
+        self.subject = subject
+        self.confidence = confidence
+        self.scores = scores  # calibrated probability per subject
+
+    def __repr__(self) -> str:
+        return f"RouteResult(subject={self.subject!r}, confidence={self.confidence:.2f})"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """A few rounds of cosine k-means; returns k unit prototype vectors."""
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(seed)
+    centers = vectors[rng.choice(len(vectors), size=k, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centers.T, axis=1)
+        for c in range(k):
+            members = vectors[assign == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+        centers = _normalize_rows(centers)
+    return centers
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def store_embeddings(store, batch_size: int = 1000) -> np.ndarray:
+    """Read every chunk embedding from a Chroma collection."""
+    parts, offset = [], 0
+    while True:
+        batch = store.get(include=["embeddings"], limit=batch_size, offset=offset)
+        if not len(batch["ids"]):
+            break
+        parts.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+    return np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+
+class CentroidRouter:
+    """
+    Classifies a query embedding into a subject.
+
+    Parameters:
+    - subjects: Subject names, in label order.
+    - prototypes: (P, d) unit vectors, grouped contiguously by subject.
+    - labels: (P,) subject index of each prototype.
+    - temperature: Softmax temperature applied to cosine scores.
+    """
+
+    def __init__(self, subjects: List[str], prototypes: np.ndarray, labels: np.ndarray, temperature: float = 0.05):
+        order = np.argsort(labels, kind="stable")
+        self.subjects = list(subjects)
+        self.prototypes = np.ascontiguousarray(prototypes[order], dtype=np.float32)
+        self.labels = labels[order]
+        self.temperature = temperature
+        # Start index of each subject's block, for np.maximum.reduceat
+        self._starts = np.searchsorted(self.labels, np.arange(len(self.subjects)))
+
+    # ---------------------------
+    # Scoring
+    # ---------------------------
+    def _subject_scores(self, query_vectors: np.ndarray) -> np.ndarray:
+        """(n, d) unit queries -> (n, subjects) best prototype cosine per subject."""
+        sims = query_vectors @ self.prototypes.T
+        return np.maximum.reduceat(sims, self._starts, axis=1)
+
+    def route(self, query_vector: Sequence[float]) -> RouteResult:
+        """Route one query embedding; confidence is the calibrated top probability."""
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        probs = _softmax(self._subject_scores(q[None, :])[0] / self.temperature)
+        best = int(np.argmax(probs))
+        return RouteResult(
+            self.subjects[best],
+            float(probs[best]),
+            {s: float(p) for s, p in zip(self.subjects, probs)},
+        )
+
+    def fit_temperature(self, vectors: np.ndarray, labels: np.ndarray) -> float:
+        """Pick the temperature that minimizes negative log-likelihood on labeled vectors."""
+        if len(vectors) == 0:
+            return self.temperature
+        scores = self._subject_scores(_normalize_rows(vectors))
+        best_t, best_nll = self.temperature, np.inf
+        for t in np.geomspace(MIN_TEMPERATURE, 0.5, 40):
+            probs = _softmax(scores / t)
+            nll = -np.mean(np.log(np.maximum(probs[np.arange(len(labels)), labels], 1e-12)))
+            if nll < best_nll:
+                best_t, best_nll = float(t), nll
+        self.temperature = best_t
+        return best_t
+
+    # ---------------------------
+    # Build & persistence
+    # ---------------------------
+    @classmethod
+    def from_stores(cls, stores: Dict[str, object], n_prototypes: int = 4, holdout: float = 0.2, seed: int = 0):
+        """Build prototypes from each subject's chunk embeddings and calibrate on a held-out split."""
+        rng = np.random.default_rng(seed)
+        subjects, protos, proto_labels, cal_vecs, cal_labels = [], [], [], [], []
+        for name, store in stores.items():
+            vectors = store_embeddings(store)
+            if not len(vectors):
+                logger.warning("No embeddings for subject '%s'; it will not be routable", name)
+                continue
+            label = len(subjects)
+            subjects.append(name)
+            vectors = _normalize_rows(vectors[rng.permutation(len(vectors))])
+            n_cal = int(len(vectors) * holdout) if len(vectors) >= 5 else 0
+            cal_vecs.append(vectors[:n_cal])
+            cal_labels.append(np.full(n_cal, label))
+            train = vectors[n_cal:]
+            centroid = _normalize_rows(train.mean(axis=0, keepdims=True))
+            centers = _spherical_kmeans(train, n_prototypes, seed=seed)
+            block = np.vstack([centroid, centers])
+            protos.append(block)
+            proto_labels.append(np.full(len(block), label))
+
+        if not subjects:
+            raise ValueError("No subject collections with embeddings to build a router from.")
+        router = cls(subjects, np.vstack(protos), np.concatenate(proto_labels))
+        router.fit_temperature(np.vstack(cal_vecs), np.concatenate(cal_labels))
+        return router
+
+    def save(self, path: str, stamps: Dict[str, str], n_prototypes: int) -> None:
+        np.savez(
+            path,
+            subjects=np.asarray(self.subjects, dtype=str),
+            prototypes=self.prototypes,
+            labels=self.labels,
+            temperature=np.float32(self.temperature),
+            stamps=np.asarray(json.dumps(stamps)),
+            n_prototypes=np.int32(n_prototypes),
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        """Return (router, stamps the prototypes were built from, prototypes per subject requested)."""
+        with np.load(path, allow_pickle=False) as data:
+            router = cls(data["subjects"].tolist(), data["prototypes"], data["labels"], float(data["temperature"]))
+            return router, json.loads(str(data["stamps"])), int(data["n_prototypes"])
+
+
+def load_router(chroma_dir: str, stores: Dict[str, object], n_prototypes: int = 4) -> Optional[CentroidRouter]:
+    """
+    Load the cached router for chroma_dir, rebuilding it whenever any subject
+    was re-ingested since it was built or n_prototypes (ROUTER_PROTOTYPES)
+    changed. Returns None if it cannot be built.
+    """
+    path = Path(chroma_dir) / ROUTER_FILE
+    stamps = {name: read_ingest_stamp(resolve_subject_dir(chroma_dir, name)) or "" for name in stores}
+    if path.exists():
+        try:
+            router, built_from, built_with = CentroidRouter.load(str(path))
+            if built_from == stamps and built_with == n_prototypes:
+                return router
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable router cache %s: %s", path, e)
+    try:
+        router = CentroidRouter.from_stores(stores, n_prototypes=n_prototypes)
+    except Exception as e:
+        logger.warning("Could not build embedding router: %s", e)
+        return None
+    try:
+        router.save(str(path), stamps, n_prototypes)
+    except OSError as e:
+        logger.warning("Could not cache router to %s: %s", path, e)
+    logger.info("Built embedding router for %s (T=%.3f)", ", ".join(router.subjects), router.temperature)
+    return router
+
+# ---------------------------
+# Entry point used by the apps
+# ---------------------------
+def detect_subject(
+    query: str,
+    router: Optional[CentroidRouter] = None,
+    query_vector: Optional[Sequence[float]] = None,
+    min_confidence: float = 0.5,
+) -> Optional[str]:
     """
     Detect the most likely subject for a given query.
 
     Args:
         query: User's input string.
-        threshold: Minimum similarity score to accept a subject.
+        router: Embedding router; when omitted only keywords are used.
+        query_vector: The query's embedding (required to use the router).
+        min_confidence: Minimum calibrated probability to accept the router's choice.
 
     Returns:
         The subject key string if detected, else None.
     """
-    query_lower = query.lower()
-    scores = {}
-
-    for subject, keywords in SUBJECT_KEYWORDS.items():
-        score = max(SequenceMatcher(None, query_lower, kw).ratio() for kw in keywords)
-        scores[subject] = score
-
-    # Select best subject if above confidence threshold
-    best_subject = max(scores, key=scores.get)
-    if scores[best_subject] >= threshold:
-        return best_subject
-
-    return None
+    if router is not None and query_vector is not None:
+        result = router.route(query_vector)
+        if result.confidence >= min_confidence:
+            return result.subject
+    return keyword_subject(query)
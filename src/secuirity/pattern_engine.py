@@ -0,0 +1,274 @@
+# src/secuirity/pattern_engine.py
+"""
+One precompiled matcher for every input check (sanitizer and guardrails).
+
+All pattern lists (prompt injection, disallowed topics, out-of-scope words,
+small-talk phrases, subject keywords) are compiled once into a single PatternEngine. Each
+distinct pattern gets a literal anchor, the longest run of plain text it
+must contain ("ignore (previous|earlier) instructions" -> " instructions").
+A scan case-folds the text once and looks every anchor up with C substring
+search. Only the patterns whose anchor is present (none, for most
+questions) run their compiled regex to confirm. Patterns are deduplicated
+across categories, so "attack" is checked once and reported both as
+disallowed and as out of scope.
+
+Results are cached per text: preprocess() and the individual checks
+(sanitize_user_input, is_small_talk, is_out_of_scope, keyword_subject)
+all scan the same cleaned question, and only the first call does the work.
+
+Hot reload: with PATTERNS_FILE set, the lists come from that JSON file
+(categories missing from it keep the built-in lists) and the file is
+re-read when its mtime changes, checked at most every
+PATTERNS_RELOAD_SECONDS. A file that fails to load or compile is logged
+and the previous patterns stay in use. Format:
+
+    {
+      "injection": ["ignore (previous|earlier) instructions", ...],
+      "disallowed": ["password", ...],
+      "out_of_scope": ["hack", ...],
+      "small_talk": {"hello": "Hello, {name}! ...", ...},
+      "subject": {"newton": "physics", ...}
+    }
+
+Entries are case-insensitive regular expressions, except in the literal
+categories (out_of_scope, small_talk, subject), which are plain phrases.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from ..logger import get_logger
+
+logger = get_logger("pattern_engine")
+
+LITERAL_CATEGORIES = ("out_of_scope", "small_talk", "subject")
+
+# A category is a list of patterns, or a mapping pattern -> payload (e.g. the small-talk reply)
+Patterns = Union[Sequence[str], Mapping[str, object]]
+
+
+def _fold_table() -> Dict[int, str]:
+    """
+    Characters str.lower() leaves apart but re.IGNORECASE treats as equal
+    (e.g. "ſ" and "s"), mapped to one representative, so that folded
+    anchors are found wherever the regex could match.
+    """
+    table = {0x130: "i"}  # "İ": re lowercases it to "i", str.lower() to "i" + combining dot
+    try:
+        from re._casefix import _EXTRA_CASES
+    except ImportError:
+        _EXTRA_CASES = {}
+    for code, others in _EXTRA_CASES.items():
+        representative = chr(min((code,) + others))
+        if chr(code) != representative:
+            table[code] = representative
+    return table
+
+
+_FOLD = _fold_table()
+
+
+def fold(text: str) -> str:
+    """Case-fold text the way re.IGNORECASE compares characters."""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_FOLD).lower().translate(_FOLD)
+
+
+def literal_anchor(source: str) -> Optional[str]:
+    """Longest run of literal characters every match of the regex contains (None if there is none)."""
+    best, run = "", []
+    for op, av in list(sre_parse.parse(source)) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    return fold(best) or None
+
+
+class PatternEngine:
+    """
+    Matches every category's patterns in one scan of the text.
+
+    Parameters:
+    - categories: Category name -> patterns (list) or pattern -> payload (mapping), in priority order.
+    - literal: Categories whose patterns are plain phrases rather than regexes.
+    - cache_size: Recent texts whose scan results are kept.
+    """
+
+    def __init__(self, categories: Mapping[str, Patterns], literal: Iterable[str] = LITERAL_CATEGORIES,
+                 cache_size: int = 256):
+        literal = set(literal)
+        self.payloads: Dict[str, Dict[str, object]] = {}
+        sources: Dict[str, int] = {}
+        # For each distinct regex: the (category, position, pattern) entries it stands for
+        self._entries: List[List[Tuple[str, int, str]]] = []
+        for category, patterns in categories.items():
+            payloads = dict(patterns) if isinstance(patterns, Mapping) else dict.fromkeys(patterns)
+            self.payloads[category] = payloads
+            for position, pattern in enumerate(payloads):
+                source = re.escape(pattern) if category in literal else pattern
+                index = sources.setdefault(source, len(sources))
+                if index == len(self._entries):
+                    self._entries.append([])
+                self._entries[index].append((category, position, pattern))
+
+        self._regexes = []
+        anchors: Dict[Optional[str], List[int]] = {}
+        for index, (source, entries) in enumerate(zip(sources, self._entries)):
+            try:
+                self._regexes.append(re.compile(source, re.IGNORECASE))
+                anchor = literal_anchor(source)
+            except re.error as e:
+                category, _, pattern = entries[0]
+                raise ValueError(f"Invalid {category} pattern {pattern!r}: {e}") from e
+            anchors.setdefault(anchor, []).append(index)
+        # Patterns without an anchor (e.g. r"\d{16}") always run their regex
+        self._always = anchors.pop(None, [])
+        self._anchors = list(anchors.items())
+
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Tuple[str, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _match(self, text: str) -> Dict[str, Tuple[str, ...]]:
+        folded = fold(text)
+        candidates = [i for anchor, indexes in self._anchors if anchor in folded for i in indexes]
+        hits: Dict[str, List[Tuple[int, str]]] = {}
+        for i in candidates + self._always:
+            if self._regexes[i].search(text):
+                for category, position, pattern in self._entries[i]:
+                    hits.setdefault(category, []).append((position, pattern))
+        return {category: tuple(p for _, p in sorted(matched)) for category, matched in hits.items()}
+
+    def scan(self, text: str) -> Dict[str, Tuple[str, ...]]:
+        """Category -> matched patterns (in list order), for categories with at least one match."""
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return dict(cached)
+        result = self._match(text)
+        with self._lock:
+            self._cache[text] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(result)
+
+    def scan_batch(self, texts: Sequence[str]) -> List[Dict[str, Tuple[str, ...]]]:
+        """scan() for many texts; repeated texts are matched once."""
+        unique = {text: self.scan(text) for text in dict.fromkeys(texts)}
+        return [dict(unique[text]) for text in texts]
+
+
+def default_categories() -> Dict[str, Patterns]:
+    """The built-in lists from the sanitizer, guardrails and router modules."""
+    from .sanitizer import DISALLOWED_PATTERNS, INJECTION_PATTERNS
+    from ..utils.guardrails import OUT_OF_SCOPE_WORDS, SMALL_TALK_RESPONSES
+    from ..routing.router_agent import SUBJECT_KEYWORDS
+    keywords = {}
+    for subject, words in SUBJECT_KEYWORDS.items():
+        for word in words:
+            keywords.setdefault(word, subject)  # keyword -> the first subject listing it
+    return {
+        "injection": INJECTION_PATTERNS,
+        "disallowed": DISALLOWED_PATTERNS,
+        "out_of_scope": OUT_OF_SCOPE_WORDS,
+        "small_talk": SMALL_TALK_RESPONSES,
+        "subject": keywords,
+    }
+
+
+class PatternRegistry:
+    """
+    Holds the current PatternEngine and rebuilds it when the patterns file changes.
+
+    Parameters:
+    - path: JSON patterns file (None = built-in lists only).
+    - check_interval: Seconds between checks of the file's mtime.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._engine = PatternEngine(default_categories())
+        if path:
+            self.reload()
+
+    def _load(self) -> Dict[str, Patterns]:
+        categories = default_categories()
+        with open(self.path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise ValueError("patterns file must hold a JSON object")
+        for category, patterns in overrides.items():
+            if category in ("small_talk", "subject"):
+                if not isinstance(patterns, dict) or not all(
+                        isinstance(k, str) and isinstance(v, str) for k, v in patterns.items()):
+                    raise ValueError(f"{category} must map each phrase (a string) to its reply or subject")
+            elif not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+                raise ValueError(f"{category} must be a list of strings")
+        categories.update(overrides)
+        return categories
+
+    def reload(self) -> bool:
+        """Rebuild the engine from the patterns file now; returns False (keeping the old one) on error."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                # Recorded even if the file is bad, so it is retried only once it changes again
+                self._mtime = os.path.getmtime(self.path)
+                engine = PatternEngine(self._load())
+            except (OSError, ValueError) as e:
+                logger.error("Could not load patterns from %s, keeping the current ones: %s", self.path, e)
+                return False
+            self._engine = engine
+            self.version += 1
+            logger.info("Loaded patterns from %s (version %d)", self.path, self.version)
+            return True
+
+    @property
+    def engine(self) -> PatternEngine:
+        """The current engine, reloaded first if the patterns file changed."""
+        if self.path and time.monotonic() - self._checked >= self.check_interval:
+            try:
+                changed = os.path.getmtime(self.path) != self._mtime
+            except OSError:
+                changed = False
+            self._checked = time.monotonic()
+            if changed:
+                self.reload()
+        return self._engine
+
+
+_registry: Optional[PatternRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_engine() -> PatternEngine:
+    """The shared engine, built on first use from PATTERNS_FILE / PATTERNS_RELOAD_SECONDS."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from ..utils.config_loader import load_config
+                config = load_config()
+                _registry = PatternRegistry(config.get("PATTERNS_FILE") or None,
+                                            config.get("PATTERNS_RELOAD_SECONDS", 2.0))
+    return _registry.engine
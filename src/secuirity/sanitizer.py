@@ -1,9 +1,10 @@
 # src/security/sanitizer.py
 import re
-from typing import Tuple, List
+from typing import Dict, Tuple, List
 from rapidfuzz import fuzz
 from pathlib import Path
 from ..logger import get_logger
+from .pattern_engine import get_engine
 
 logger = get_logger("sanitizer")
 
@@ -25,6 +26,25 @@ DISALLOWED_PATTERNS = [
     r"exploit", r"attack", r"terror", r"illegal"
 ]
 
+# Categories of the shared pattern engine that reject input, and how they are reported
+REJECT_CATEGORIES = {
+    "injection": "prompt-injection pattern",
+    "disallowed": "disallowed content pattern",
+}
+_ROLE_PREFIX = re.compile(r"^\s*(system:|assistant:|user:)\s*", flags=re.IGNORECASE)
+
+def clean_input(text: str) -> str:
+    """Trim the input and remove suspicious system-like prefixes."""
+    return _ROLE_PREFIX.sub("", text.strip())
+
+def rejection_reasons(cleaned: str, matches: Dict[str, Tuple[str, ...]]) -> List[str]:
+    """Reasons to reject the input, from a pattern-engine scan of it (logged when there are any)."""
+    reasons = [f"{label}: {pat}" for category, label in REJECT_CATEGORIES.items()
+               for pat in matches.get(category, ())]
+    if reasons:
+        logger.warning("Sanitizer flagged input: %s; reasons: %s", cleaned, reasons)
+    return reasons
+
 def sanitize_user_input(text: str) -> Tuple[str, bool, List[str]]:
     """
     Sanitize input text and flag suspicious or disallowed content.
@@ -34,29 +54,13 @@ def sanitize_user_input(text: str) -> Tuple[str, bool, List[str]]:
         flagged: True if input contains dangerous or restricted patterns
         reasons: list of patterns matched
     """
-    reasons = []
     if not isinstance(text, str):
         return "", True, ["non-string input"]
 
-    lowered = text.strip()
-    # remove suspicious system-like prefixes
-    cleaned = re.sub(r"^\s*(system:|assistant:|user:)\s*", "", lowered, flags=re.IGNORECASE)
-
-    # detect prompt-injection patterns
-    for pat in INJECTION_PATTERNS:
-        if re.search(pat, cleaned, flags=re.IGNORECASE):
-            reasons.append(f"prompt-injection pattern: {pat}")
-
-    # detect disallowed topics
-    for pat in DISALLOWED_PATTERNS:
-        if re.search(pat, cleaned, flags=re.IGNORECASE):
-            reasons.append(f"disallowed content pattern: {pat}")
-
-    flagged = len(reasons) > 0
-    if flagged:
-        logger.warning("Sanitizer flagged input: %s; reasons: %s", cleaned, reasons)
-
-    return cleaned, flagged, reasons
+    cleaned = clean_input(text)
+    # detect prompt-injection patterns and disallowed topics in one pass
+    reasons = rejection_reasons(cleaned, get_engine().scan(cleaned))
+    return cleaned, len(reasons) > 0, reasons
 
 def safe_trim(text: str, max_chars: int = 2000) -> str:
     """
@@ -1,29 +1,80 @@
 # src/utils/chat_manager.py
+import asyncio
+import time
+
 from langchain_openai import ChatOpenAI
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 from langchain.prompts import PromptTemplate
-from src.utils.memory_manager import MemoryManager
-from src.rag.hybrib_retriever import hybrid_rank, build_context_string
+from src.utils.memory_manager import DEFAULT_SESSION, memory_manager_from_config
+from src.utils.preprocess import PreprocessMetrics
+from src.rag.hybrib_retriever import hybrid_search, hybrid_rank_scored
+from src.rag.context_packer import PromptMetrics, pack_context
+from src.rag.context_compressor import compressor_from_config
+from src.rag.bm25_index import load_lexical_index
+from src.ingest.collection_paths import resolve_subject_dir
+from src.rag.vector_stores import open_stores_from_config
+from src.rag.answer_cache import SemanticAnswerCache
+from src.rag.query_embedder import QueryEmbedder
+from src.rag.embedding_backends import embeddings_from_config
+from src.rag.micro_batcher import batched_embeddings
+from src.routing.router_agent import load_router, detect_subject
+from src.rag.fanout_retriever import fanout_search
+from src.rag.streaming import (
+    AsyncTokenStream, StreamMetrics, StreamStats, TokenStream, asingle_chunk, single_chunk,
+)
+
+
+def answer_text(response_obj) -> str:
+    """Extract the plain text from an LLM response object."""
+    if hasattr(response_obj, "content"):
+        return response_obj.content.strip()
+    if isinstance(response_obj, dict) and "output_text" in response_obj:
+        return response_obj["output_text"].strip()
+    return str(response_obj).strip()
+
 
 class ChatManager:
     """Manages chat sessions, subject detection, and RAG-based responses."""
 
-    def __init__(self, config):
+    def __init__(self, config, llm=None):
         self.config = config
-        self.embeddings = HuggingFaceEmbeddings(model_name=config["EMBEDDING_MODEL"])
-        self.llm = ChatOpenAI(model=config["LLM_MODEL"], temperature=0.2)
-        self.memory_manager = MemoryManager()
+        # Concurrent questions share one embedding forward pass (QUERY_BATCH_*)
+        self.embeddings = batched_embeddings(config, embeddings_from_config(config))
+        # Optional query-focused sentence extraction (CONTEXT_COMPRESSION)
+        self.compressor = compressor_from_config(config, self.embeddings)
+        self.query_embedder = QueryEmbedder(self.embeddings, max_size=config.get("QUERY_EMBED_CACHE_SIZE", 2048))
+        # Any chat model with invoke/ainvoke/stream/astream (e.g. streaming.FakeStreamingLLM offline)
+        self.llm = llm or ChatOpenAI(model=config["LLM_MODEL"], temperature=0.2)
+        # Per-session, windowed memory with idle/LRU eviction (MEMORY_*)
+        self.memory_manager = memory_manager_from_config(config, self.llm)
+        self.stream_metrics = StreamMetrics()
+        self.prompt_metrics = PromptMetrics(config["LLM_MODEL"])
+        self.preprocess_metrics = PreprocessMetrics()
 
         # Load subject vectorstores
         CHROMA_DIR = config["CHROMA_DB_DIR"]
-        self.subjects = {
-            "english": Chroma(persist_directory=f"{CHROMA_DIR}/english", embedding_function=self.embeddings),
-            "physics": Chroma(persist_directory=f"{CHROMA_DIR}/physics", embedding_function=self.embeddings),
-            "biology": Chroma(persist_directory=f"{CHROMA_DIR}/biology", embedding_function=self.embeddings),
-            "pakistan_studies": Chroma(persist_directory=f"{CHROMA_DIR}/pakistan_studies", embedding_function=self.embeddings),
+        self.subjects = open_stores_from_config(
+            config, ["english", "physics", "biology", "pakistan_studies"], self.embeddings
+        )
+        # BM25 indexes for the lexical half of hybrid retrieval
+        self.lexical_indexes = {
+            name: load_lexical_index(resolve_subject_dir(CHROMA_DIR, name), store) for name, store in self.subjects.items()
         }
 
+        # Embedding-centroid subject router (cached next to the vector DBs)
+        self.router = load_router(CHROMA_DIR, self.subjects, n_prototypes=config.get("ROUTER_PROTOTYPES", 4))
+
+        # Semantic answer cache (skips retrieval + LLM for repeated questions)
+        self.answer_cache = None
+        if config.get("ANSWER_CACHE_ENABLED", True):
+            self.answer_cache = SemanticAnswerCache(
+                CHROMA_DIR,
+                list(self.subjects.keys()),
+                threshold=config.get("ANSWER_CACHE_THRESHOLD", 0.95),
+                ttl_seconds=config.get("ANSWER_CACHE_TTL_SECONDS", 3600),
+                max_entries=config.get("ANSWER_CACHE_MAX_ENTRIES", 1000),
+                max_memory_mb=config.get("ANSWER_CACHE_MAX_MB", 64),
+            )
+
         # Prompt template
         self.prompt = PromptTemplate(
             template="""
@@ -45,36 +96,165 @@ Answer:
     # Detect subject
     # ---------------------------
     def detect_subject(self, query: str):
-        q = query.lower()
-        keywords = {
-            "english": ["grammar", "english", "sentence", "verb", "noun", "essay", "adjective", "paragraph"],
-            "physics": ["physics", "force", "motion", "law", "energy", "newton", "velocity", "optics", "gravity"],
-            "biology": ["biology", "cell", "organism", "photosynthesis", "dna", "protein", "enzyme", "plant", "animal"],
-            "pakistan_studies": ["pakistan", "independence", "quaid", "history", "movement", "1947", "constitution"]
-        }
-        for subject, keys in keywords.items():
-            if any(word in q for word in keys):
-                return subject
-        return None
+        """Route with the embedding router; the query vector is cached for retrieval."""
+        query_vector = self.query_embedder.embed(query) if self.router is not None else None
+        return detect_subject(
+            query, self.router, query_vector, min_confidence=self.config.get("ROUTER_MIN_CONFIDENCE", 0.5)
+        )
+
+    def resolve_subject(self, query: str):
+        """
+        Detect the subject, falling back to a concurrent fan-out search over all
+        subjects when routing is unsure.
+
+        Returns (subject or None, prefetched (doc, score) hits or None); pass the
+        hits to get_rag_answer(prefetched=...) to skip a second search.
+        """
+        subject = self.detect_subject(query)
+        if subject or not self.config.get("FANOUT_ENABLED", True):
+            return subject, None
+        fan = fanout_search(self.subjects, self.query_embedder.embed(query), k=self.config.get("RAG_K_DOCS", 5))
+        if fan.subject is None or fan.score < self.config.get("FANOUT_MIN_RELEVANCE", 0.1):
+            return None, None
+        return fan.subject, fan.hits
+
+    # ---------------------------
+    # Build RAG prompt
+    # ---------------------------
+    def build_prompt(self, subject, query, query_vector=None, k_docs=None, top_k=None, alpha=None,
+                     prefetched=None) -> str:
+        """Retrieve context from vectorstore (unless prefetched), rerank, and format the LLM prompt."""
+        k_docs = k_docs or self.config.get("RAG_K_DOCS", 5)
+        top_k = top_k or self.config.get("RAG_TOP_K", 3)
+        alpha = self.config.get("RAG_ALPHA", 0.7) if alpha is None else alpha
+        if query_vector is None:
+            query_vector = self.query_embedder.embed(query)
+        if prefetched is not None:
+            scored = prefetched
+        else:
+            scored = hybrid_search(
+                self.subjects[subject], self.lexical_indexes.get(subject), query, query_vector, k=k_docs
+            )
+        reranked = hybrid_rank_scored(scored, query, alpha=alpha, top_k=top_k)
+        docs = [doc for doc, _ in reranked]
+        if self.compressor is not None:
+            docs = self.compressor.compress(docs, query_vector)
+        # Overlapping chunks are merged and the context is cut to CONTEXT_TOKEN_BUDGET
+        packed = pack_context(docs, self.config.get("CONTEXT_TOKEN_BUDGET", 1500),
+                              self.config["LLM_MODEL"])
+        full_prompt = self.prompt.format(context=packed.text, question=query)
+        self.prompt_metrics.record(packed, full_prompt)
+        return full_prompt
+
+    def save_to_memory(self, subject, query, answer, session_id=DEFAULT_SESSION):
+        """Save a question/answer pair to the session's per-subject memory."""
+        mem = self.memory_manager.get_memory(subject, session_id)
+        if mem:
+            mem.save_context({"input": query}, {"output": str(answer)})
+
+    # ---------------------------
+    # Answer cache
+    # ---------------------------
+    def embed_and_lookup(self, subject, query):
+        """Embed the query once and return (query_vector, cached_answer or None)."""
+        query_vector = self.query_embedder.embed(query)
+        if self.answer_cache is None:
+            return query_vector, None
+        return query_vector, self.answer_cache.get(subject, query_vector)
+
+    def cache_store(self, subject, query, query_vector, answer, started):
+        if self.answer_cache is not None:
+            self.answer_cache.put(subject, query, query_vector, answer_text(answer), time.perf_counter() - started)
 
     # ---------------------------
     # Generate RAG answer
     # ---------------------------
-    def get_rag_answer(self, subject, query, k_docs=3, top_k=4, alpha=0.7):
+    def get_rag_answer(self, subject, query, k_docs=None, top_k=None, alpha=None, prefetched=None,
+                       session_id=DEFAULT_SESSION):
         """Retrieve context from vectorstore, rerank, and get LLM answer."""
-        retriever = self.subjects[subject].as_retriever(search_kwargs={"k": k_docs})
-        docs = retriever.get_relevant_documents(query)
-        reranked = hybrid_rank(docs, query, alpha=alpha, top_k=top_k)
-        context = build_context_string(reranked)
-        full_prompt = self.prompt.format(context=context, question=query)
+        started = time.perf_counter()
+        query_vector, cached = self.embed_and_lookup(subject, query)
+        if cached is not None:
+            self.save_to_memory(subject, query, cached, session_id)
+            return cached
+
+        full_prompt = self.build_prompt(subject, query, query_vector, k_docs=k_docs, top_k=top_k, alpha=alpha,
+                                        prefetched=prefetched)
         answer = self.llm.invoke(full_prompt)
+        self.cache_store(subject, query, query_vector, answer, started)
+        self.save_to_memory(subject, query, answer, session_id)
+        return answer
 
-        # Save to per-subject memory
-        mem = self.memory_manager.get_memory(subject)
-        if mem:
-            mem.save_context({"input": query}, {"output": str(answer)})
+    async def aget_rag_answer(self, subject, query, k_docs=None, top_k=None, alpha=None, prefetched=None,
+                              session_id=DEFAULT_SESSION):
+        """
+        Async variant of get_rag_answer for the HTTP service.
+
+        Retrieval and reranking are CPU/disk bound, so they run in the default
+        thread pool; the LLM round trip is awaited so the event loop keeps
+        serving other requests while the model is generating.
+        """
+        started = time.perf_counter()
+        query_vector, cached = await asyncio.to_thread(self.embed_and_lookup, subject, query)
+        if cached is not None:
+            # Memory updates may summarize with the LLM or spill sessions to disk; keep them off the loop
+            await asyncio.to_thread(self.save_to_memory, subject, query, cached, session_id)
+            return cached
+
+        full_prompt = await asyncio.to_thread(
+            self.build_prompt, subject, query, query_vector, k_docs, top_k, alpha, prefetched
+        )
+        answer = await self.llm.ainvoke(full_prompt)
+        self.cache_store(subject, query, query_vector, answer, started)
+        await asyncio.to_thread(self.save_to_memory, subject, query, answer, session_id)
         return answer
 
+    # ---------------------------
+    # Streaming RAG answer
+    # ---------------------------
+    def stream_rag_answer(self, subject, query, k_docs=None, top_k=None, alpha=None, prefetched=None,
+                          session_id=DEFAULT_SESSION) -> TokenStream:
+        """
+        Streaming variant of get_rag_answer. Retrieval runs now; iterate the
+        returned TokenStream for text pieces. Memory and the answer cache are
+        updated only once the stream has been consumed to the end.
+        """
+        stats = StreamStats()
+        query_vector, cached = self.embed_and_lookup(subject, query)
+        if cached is not None:
+            return TokenStream(single_chunk(cached),
+                               lambda text: self.save_to_memory(subject, query, text, session_id),
+                               stats, self.stream_metrics)
+
+        full_prompt = self.build_prompt(subject, query, query_vector, k_docs=k_docs, top_k=top_k, alpha=alpha,
+                                        prefetched=prefetched)
+
+        def on_complete(text):
+            self.cache_store(subject, query, query_vector, text, stats.started)
+            self.save_to_memory(subject, query, text, session_id)
+
+        return TokenStream(self.llm.stream(full_prompt), on_complete, stats, self.stream_metrics)
+
+    async def astream_rag_answer(self, subject, query, k_docs=None, top_k=None, alpha=None,
+                                 prefetched=None, session_id=DEFAULT_SESSION) -> AsyncTokenStream:
+        """Async variant of stream_rag_answer for the HTTP service (iterate with async for)."""
+        stats = StreamStats()
+        query_vector, cached = await asyncio.to_thread(self.embed_and_lookup, subject, query)
+        if cached is not None:
+            return AsyncTokenStream(asingle_chunk(cached),
+                                    lambda text: self.save_to_memory(subject, query, text, session_id),
+                                    stats, self.stream_metrics)
+
+        full_prompt = await asyncio.to_thread(
+            self.build_prompt, subject, query, query_vector, k_docs, top_k, alpha, prefetched
+        )
+
+        def on_complete(text):
+            self.cache_store(subject, query, query_vector, text, stats.started)
+            self.save_to_memory(subject, query, text, session_id)
+
+        return AsyncTokenStream(self.llm.astream(full_prompt), on_complete, stats, self.stream_metrics)
+
     # ---------------------------
     # Handle small talk
     # ---------------------------
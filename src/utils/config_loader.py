@@ -10,6 +10,43 @@ def load_config():
     - CHROMA_DB_DIR: directory where Chroma vector stores are saved
     - LLM_MODEL: LLM model name for ChatOpenAI
     - EMBEDDING_MODEL: Embedding model name for HuggingFaceEmbeddings
+    - EMBEDDING_BACKEND: "torch" (sentence-transformers), "onnx" or "onnx-int8" (ONNX Runtime)
+    - EMBEDDING_THREADS: CPU threads for the embedding backend (0 = library default)
+    - EMBEDDING_ONNX_DIR: exported ONNX model directory (default models/<model>-onnx)
+    - QUERY_BATCH_WAIT_MS: how long a query embedding waits for concurrent ones to batch with (0 = no batching)
+    - QUERY_BATCH_MAX_SIZE: most query texts encoded in one micro-batch
+    - VECTOR_BACKEND: "chroma" or "faiss" (memory-mapped indexes exported from the Chroma stores)
+    - VECTOR_LAYOUT: "per_subject" (one Chroma DB per subject) or "unified" (one filtered collection)
+    - FAISS_INDEX: FAISS index type, "flat" (exact), "hnsw", "ivf", or quantized "sq8" (int8) / "fp16"
+    - FAISS_NPROBE: IVF lists probed per query
+    - FAISS_EF_SEARCH: HNSW candidate list size per query
+    - FAISS_RESCORE: candidates per result re-ranked at float32 for quantized indexes (0 = off)
+    - API_WORKER_THREADS: size of the thread pool the HTTP service uses for retrieval
+    - RAG_K_DOCS: candidates fetched from the vector store per question
+    - RAG_TOP_K: reranked chunks that go into the prompt
+    - CONTEXT_TOKEN_BUDGET: maximum prompt-context tokens after merging overlapping chunks (0 = no limit)
+    - CONTEXT_COMPRESSION: keep only the chunk sentences closest to the question ("true"/"false")
+    - COMPRESSION_SENTENCES: sentences kept across the selected chunks when compressing
+    - COMPRESSION_NEIGHBOURS: sentences kept either side of each selected one
+    - RAG_ALPHA: weight of vector similarity vs lexical overlap in reranking
+    - ROUTER_MIN_CONFIDENCE: calibrated probability needed to accept the embedding router's subject
+    - ROUTER_PROTOTYPES: prototype vectors per subject (in addition to the centroid)
+    - FANOUT_ENABLED: search all subjects concurrently when no subject is detected ("true"/"false")
+    - FANOUT_MIN_RELEVANCE: minimum evidence (mean top relevance) to accept the fan-out winner
+    - MEMORY_WINDOW_TURNS: question/answer pairs remembered per subject and session
+    - MEMORY_SUMMARIZE: fold turns that leave the window into an LLM-written summary ("true"/"false")
+    - MEMORY_MAX_SESSIONS: sessions kept in memory (least recently used are evicted)
+    - MEMORY_IDLE_SECONDS: evict sessions idle for longer than this (0 = never)
+    - MEMORY_MAX_MB: approximate memory cap for all sessions' conversation memory
+    - MEMORY_SPILL_DIR: directory evicted sessions are saved to and restored from ("" = discard them)
+    - PATTERNS_FILE: JSON file overriding the sanitizer/guardrail pattern lists, reloaded when it changes ("" = built-in lists)
+    - PATTERNS_RELOAD_SECONDS: how often the patterns file is checked for changes
+    - QUERY_EMBED_CACHE_SIZE: number of query embeddings kept in the LRU cache
+    - ANSWER_CACHE_ENABLED: enable the semantic answer cache ("true"/"false")
+    - ANSWER_CACHE_THRESHOLD: minimum cosine similarity for a cache hit
+    - ANSWER_CACHE_TTL_SECONDS: maximum age of a cached answer (0 = no expiry)
+    - ANSWER_CACHE_MAX_ENTRIES: maximum cached answers per subject
+    - ANSWER_CACHE_MAX_MB: approximate memory cap for the whole cache
     """
     load_dotenv()  # Load variables from .env file if present
 
@@ -17,4 +54,41 @@ def load_config():
         "CHROMA_DB_DIR": os.getenv("CHROMA_DB_DIR", "chroma_db"),
         "LLM_MODEL": os.getenv("LLM_MODEL", "gpt-4o-mini"),
         "EMBEDDING_MODEL": os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+        "EMBEDDING_BACKEND": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+        "EMBEDDING_THREADS": int(os.getenv("EMBEDDING_THREADS", "0")),
+        "EMBEDDING_ONNX_DIR": os.getenv("EMBEDDING_ONNX_DIR", ""),
+        "QUERY_BATCH_WAIT_MS": float(os.getenv("QUERY_BATCH_WAIT_MS", "2")),
+        "QUERY_BATCH_MAX_SIZE": int(os.getenv("QUERY_BATCH_MAX_SIZE", "32")),
+        "VECTOR_BACKEND": os.getenv("VECTOR_BACKEND", "chroma").lower(),
+        "VECTOR_LAYOUT": os.getenv("VECTOR_LAYOUT", "per_subject").lower(),
+        "FAISS_INDEX": os.getenv("FAISS_INDEX", "flat").lower(),
+        "FAISS_NPROBE": int(os.getenv("FAISS_NPROBE", "8")),
+        "FAISS_EF_SEARCH": int(os.getenv("FAISS_EF_SEARCH", "64")),
+        "FAISS_RESCORE": int(os.getenv("FAISS_RESCORE", "4")),
+        "API_WORKER_THREADS": int(os.getenv("API_WORKER_THREADS", "8")),
+        "RAG_K_DOCS": int(os.getenv("RAG_K_DOCS", "5")),
+        "RAG_TOP_K": int(os.getenv("RAG_TOP_K", "3")),
+        "CONTEXT_TOKEN_BUDGET": int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+        "CONTEXT_COMPRESSION": os.getenv("CONTEXT_COMPRESSION", "false").lower() == "true",
+        "COMPRESSION_SENTENCES": int(os.getenv("COMPRESSION_SENTENCES", "6")),
+        "COMPRESSION_NEIGHBOURS": int(os.getenv("COMPRESSION_NEIGHBOURS", "0")),
+        "RAG_ALPHA": float(os.getenv("RAG_ALPHA", "0.7")),
+        "ROUTER_MIN_CONFIDENCE": float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.5")),
+        "ROUTER_PROTOTYPES": int(os.getenv("ROUTER_PROTOTYPES", "4")),
+        "FANOUT_ENABLED": os.getenv("FANOUT_ENABLED", "true").lower() == "true",
+        "FANOUT_MIN_RELEVANCE": float(os.getenv("FANOUT_MIN_RELEVANCE", "0.1")),
+        "MEMORY_WINDOW_TURNS": int(os.getenv("MEMORY_WINDOW_TURNS", "10")),
+        "MEMORY_SUMMARIZE": os.getenv("MEMORY_SUMMARIZE", "false").lower() == "true",
+        "MEMORY_MAX_SESSIONS": int(os.getenv("MEMORY_MAX_SESSIONS", "5000")),
+        "MEMORY_IDLE_SECONDS": float(os.getenv("MEMORY_IDLE_SECONDS", "1800")),
+        "MEMORY_MAX_MB": float(os.getenv("MEMORY_MAX_MB", "128")),
+        "MEMORY_SPILL_DIR": os.getenv("MEMORY_SPILL_DIR", ""),
+        "PATTERNS_FILE": os.getenv("PATTERNS_FILE", ""),
+        "PATTERNS_RELOAD_SECONDS": float(os.getenv("PATTERNS_RELOAD_SECONDS", "2")),
+        "QUERY_EMBED_CACHE_SIZE": int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048")),
+        "ANSWER_CACHE_ENABLED": os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true",
+        "ANSWER_CACHE_THRESHOLD": float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        "ANSWER_CACHE_TTL_SECONDS": float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        "ANSWER_CACHE_MAX_ENTRIES": int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+        "ANSWER_CACHE_MAX_MB": float(os.getenv("ANSWER_CACHE_MAX_MB", "64")),
     }
@@ -2,6 +2,8 @@
 import re
 from typing import Optional
 
+from src.secuirity.pattern_engine import get_engine
+
 # Basic small talk responses, with placeholders
 SMALL_TALK_RESPONSES = {
     "hello": "Hello, {name}! How can I help you with English, Physics, Biology or Pakistan Studies today?",
@@ -14,21 +16,23 @@ SMALL_TALK_RESPONSES = {
     "good night": "Good night — study dreams!",
 }
 
+# Words that mark a question as outside the tutor's subjects
+OUT_OF_SCOPE_WORDS = ["hack", "password", "jailbreak", "bomb", "attack", "illegal", "exploit"]
+
+_NAME = re.compile(r"\bmy name is (\w{2,30})", flags=re.IGNORECASE)
+
 def extract_name(query: str) -> Optional[str]:
     """Try to detect when user tells their name: 'My name is Ayesha'"""
-    m = re.search(r"\bmy name is (\w{2,30})", query, flags=re.IGNORECASE)
+    m = _NAME.search(query)
     if m:
         return m.group(1).capitalize()
     return None
 
 def is_small_talk(query: str) -> Optional[str]:
-    q = query.lower().strip()
-    for key, resp in SMALL_TALK_RESPONSES.items():
-        if key in q:
-            return resp
-    return None
+    # Same scan as the sanitizer's for this text, so usually a cache hit
+    engine = get_engine()
+    keys = engine.scan(query).get("small_talk")
+    return engine.payloads["small_talk"][keys[0]] if keys else None
 
 def is_out_of_scope(query: str) -> bool:
-    q = query.lower()
-    banned_words = ["hack", "password", "jailbreak", "bomb", "attack", "illegal", "exploit"]
-    return any(b in q for b in banned_words)
+    return bool(get_engine().scan(query).get("out_of_scope"))
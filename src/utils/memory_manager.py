@@ -1,38 +1,410 @@
 # src/utils/memory_manager.py
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain.memory import ConversationBufferMemory
+"""
+Session-keyed, bounded conversation memory.
 
-class MemoryManager:
+Every student (session id) gets their own per-subject memories and name.
+Each subject memory keeps only the last `window_turns` question/answer
+pairs; older turns are dropped, or folded into a running summary when a
+summarizer is configured. Whole sessions are evicted when:
+- they have been idle longer than `idle_seconds`;
+- there are more than `max_sessions` (least recently used first);
+- all sessions together exceed `max_memory_mb` (least recently used first).
+
+With a spill directory, evicted sessions are written to disk and
+restored when the student comes back, so eviction only costs a file read.
+Spill files are written after the manager lock is released, so an
+eviction never holds up other requests on disk I/O. A session that is
+still referenced when it is needed again (a request holding its memory,
+or a spill not yet written) is re-attached as it is rather than read
+back, so a turn saved just after its session was evicted is kept.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from src.logger import get_logger
+
+logger = get_logger("memory_manager")
+
+SUBJECTS = ("english", "physics", "biology", "pakistan_studies")
+DEFAULT_SESSION = "default"
+# Rough per-message overhead (message object, dict, deque slot) on top of its text
+_MESSAGE_OVERHEAD = 400
+MAX_SUMMARY_CHARS = 2000
+
+# summarizer(previous summary, evicted messages) -> new summary
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+
+class WindowedChatHistory:
+    """Message list that keeps only the newest max_messages (iterable like the old chat_memory)."""
+
+    def __init__(self, max_messages: int):
+        self._messages = deque(maxlen=max_messages or None)
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return list(self._messages)
+
+    def add_message(self, message: BaseMessage) -> Optional[BaseMessage]:
+        """Append; returns the message pushed out of the window, if any."""
+        evicted = self._messages[0] if self._messages.maxlen and len(self._messages) == self._messages.maxlen else None
+        self._messages.append(message)
+        return evicted
+
+    def clear(self) -> None:
+        self._messages.clear()
+
+    def __iter__(self):
+        return iter(list(self._messages))
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class SubjectMemory:
     """
-    Handles per-subject conversation memory and stores user's name.
+    Windowed memory for one subject of one session, with the same surface
+    the apps used from ConversationBufferMemory (save_context, chat_memory,
+    load_memory_variables, clear).
+
+    Parameters:
+    - window_turns: Question/answer pairs kept (0 = unbounded).
+    - summarizer: Optional callable folding turns that leave the window into a running summary.
+    - on_resize: Called with the change in approximate size (bytes) after each update.
     """
 
-    def __init__(self):
-        # Initialize per-subject memory using ConversationBufferMemory
-        self.memories = {
-            "english": ConversationBufferMemory(
-                memory_key="chat_history", return_messages=True, chat_memory=ChatMessageHistory()
-            ),
-            "physics": ConversationBufferMemory(
-                memory_key="chat_history", return_messages=True, chat_memory=ChatMessageHistory()
-            ),
-            "biology": ConversationBufferMemory(
-                memory_key="chat_history", return_messages=True, chat_memory=ChatMessageHistory()
-            ),
-            "pakistan_studies": ConversationBufferMemory(
-                memory_key="chat_history", return_messages=True, chat_memory=ChatMessageHistory()
-            ),
+    memory_key = "chat_history"
+
+    def __init__(self, window_turns: int = 10, summarizer: Optional[Summarizer] = None,
+                 on_resize: Optional[Callable[[int], None]] = None):
+        self.chat_memory = WindowedChatHistory(2 * window_turns)
+        self.summary = ""
+        self.summarizer = summarizer
+        self.on_resize = on_resize
+        self.nbytes = 0
+
+    @staticmethod
+    def _size(message: BaseMessage) -> int:
+        return len(str(message.content).encode("utf-8")) + _MESSAGE_OVERHEAD
+
+    def _add(self, message: BaseMessage) -> List[BaseMessage]:
+        evicted = self.chat_memory.add_message(message)
+        delta = self._size(message) - (self._size(evicted) if evicted is not None else 0)
+        self.nbytes += delta
+        return [evicted] if evicted is not None else []
+
+    def save_context(self, inputs: dict, outputs: dict) -> None:
+        before = self.nbytes + len(self.summary)
+        evicted = self._add(HumanMessage(content=str(inputs.get("input", ""))))
+        evicted += self._add(AIMessage(content=str(outputs.get("output", ""))))
+        if evicted and self.summarizer is not None:
+            try:
+                self.summary = self.summarizer(self.summary, evicted)[-MAX_SUMMARY_CHARS:]
+            except Exception as e:
+                logger.warning("Summarizing evicted turns failed: %s", e)
+        if self.on_resize is not None:
+            self.on_resize(self.nbytes + len(self.summary) - before)
+
+    def load_memory_variables(self, inputs: Optional[dict] = None) -> dict:
+        messages = self.chat_memory.messages
+        if self.summary:
+            messages = [SystemMessage(content=f"Earlier in this conversation: {self.summary}")] + messages
+        return {self.memory_key: messages}
+
+    def clear(self) -> None:
+        before = self.nbytes + len(self.summary)
+        self.chat_memory.clear()
+        self.summary = ""
+        self.nbytes = 0
+        if self.on_resize is not None:
+            self.on_resize(-before)
+
+    def to_dict(self) -> dict:
+        return {"summary": self.summary,
+                "messages": [{"type": m.type, "content": m.content} for m in self.chat_memory.messages]}
+
+    def load_dict(self, data: dict) -> None:
+        for m in data.get("messages", []):
+            cls = HumanMessage if m["type"] == "human" else AIMessage
+            self._add(cls(content=m["content"]))
+        self.summary = data.get("summary", "")
+
+
+class SessionState:
+    """One student's memories and name."""
+
+    def __init__(self, subjects, window_turns: int, summarizer: Optional[Summarizer] = None,
+                 on_resize: Optional[Callable[[int], None]] = None):
+        self.memories: Dict[str, SubjectMemory] = {
+            subject: SubjectMemory(window_turns, summarizer, on_resize) for subject in subjects
         }
-        self.user_name = None
+        self.user_name: Optional[str] = None
+        self.last_active = time.monotonic()
+        self.nbytes = 0
 
-    def get_memory(self, subject: str) -> ConversationBufferMemory:
+    def to_dict(self) -> dict:
+        return {"user_name": self.user_name, "memories": {s: m.to_dict() for s, m in self.memories.items()}}
+
+
+class MemoryManager:
+    """
+    Handles per-session, per-subject conversation memory and the user's name.
+
+    Methods take a session_id; the default session serves the single-user CLI.
+
+    Parameters:
+    - subjects: Subjects each session has a memory for.
+    - window_turns: Question/answer pairs kept per subject.
+    - max_sessions: Sessions held in memory at most.
+    - idle_seconds: Sessions untouched for longer are evicted (0 = never).
+    - max_memory_mb: Approximate cap for all sessions together (0 = no cap).
+    - spill_dir: Directory evicted sessions are saved to and restored from (None = discard).
+    - summarizer: Optional callable folding turns that leave the window into a summary.
+    """
+
+    def __init__(self, subjects=SUBJECTS, window_turns: int = 10, max_sessions: int = 5000,
+                 idle_seconds: float = 1800, max_memory_mb: float = 128, spill_dir: Optional[str] = None,
+                 summarizer: Optional[Summarizer] = None):
+        self.subjects = tuple(subjects)
+        self.window_turns = window_turns
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.summarizer = summarizer
+
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        # Evicted sessions someone may still write to; entries vanish once nothing references them
+        self._detached: "weakref.WeakValueDictionary[str, SessionState]" = weakref.WeakValueDictionary()
+        self._to_spill: List[tuple] = []
+        self._lock = threading.RLock()
+        self._spill_lock = threading.Lock()  # orders spill writes, outside the manager lock
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self.evicted = {"idle": 0, "lru": 0, "memory": 0}
+        self.spilled = 0
+        self.restored = 0
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---------------------------
+    # Sessions
+    # ---------------------------
+    def session(self, session_id: str = DEFAULT_SESSION) -> SessionState:
+        """Return the session, creating or restoring it, and mark it as most recently used."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = self._detached.get(session_id)
+                if state is not None:
+                    self._reattach(session_id, state)
+                else:
+                    state = self._new_session(session_id)
+                    self._sessions[session_id] = state
+                    self._restore(session_id, state)
+            self._sessions.move_to_end(session_id)
+            state.last_active = now
+            if self.idle_seconds and now - self._last_sweep >= min(60.0, self.idle_seconds / 4):
+                self._evict_idle(now)
+            self._enforce_limits(keep=session_id)
+        self._flush_spills()
+        return state
+
+    def _new_session(self, session_id: str) -> SessionState:
+        state = SessionState(self.subjects, self.window_turns, self.summarizer)
+
+        def on_resize(delta: int) -> None:
+            with self._lock:
+                state.nbytes += delta
+                if self._sessions.get(session_id) is state:
+                    self._bytes += delta
+                elif session_id not in self._sessions:
+                    # Saved to after it was evicted: hold it again, so the turn is not lost
+                    self._reattach(session_id, state)
+                self._enforce_limits(keep=session_id)
+            self._flush_spills()
+
+        for memory in state.memories.values():
+            memory.on_resize = on_resize
+        return state
+
+    def end_session(self, session_id: str) -> None:
+        """Drop a session now (e.g. on logout), spilling it if a spill directory is set."""
+        with self._lock:
+            self._evict(session_id, "idle")
+        self._flush_spills()
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        """Drop a session (lock held); its spill file is written later by _flush_spills."""
+        state = self._sessions.pop(session_id, None)
+        if state is None:
+            return
+        self._bytes -= state.nbytes
+        self.evicted[reason] += 1
+        self._detached[session_id] = state
+        self._to_spill.append((session_id, state))
+
+    def _reattach(self, session_id: str, state: SessionState) -> None:
+        """Hold an evicted session again (lock held); a spill file it left is now stale."""
+        self._detached.pop(session_id, None)
+        self._sessions[session_id] = state
+        self._bytes += state.nbytes
+        if self.spill_dir is not None:
+            self._spill_path(session_id).unlink(missing_ok=True)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Evict sessions idle for longer than idle_seconds; returns how many."""
+        evicted = self._evict_idle(now)
+        self._flush_spills()
+        return evicted
+
+    def _evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            # Sessions are in LRU order, so the idle ones are at the front
+            idle = []
+            for session_id, state in self._sessions.items():
+                if now - state.last_active < self.idle_seconds:
+                    break
+                idle.append(session_id)
+            for session_id in idle:
+                self._evict(session_id, "idle")
+            return len(idle)
+
+    def _enforce_limits(self, keep: str) -> None:
+        while self.max_sessions and len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._evict(oldest, "lru")
+        while self.max_bytes and self._bytes > self.max_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._evict(oldest, "memory")
+
+    # ---------------------------
+    # Spill to disk
+    # ---------------------------
+    def _spill_path(self, session_id: str) -> Path:
+        # Session ids come from clients; hash them into safe file names
+        return self.spill_dir / f"{hashlib.sha1(session_id.encode('utf-8')).hexdigest()}.json"
+
+    def _flush_spills(self) -> None:
+        """Write the sessions evicted so far to the spill directory, without holding the manager lock."""
+        with self._lock:
+            pending, self._to_spill = self._to_spill, []
+        for session_id, state in pending:
+            self._spill(session_id, state)
+
+    def _spill(self, session_id: str, state: SessionState) -> None:
+        if self.spill_dir is None or (state.nbytes == 0 and state.user_name is None):
+            return
+        path = self._spill_path(session_id)
+        tmp = path.with_suffix(".tmp")
+        with self._spill_lock:
+            with self._lock:
+                if session_id in self._sessions:
+                    return  # re-attached before it was written
+                data = state.to_dict()
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.error("Could not spill session to %s: %s", path, e)
+                return
+            with self._lock:
+                if self._sessions.get(session_id) is state:
+                    path.unlink(missing_ok=True)  # re-attached while being written
+                else:
+                    self.spilled += 1
+
+    def _restore(self, session_id: str, state: SessionState) -> None:
+        if self.spill_dir is None:
+            return
+        path = self._spill_path(session_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable spilled session %s: %s", path, e)
+            return
+        state.user_name = data.get("user_name")
+        for subject, saved in data.get("memories", {}).items():
+            if subject in state.memories:
+                state.memories[subject].load_dict(saved)
+        state.nbytes = sum(m.nbytes + len(m.summary) for m in state.memories.values())
+        self._bytes += state.nbytes
+        path.unlink(missing_ok=True)
+        self.restored += 1
+
+    # ---------------------------
+    # Per-session accessors
+    # ---------------------------
+    def get_memory(self, subject: str, session_id: str = DEFAULT_SESSION) -> Optional[SubjectMemory]:
         """Return memory object for a given subject."""
-        return self.memories.get(subject)
+        return self.session(session_id).memories.get(subject)
 
-    def set_user_name(self, name: str):
+    def set_user_name(self, name: str, session_id: str = DEFAULT_SESSION):
         """Store the user's name for the session."""
-        self.user_name = name
+        self.session(session_id).user_name = name
 
-    def get_user_name(self) -> str:
+    def get_user_name(self, session_id: str = DEFAULT_SESSION) -> Optional[str]:
         """Return the stored user name."""
-        return self.user_name
+        return self.session(session_id).user_name
+
+    @property
+    def memories(self) -> Dict[str, SubjectMemory]:
+        """The default session's per-subject memories (single-user CLI)."""
+        return self.session(DEFAULT_SESSION).memories
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "approx_mb": round(self._bytes / (1024 * 1024), 2),
+                "evicted": dict(self.evicted),
+                "spilled": self.spilled,
+                "restored": self.restored,
+            }
+
+
+def llm_summarizer(llm) -> Summarizer:
+    """Summarizer that asks the chat model to fold evicted turns into the running summary."""
+    def summarize(summary: str, evicted: List[BaseMessage]) -> str:
+        turns = "\n".join(f"{m.type}: {m.content}" for m in evicted)
+        prompt = (
+            "Update the summary of a tutoring conversation with the turns below. "
+            f"Keep it under {MAX_SUMMARY_CHARS // 5} words.\n\n"
+            f"Summary so far:\n{summary or '(none)'}\n\nTurns:\n{turns}\n\nUpdated summary:"
+        )
+        response = llm.invoke(prompt)
+        return str(getattr(response, "content", response)).strip()
+    return summarize
+
+
+def memory_manager_from_config(config: dict, llm=None) -> MemoryManager:
+    """MemoryManager with the MEMORY_* settings from load_config()."""
+    return MemoryManager(
+        window_turns=config.get("MEMORY_WINDOW_TURNS", 10),
+        max_sessions=config.get("MEMORY_MAX_SESSIONS", 5000),
+        idle_seconds=config.get("MEMORY_IDLE_SECONDS", 1800),
+        max_memory_mb=config.get("MEMORY_MAX_MB", 128),
+        spill_dir=config.get("MEMORY_SPILL_DIR") or None,
+        summarizer=llm_summarizer(llm) if llm is not None and config.get("MEMORY_SUMMARIZE", False) else None,
+    )
@@ -0,0 +1,159 @@
+# src/utils/preprocess.py
+"""
+The preprocessing stage shared by the CLI, the API and the Streamlit app.
+
+preprocess() cleans a question once and scans it once with the shared
+pattern engine. Every guardrail decision comes from that one scan: the
+rejection reasons, small talk, out of scope and the keyword subject. The
+name introduction is only matched when the folded text contains it. The
+result is a PreparedQuery.
+
+Subject routing needs the query embedding, so the entry points run it
+themselves inside `prepared.stage("route")`. That way its time lands in the
+same per-stage timings, which PreprocessMetrics aggregates for /stats, the
+CLI's "show startup" and the Streamlit sidebar.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.secuirity.pattern_engine import fold, get_engine
+from src.secuirity.sanitizer import clean_input, rejection_reasons
+from src.utils.guardrails import extract_name
+
+NAME_INTRO = "my name is"
+
+
+class PreparedQuery:
+    """
+    One question after preprocessing.
+
+    Attributes:
+    - raw: The text as received.
+    - cleaned: Trimmed, with role prefixes ("system:" ...) removed; what the rest of the pipeline uses.
+    - folded: Case-folded cleaned text (what the pattern anchors are matched against).
+    - matches: The pattern-engine scan, category -> matched patterns.
+    - reasons: Why the input is rejected (empty if it is not).
+    - user_name: Name from "my name is ...", if the question introduces one.
+    - timings: Milliseconds per stage ("clean", "scan", "decide", and "route" once routed).
+    """
+
+    def __init__(self, raw: str, cleaned: str, folded: str, matches: Dict[str, Tuple[str, ...]],
+                 reasons: List[str], user_name: Optional[str], payloads: Dict[str, Dict[str, object]],
+                 timings: Dict[str, float]):
+        self.raw = raw
+        self.cleaned = cleaned
+        self.folded = folded
+        self.matches = matches
+        self.reasons = reasons
+        self.user_name = user_name
+        self.timings = timings
+        self._payloads = payloads
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.reasons)
+
+    @property
+    def empty(self) -> bool:
+        return not self.cleaned
+
+    @property
+    def small_talk(self) -> Optional[str]:
+        """Reply template ("{name}" placeholder) for the first small-talk phrase found, else None."""
+        phrases = self.matches.get("small_talk")
+        return self._payloads["small_talk"][phrases[0]] if phrases else None
+
+    @property
+    def out_of_scope(self) -> bool:
+        return bool(self.matches.get("out_of_scope"))
+
+    @property
+    def keyword_subject(self) -> Optional[str]:
+        """The first subject with a keyword in the question (the router's fallback)."""
+        keywords = self.matches.get("subject")
+        return self._payloads["subject"][keywords[0]] if keywords else None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a later stage (e.g. routing) into this query's timings."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings.values())
+
+    @property
+    def timings_ms(self) -> Dict[str, float]:
+        """Stage timings rounded for responses and logs."""
+        return {stage: round(ms, 3) for stage, ms in self.timings.items()}
+
+    def as_dict(self) -> dict:
+        return {
+            "flagged": self.flagged,
+            "reasons": self.reasons,
+            "small_talk": self.small_talk is not None,
+            "out_of_scope": self.out_of_scope,
+            "keyword_subject": self.keyword_subject,
+            "user_name": self.user_name,
+            "timings_ms": self.timings_ms,
+        }
+
+    def __repr__(self) -> str:
+        return f"PreparedQuery(cleaned={self.cleaned!r}, flagged={self.flagged}, total_ms={self.total_ms:.3f})"
+
+
+def preprocess(text: str) -> PreparedQuery:
+    """Clean, normalize and scan a question once; every guardrail decision reads from the result."""
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    if not isinstance(text, str):
+        return PreparedQuery("", "", "", {}, ["non-string input"], None, {}, timings)
+    cleaned = clean_input(text)
+    folded = fold(cleaned)
+    t1 = time.perf_counter()
+
+    engine = get_engine()
+    matches = engine.scan(cleaned)
+    t2 = time.perf_counter()
+
+    reasons = rejection_reasons(cleaned, matches)
+    user_name = extract_name(cleaned) if NAME_INTRO in folded else None
+    t3 = time.perf_counter()
+
+    timings.update(clean=(t1 - start) * 1000, scan=(t2 - t1) * 1000, decide=(t3 - t2) * 1000)
+    return PreparedQuery(text, cleaned, folded, matches, reasons, user_name, engine.payloads, timings)
+
+
+class PreprocessMetrics:
+    """Rolling window of per-stage preprocessing times for /stats and the apps."""
+
+    def __init__(self, window: int = 500):
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, prepared: PreparedQuery) -> None:
+        """Record right after preprocess(); stages timed later (routing) are picked up too."""
+        with self._lock:
+            self._recent.append(prepared.timings)
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = [dict(timings) for timings in self._recent]
+        if not recent:
+            return {"questions": 0}
+        summary = {"questions": len(recent)}
+        for stage in dict.fromkeys(stage for timings in recent for stage in timings):
+            times = np.array([timings[stage] for timings in recent if stage in timings])
+            summary[f"{stage}_ms_p50"] = round(float(np.percentile(times, 50)), 3)
+            summary[f"{stage}_ms_p95"] = round(float(np.percentile(times, 95)), 3)
+        return summary
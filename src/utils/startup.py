@@ -0,0 +1,183 @@
+# src/utils/startup.py
+"""
+Cold-start helpers for the CLI and Streamlit apps.
+
+- StartupTimer: records how long each startup stage took (imports, model
+  load, per-subject index open) and formats a short report.
+- background / WarmEmbeddings: build slow objects (the embedding model, the
+  LLM client, the router) on a background thread while the UI renders;
+  the first real use waits for them.
+- LazyMapping: a read-mostly dict whose values (subject stores, BM25
+  indexes, ...) are built on first access, or all at once in parallel with
+  prefetch().
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class StartupTimer:
+    """Thread-safe record of startup stage durations, in completion order."""
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self._stages: Dict[str, float] = {}
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, stage: str) -> None:
+        with self._lock:
+            self._pending[stage] = time.perf_counter()
+
+    def end(self, stage: str) -> None:
+        with self._lock:
+            began = self._pending.pop(stage, self.started)
+            self._stages[stage] = time.perf_counter() - began
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._stages[stage] = seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def stages(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stages)
+
+    def report(self) -> str:
+        """One line per stage; stages still running are listed as in progress."""
+        with self._lock:
+            done, pending = dict(self._stages), dict(self._pending)
+        now = time.perf_counter()
+        lines = [f"  {name:<24} {seconds * 1000:>8.0f} ms" for name, seconds in done.items()]
+        lines += [f"  {name:<24} {(now - began) * 1000:>8.0f} ms (in progress)" for name, began in pending.items()]
+        lines.append(f"  {'since start':<24} {(now - self.started) * 1000:>8.0f} ms")
+        return "\n".join(lines)
+
+
+def background(factory: Callable, timer: Optional[StartupTimer] = None, stage: Optional[str] = None) -> Future:
+    """
+    Run factory() on a daemon thread and return a Future for its result.
+    Errors are re-raised by future.result(), i.e. at first use.
+    """
+    future: Future = Future()
+
+    def run():
+        if timer is not None and stage:
+            timer.begin(stage)
+        try:
+            future.set_result(factory())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            if timer is not None and stage:
+                timer.end(stage)
+
+    threading.Thread(target=run, name=f"warmup-{stage or 'task'}", daemon=True).start()
+    return future
+
+
+class WarmEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that builds the real model on a background thread.
+
+    Parameters:
+    - factory: Zero-argument callable returning the Embeddings to wrap.
+    - timer: Optional StartupTimer; the load is recorded as "model load".
+    """
+
+    def __init__(self, factory: Callable[[], Embeddings], timer: Optional[StartupTimer] = None):
+        self._future = background(factory, timer, "model load")
+
+    @property
+    def model(self) -> Embeddings:
+        """The wrapped model, waiting for the warm-up to finish if needed."""
+        return self._future.result()
+
+    def ready(self) -> bool:
+        return self._future.done()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+
+class LazyMapping(Mapping):
+    """
+    Mapping over a fixed set of keys whose values are built on first access.
+
+    Each key is built at most once, even under concurrent access. Values can
+    be replaced afterwards (e.g. when a subject is hot-swapped).
+
+    Parameters:
+    - keys: The keys, in iteration order.
+    - loader: Callable building the value for one key.
+    - timer: Optional StartupTimer; each load is recorded as "<label> <key>".
+    - label: Stage label prefix for the timer.
+    """
+
+    def __init__(self, keys: Iterable[Hashable], loader: Callable, timer: Optional[StartupTimer] = None,
+                 label: str = "open"):
+        self._keys = list(keys)
+        self._loader = loader
+        self._timer = timer
+        self._label = label
+        self._values: Dict = {}
+        self._locks = {key: threading.Lock() for key in self._keys}
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        if key not in self._locks:
+            raise KeyError(key)
+        with self._locks[key]:
+            if key not in self._values:
+                started = time.perf_counter()
+                self._values[key] = self._loader(key)
+                if self._timer is not None:
+                    self._timer.record(f"{self._label} {key}", time.perf_counter() - started)
+        return self._values[key]
+
+    def __setitem__(self, key, value) -> None:
+        if key not in self._locks:
+            self._keys.append(key)
+            self._locks[key] = threading.Lock()
+        self._values[key] = value
+
+    def __iter__(self) -> Iterator:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def loaded(self) -> List:
+        """Keys whose values have been built."""
+        return [key for key in self._keys if key in self._values]
+
+    def prefetch(self, max_workers: Optional[int] = None, wait: bool = False) -> "LazyMapping":
+        """Build every value in parallel; in the background unless wait=True."""
+        pool = ThreadPoolExecutor(max_workers=max_workers or len(self._keys) or 1, thread_name_prefix="prefetch")
+        futures = [pool.submit(self.__getitem__, key) for key in self._keys]
+        pool.shutdown(wait=False)
+        if wait:
+            for future in futures:
+                future.result()
+        return self
@@ -0,0 +1,137 @@
+"""
+The streaming contract, with the local FakeStreamingLLM: the streamed text
+is the whole answer, on_complete (memory, answer cache) runs once and only
+after the last token, and a stream abandoned part way saves nothing.
+"""
+
+import asyncio
+
+from src.rag.streaming import AsyncTokenStream, FakeStreamingLLM, StreamMetrics, StreamStats, TokenStream
+from src.utils.chat_manager import ChatManager
+from src.utils.memory_manager import MemoryManager
+
+ANSWER = "Velocity is speed in a given direction."
+
+
+def fake_llm() -> FakeStreamingLLM:
+    return FakeStreamingLLM(ANSWER, first_token_delay=0, token_delay=0)
+
+
+class FixedEmbedder:
+    def embed(self, query):
+        return [0.0]
+
+
+def chat_manager(llm) -> ChatManager:
+    """A ChatManager with the fake LLM and no stores: the prompt is the question itself."""
+    manager = ChatManager.__new__(ChatManager)
+    manager.config = {}
+    manager.llm = llm
+    manager.query_embedder = FixedEmbedder()
+    manager.answer_cache = None
+    manager.memory_manager = MemoryManager(window_turns=5)
+    manager.stream_metrics = StreamMetrics()
+    manager.build_prompt = lambda subject, query, *args, **kwargs: f"Question:\n{query}"
+    return manager
+
+
+def saved_turns(manager, session_id="s1"):
+    return [m.content for m in manager.memory_manager.get_memory("physics", session_id).chat_memory]
+
+
+# ---------------------------
+# TokenStream / AsyncTokenStream
+# ---------------------------
+def test_token_stream_completes_after_last_token():
+    completed = []
+    stream = TokenStream(fake_llm().stream("prompt"), completed.append, StreamStats(), StreamMetrics())
+    pieces = []
+    for piece in stream:
+        assert not completed, "on_complete ran before the stream ended"
+        pieces.append(piece)
+    assert "".join(pieces) == ANSWER
+    assert stream.text == ANSWER
+    assert completed == [ANSWER]
+    assert stream.stats.ttft_ms is not None
+
+
+def test_abandoned_token_stream_does_not_complete():
+    completed = []
+    stream = TokenStream(fake_llm().stream("prompt"), completed.append)
+    for i, _ in enumerate(stream):
+        if i == 2:
+            break
+    assert completed == []
+
+
+def test_async_token_stream_completes_after_last_token():
+    completed = []
+
+    async def consume():
+        stream = AsyncTokenStream(fake_llm().astream("prompt"), completed.append, StreamStats(), StreamMetrics())
+        pieces = []
+        async for piece in stream:
+            assert not completed, "on_complete ran before the stream ended"
+            pieces.append(piece)
+        return "".join(pieces)
+
+    assert asyncio.run(consume()) == ANSWER
+    assert completed == [ANSWER]
+
+
+def test_abandoned_async_token_stream_does_not_complete():
+    completed = []
+
+    async def consume():
+        stream = AsyncTokenStream(fake_llm().astream("prompt"), completed.append)
+        async for _ in stream:
+            break
+
+    asyncio.run(consume())
+    assert completed == []
+
+
+# ---------------------------
+# ChatManager
+# ---------------------------
+def test_stream_rag_answer_saves_memory_once_consumed():
+    manager = chat_manager(fake_llm())
+    stream = manager.stream_rag_answer("physics", "What is velocity?", session_id="s1")
+    assert saved_turns(manager) == []
+    assert "".join(stream) == ANSWER
+    assert saved_turns(manager) == ["What is velocity?", ANSWER]
+    assert manager.stream_metrics.summary()["streams"] == 1
+
+
+def test_abandoned_stream_rag_answer_saves_nothing():
+    manager = chat_manager(fake_llm())
+    stream = manager.stream_rag_answer("physics", "What is velocity?", session_id="s1")
+    next(iter(stream))
+    assert saved_turns(manager) == []
+
+
+def test_astream_rag_answer_saves_memory_once_consumed():
+    manager = chat_manager(fake_llm())
+
+    async def consume():
+        stream = await manager.astream_rag_answer("physics", "What is velocity?", session_id="s1")
+        pieces = []
+        async for piece in stream:
+            assert saved_turns(manager) == []
+            pieces.append(piece)
+        return "".join(pieces)
+
+    assert asyncio.run(consume()) == ANSWER
+    assert saved_turns(manager) == ["What is velocity?", ANSWER]
+
+
+def test_abandoned_astream_rag_answer_saves_nothing():
+    manager = chat_manager(fake_llm())
+
+    async def consume():
+        stream = await manager.astream_rag_answer("physics", "What is velocity?", session_id="s1")
+        async for _ in stream:
+            break
+
+    asyncio.run(consume())
+    assert saved_turns(manager) == []